@@ -0,0 +1,189 @@
+"""Formatting and encodings for the time-series endpoints.
+
+Every ``/api/data`` branch (ring buffers, raw rows, SQL buckets, rollups,
+since-deltas) turns its result into ``ReadingColumns``: wall-clock epoch
+milliseconds plus one float array per metric, with NaN for NULL. One
+formatter then writes the response from those arrays, so no branch walks
+rows in Python:
+
+* rows (default): ``{"readings": [{"time": ..., "temp": ...}, ...]}``.
+  Times come from one ``datetime_as_string`` call and values from one
+  ``json.dumps`` per column (rounded to ``ROW_DECIMALS``). Each row is then
+  a single ``%`` format of those strings.
+* ``format=columnar``: one array per metric instead of one object per
+  row. Times are sent as ``t0``, the epoch milliseconds of the first
+  reading, and ``dt``, the millisecond delta from the previous reading
+  (mostly ``1000``). Values are rounded to ``COLUMNAR_PRECISION``
+  decimals, and NULL becomes ``null``.
+
+Epochs use the ring buffer encoding (sensor wall clock written as if it
+were UTC, see ``ring_buffer.reading_epoch``). Database times are read as
+the same wall clock, so rows from memory and from PostgreSQL look alike,
+and ``new Date(t).toISOString()`` in a browser shows that wall clock.
+
+Large bodies are gzipped with ``gzip_bytes``. Streamed responses use
+``gzip_chunks``, which flushes at every chunk so the client still
+receives rows as they are produced.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from db_manager import ROLLUP_METRICS
+from reading_cursor import epoch_ms, row_epoch_ms
+from ring_buffer import VALUE_COLUMNS
+
+COLUMNAR = "columnar"
+ROWS = "rows"
+FORMATS = (ROWS, COLUMNAR)
+
+# Decimals kept per metric (sensors report two, irradiance is derived)
+COLUMNAR_PRECISION = {"temp": 2, "rh": 2, "lux": 2, "irradiance": 3}
+ROW_DECIMALS = 3  # Decimals of every value in the row format
+
+_ROW_TEMPLATE = '{"time":"%s%s",' + ",".join(f'"{name}":%s' for name in VALUE_COLUMNS) + "}"
+
+
+@dataclass
+class ReadingColumns:
+    """Readings as arrays: int64 wall-clock epoch ms and float metrics (NaN = NULL)"""
+    time_ms: np.ndarray
+    values: Dict[str, np.ndarray]
+
+    @classmethod
+    def from_memory(cls, cols: Dict[str, np.ndarray]) -> "ReadingColumns":
+        """Ring buffer columns (``ts`` in epoch seconds)"""
+        return cls(epoch_ms(cols["ts"]), {name: cols[name] for name in VALUE_COLUMNS})
+
+    @classmethod
+    def from_db(cls, arrays: Dict[str, np.ndarray]) -> "ReadingColumns":
+        """``get_readings_arrays`` / ``iter_readings_arrays`` output (``timestamp`` as datetime64)"""
+        time_ms = arrays["timestamp"].astype("datetime64[ms]").astype(np.int64)
+        return cls(time_ms, {name: arrays[column] for name, column in ROLLUP_METRICS.items()})
+
+    @classmethod
+    def from_datetimes(cls, cols: Dict[str, Any]) -> "ReadingColumns":
+        """Bucket or rollup columns whose ``time`` holds database datetimes (one per chart point)"""
+        # Few values (bounded by the chart points), so a plain loop is fine
+        time_ms = np.array([row_epoch_ms(t) for t in cols["time"]], dtype=np.int64)
+        return cls(time_ms, {name: cols[name] for name in VALUE_COLUMNS})
+
+    @classmethod
+    def concat(cls, parts: List["ReadingColumns"]) -> "ReadingColumns":
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return cls(np.empty(0, dtype=np.int64), {name: np.empty(0, dtype=np.float32) for name in VALUE_COLUMNS})
+        return cls(
+            np.concatenate([p.time_ms for p in parts]),
+            {name: np.concatenate([p.values[name] for p in parts]) for name in VALUE_COLUMNS},
+        )
+
+    def __len__(self) -> int:
+        return len(self.time_ms)
+
+    def sorted(self) -> "ReadingColumns":
+        """Readings in timestamp order (stable), e.g. after a sensor clock stepped back"""
+        if len(self) < 2 or (self.time_ms[1:] >= self.time_ms[:-1]).all():
+            return self
+        order = self.time_ms.argsort(kind="stable")
+        return ReadingColumns(self.time_ms[order], {name: col[order] for name, col in self.values.items()})
+
+    def slice(self, start: Optional[int] = None, stop: Optional[int] = None) -> "ReadingColumns":
+        return ReadingColumns(
+            self.time_ms[start:stop], {name: col[start:stop] for name, col in self.values.items()}
+        )
+
+
+def format_times(time_ms: np.ndarray, suffix: str = "") -> List[str]:
+    """Vectorized epoch ms -> 'YYYY-MM-DDTHH:MM:SS' strings (wall clock, no offset)"""
+    times = np.datetime_as_string(time_ms.astype("datetime64[ms]"), unit="s").tolist()
+    return [t + suffix for t in times] if suffix else times
+
+
+def _number_array(values: np.ndarray, decimals: int) -> str:
+    """Float column -> JSON array text rounded to ``decimals`` places, NaN -> null"""
+    text = json.dumps(np.round(values.astype(np.float64), decimals).tolist())
+    # Only numbers in the array, so the NaN tokens are the only match
+    return text.replace("NaN", "null")
+
+
+def _number_texts(values: np.ndarray, decimals: int) -> List[str]:
+    """Float column -> the JSON text of each value (one json.dumps for the whole column)"""
+    if not len(values):
+        return []
+    return _number_array(values, decimals)[1:-1].split(", ")
+
+
+def rows_fragment(columns: ReadingColumns, time_suffix: str = "") -> str:
+    """The row objects of ``columns`` as '{...},{...}' (no brackets), for building or streaming an array"""
+    if not len(columns):
+        return ""
+    times = format_times(columns.time_ms)
+    values = [_number_texts(columns.values[name], ROW_DECIMALS) for name in VALUE_COLUMNS]
+    suffix = (time_suffix,) * len(times)
+    return ",".join([_ROW_TEMPLATE % row for row in zip(times, suffix, *values)])
+
+
+def rows_json(columns: ReadingColumns, meta: Dict[str, Any], time_suffix: str = "") -> str:
+    """'{"readings":[...],"count":n,**meta}'"""
+    parts = ['{"readings":[', rows_fragment(columns, time_suffix), f'],"count":{len(columns)}']
+    if meta:
+        parts.append("," + json.dumps(meta)[1:-1])
+    parts.append("}")
+    return "".join(parts)
+
+
+def columnar_json(columns: ReadingColumns, meta: Dict[str, Any]) -> str:
+    """
+    Serialize readings as parallel arrays.
+
+    Returns:
+        '{"format":"columnar","count":n,"t0":ms,"dt":[...],"temp":[...],...,**meta}'
+    """
+    time_ms = columns.time_ms
+    count = len(time_ms)
+    t0 = int(time_ms[0]) if count else None
+    deltas = np.diff(time_ms, prepend=time_ms[:1]) if count else time_ms
+    parts = [
+        f'{{"format":"{COLUMNAR}","count":{count},"t0":{json.dumps(t0)},',
+        f'"dt":{json.dumps(deltas.tolist())}',
+    ]
+    for name, decimals in COLUMNAR_PRECISION.items():
+        parts.append(f',"{name}":{_number_array(columns.values[name], decimals)}')
+    parts.append(f',"precision":{json.dumps(COLUMNAR_PRECISION)}')
+    if meta:
+        parts.append("," + json.dumps(meta)[1:-1])
+    parts.append("}")
+    return "".join(parts)
+
+
+def encode_readings(columns: ReadingColumns, meta: Dict[str, Any], fmt: str = ROWS, time_suffix: str = "") -> str:
+    """Readings response body in the requested format"""
+    if fmt == COLUMNAR:
+        return columnar_json(columns, meta)
+    return rows_json(columns, meta, time_suffix)
+
+
+def gzip_bytes(body: bytes, level: int) -> bytes:
+    """gzip a complete response body"""
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def gzip_chunks(chunks: Iterable, level: int) -> Iterator[bytes]:
+    """gzip a streamed body, flushing after every chunk so nothing waits in the compressor"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,147 @@
+"""
+Microbenchmark: JsonFramer vs. the original string-buffer framing loop
+Feeds the same byte stream through both framers in 4 KB chunks (like recv)
+and reports throughput. The payload-size sweep shows the quadratic cost of
+rescanning the whole buffer on every chunk in the original implementation.
+
+Run: python benchmark_framer.py
+"""
+
+import json
+import time
+from typing import List
+
+from json_framer import JsonFramer
+
+CHUNK_SIZE = 4096
+
+
+# -----------------------------------------------------------------------------
+# Original implementation (copied from readings.py before the framer existed)
+# -----------------------------------------------------------------------------
+
+def legacy_extract_json_objects(buffer: str):
+    objs: List[str] = []
+    start = -1
+    depth = 0
+    in_string = False
+    escape = False
+    for i, ch in enumerate(buffer):
+        if start == -1:
+            if ch == '{':
+                start = i
+                depth = 1
+            else:
+                continue
+            continue
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0 and start != -1:
+                objs.append(buffer[start : i + 1])
+                start = -1
+    if start != -1 and depth > 0:
+        remaining = buffer[start:]
+    else:
+        remaining = ''
+    return objs, remaining
+
+
+def legacy_frame(stream: bytes) -> int:
+    """Original recv loop: decode, concatenate, split on newline, rescan"""
+    frames = 0
+    buffer = ""
+    for i in range(0, len(stream), CHUNK_SIZE):
+        buffer += stream[i:i + CHUNK_SIZE].decode("utf-8", errors="ignore")
+        if "\n" in buffer:
+            parts = buffer.split("\n")
+            buffer = parts.pop()
+            frames += len(parts)
+        objs, buffer = legacy_extract_json_objects(buffer)
+        frames += len(objs)
+    return frames
+
+
+def framer_frame(stream: bytes) -> int:
+    frames = 0
+    framer = JsonFramer(max_frame_size=len(stream) + 1)
+    view = memoryview(stream)
+    for i in range(0, len(stream), CHUNK_SIZE):
+        frames += len(framer.feed(view[i:i + CHUNK_SIZE]))
+    frames += len(framer.flush())
+    return frames
+
+
+# -----------------------------------------------------------------------------
+# Workloads
+# -----------------------------------------------------------------------------
+
+def make_reading(i: int) -> dict:
+    return {
+        "id": "e4643048d7292c2e",
+        "time": "2025-10-02 17:58:%02d" % (i % 60),
+        "temp": 24.10 + i % 7,
+        "rh": 50.5,
+        "lux": 546.6 + i,
+    }
+
+
+def newline_stream(n: int) -> bytes:
+    return "".join(json.dumps(make_reading(i)) + "\n" for i in range(n)).encode()
+
+
+def concatenated_stream(n: int) -> bytes:
+    return "".join(json.dumps(make_reading(i)) for i in range(n)).encode()
+
+
+def large_payload(size_bytes: int) -> bytes:
+    """One big object streamed slowly (e.g. a gateway batch upload)"""
+    batch = []
+    i = 0
+    while len(json.dumps(batch)) < size_bytes:
+        batch.append(make_reading(i))
+        i += 1
+    return json.dumps({"batch": batch}).encode() + b"\n"
+
+
+def timeit(fn, stream: bytes, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(stream)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def report(name: str, stream: bytes) -> None:
+    legacy = timeit(legacy_frame, stream)
+    framer = timeit(framer_frame, stream)
+    mb = len(stream) / 1e6
+    print(f"{name:34} {len(stream) / 1024:9.0f} KB | "
+          f"legacy {mb / legacy:7.1f} MB/s | framer {mb / framer:7.1f} MB/s | "
+          f"speedup {legacy / framer:5.1f}x")
+
+
+def main():
+    print("=" * 100)
+    print("JSON framing microbenchmark (4 KB chunks)")
+    print("=" * 100)
+    report("newline-delimited, 20k readings", newline_stream(20000))
+    report("concatenated, 20k readings", concatenated_stream(20000))
+    for size in (64 * 1024, 256 * 1024, 512 * 1024):
+        report(f"single object, {size // 1024} KB", large_payload(size))
+    print("=" * 100)
+
+
+if __name__ == "__main__":
+    main()
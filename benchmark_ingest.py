@@ -0,0 +1,172 @@
+"""
+Ingest throughput benchmark for ZDEnergy Analytics
+Measures how many readings per second the system can take in and persist.
+
+Two modes:
+  tcp  - Load test a running server (python readings.py). Several gateway
+         connections stream newline-delimited readings as fast as possible;
+         /api/health is sampled before and after to compute parsed rows/s
+         (network thread ceiling) and written rows/s (database ceiling).
+  db   - Call DatabaseManager.insert_sensor_readings_batch directly with
+         synthetic rows to measure the raw batched INSERT rate of the
+         configured PostgreSQL database.
+
+Usage:
+    python benchmark_ingest.py tcp --connections 4 --sensors 25 --duration 20
+    python benchmark_ingest.py db --rows 100000 --batch-size 500
+
+Run the server with DEBUG = False and DB_STORAGE_MODE=full for meaningful
+numbers; per-line debug printing dominates the cost otherwise.
+"""
+
+import argparse
+import json
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+BASE_TIME = datetime(2030, 1, 1)  # Far from real data so benchmark rows are easy to delete
+
+
+def make_line(sensor: str, seq: int) -> bytes:
+    reading = {
+        "id": sensor,
+        "time": (BASE_TIME + timedelta(seconds=seq)).strftime("%Y-%m-%d %H:%M:%S"),
+        "temp": 24.0 + (seq % 50) / 10.0,
+        "rh": 50.0 + (seq % 30) / 10.0,
+        "lux": 500.0 + seq % 1000,
+    }
+    return (json.dumps(reading) + "\n").encode("utf-8")
+
+
+def get_health(http: str) -> dict:
+    resp = requests.get(f"{http}/api/health", timeout=10)
+    return resp.json()
+
+
+def gateway_worker(host: str, port: int, conn_idx: int, sensors: int, stop_at: float, sent: list):
+    """One gateway connection cycling through its sensors"""
+    sock = socket.create_connection((host, port))
+    names = [f"bench-{conn_idx:02d}-{i:03d}" for i in range(sensors)]
+    seq = 0
+    count = 0
+    try:
+        while time.time() < stop_at:
+            # Send one reading per sensor in a single write (like a gateway flush)
+            payload = b"".join(make_line(name, seq) for name in names)
+            sock.sendall(payload)
+            count += len(names)
+            seq += 1
+    finally:
+        sock.close()
+        sent[conn_idx] = count
+
+
+def run_tcp(args):
+    before = get_health(args.http)
+    parsed_before = before["tcp_server"]["messages_parsed"]
+    written_before = before.get("db_writer", {}).get("written", 0)
+
+    sent = [0] * args.connections
+    stop_at = time.time() + args.duration
+    threads = [
+        threading.Thread(
+            target=gateway_worker,
+            args=(args.host, args.port, i, args.sensors, stop_at, sent),
+            daemon=True,
+        )
+        for i in range(args.connections)
+    ]
+    started = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    send_elapsed = time.time() - started
+
+    # Let the server finish parsing what is still in socket buffers
+    time.sleep(2)
+    after_send = get_health(args.http)
+    parsed = after_send["tcp_server"]["messages_parsed"] - parsed_before
+
+    # Wait for the writer queue to drain before measuring persisted rows
+    drain_started = time.time()
+    while True:
+        health = get_health(args.http)
+        writer = health.get("db_writer", {})
+        if writer.get("queue_depth", 0) == 0 or time.time() - drain_started > args.drain_timeout:
+            break
+        time.sleep(0.5)
+    written = writer.get("written", 0) - written_before
+    total_elapsed = time.time() - started
+
+    print("=" * 60)
+    print("📈 TCP ingest benchmark")
+    print("=" * 60)
+    print(f"Connections:        {args.connections} x {args.sensors} sensors")
+    print(f"Readings sent:      {sum(sent)} in {send_elapsed:.1f}s ({sum(sent) / send_elapsed:,.0f}/s)")
+    print(f"Readings parsed:    {parsed} ({parsed / send_elapsed:,.0f}/s)")
+    print(f"Readings written:   {written} ({written / total_elapsed:,.0f}/s incl. drain)")
+    print(f"Storage mode:       {writer.get('storage_mode')}")
+    print(f"Writer dropped:     {writer.get('dropped')}  failed: {writer.get('failed')}")
+    print(f"Flush latency:      avg {writer.get('avg_flush_ms')} ms, max {writer.get('max_flush_ms')} ms")
+    print(f"Max queue depth:    {writer.get('max_queue_depth')} / {writer.get('queue_capacity')}")
+    print("=" * 60)
+
+
+def run_db(args):
+    from db_manager import get_db_manager
+
+    db = get_db_manager()
+    rows = [
+        (BASE_TIME + timedelta(seconds=i), f"bench-db-{i % 10:02d}", 24.0, 50.0, 500.0, 3.94)
+        for i in range(args.rows)
+    ]
+
+    started = time.perf_counter()
+    for i in range(0, len(rows), args.batch_size):
+        db.insert_sensor_readings_batch(rows[i:i + args.batch_size])
+    elapsed = time.perf_counter() - started
+
+    print("=" * 60)
+    print("📈 Batched INSERT benchmark")
+    print("=" * 60)
+    print(f"Rows:        {args.rows} in batches of {args.batch_size}")
+    print(f"Elapsed:     {elapsed:.2f}s")
+    print(f"Throughput:  {args.rows / elapsed:,.0f} rows/s")
+    print("=" * 60)
+    print("Remove benchmark rows with:")
+    print("  DELETE FROM sensor_readings WHERE sensor_id LIKE 'bench-%';")
+    print("  (after migrate_sensor_dictionary.py: ... WHERE sensor_key IN")
+    print("   (SELECT id FROM sensors WHERE external_id LIKE 'bench-%');)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the sensor ingest ceiling")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    tcp = sub.add_parser("tcp", help="Load test a running server over TCP")
+    tcp.add_argument("--host", default="localhost")
+    tcp.add_argument("--port", type=int, default=6000)
+    tcp.add_argument("--http", default="http://localhost:5000")
+    tcp.add_argument("--connections", type=int, default=4)
+    tcp.add_argument("--sensors", type=int, default=25, help="Sensors per connection")
+    tcp.add_argument("--duration", type=float, default=20.0, help="Seconds to send")
+    tcp.add_argument("--drain-timeout", type=float, default=60.0)
+
+    db = sub.add_parser("db", help="Measure batched INSERT rate against the configured database")
+    db.add_argument("--rows", type=int, default=100000)
+    db.add_argument("--batch-size", type=int, default=500)
+
+    args = parser.parse_args()
+    if args.mode == "tcp":
+        run_tcp(args)
+    else:
+        run_db(args)
+
+
+if __name__ == "__main__":
+    main()
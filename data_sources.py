@@ -6,10 +6,11 @@ To plug in a new data source, implement or update the appropriate fetch function
 
 from __future__ import annotations
 
+import numpy as np
 import requests
-from typing import Dict, Any, Optional, List
-from datetime import datetime
-from collections import deque
+from typing import Dict, Any, Optional, List, Tuple
+
+from ring_buffer import SensorBufferRegistry, VALUE_COLUMNS, format_epochs
 
 from config import (
     Parameter,
@@ -35,19 +36,21 @@ class DataSourceAdapter:
 class SensorDataSource(DataSourceAdapter):
     """Fetches data from in-memory sensor readings (our current system)"""
     
-    def __init__(self, weather_data: deque):
+    def __init__(self, weather_data: SensorBufferRegistry, sensor_id: Optional[str] = None):
         """
         Args:
-            weather_data: Reference to the weather_data deque from readings.py
+            weather_data: Reference to the per-sensor buffers from readings.py
+            sensor_id: Restrict to one sensor (None = most recent of any sensor)
         """
         self.weather_data = weather_data
+        self.sensor_id = sensor_id
     
     def fetch(self, parameter: Parameter) -> Optional[float]:
         """Get latest sensor reading for the specified field"""
-        if not self.weather_data:
+        latest = self.weather_data.latest(self.sensor_id)
+        if not latest:
             return parameter.default_value
         
-        latest = self.weather_data[-1]
         field = parameter.source_config.get("field")
         
         if field not in latest:
@@ -75,37 +78,40 @@ class SensorDataSource(DataSourceAdapter):
         Returns:
             List of dicts with 'time' and 'value' keys
         """
+        times, values = self.fetch_historical_arrays(parameter, minutes)
+        labels = format_epochs(times)
+        
+        return [
+            {"time": t, "value": v}
+            for t, v in zip(labels.tolist(), values.tolist())
+        ]
+    
+    def fetch_historical_arrays(
+        self,
+        parameter: Parameter,
+        minutes: int = 60
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Get historical sensor readings for a parameter as arrays
+        
+        The window is located by binary search on the buffer's epoch index,
+        so no per-row parsing happens.
+        
+        Args:
+            parameter: Parameter to fetch
+            minutes: Number of minutes of history to return
+            
+        Returns:
+            (epoch seconds float64, values float64) with missing values removed
+        """
         field = parameter.source_config.get("field")
-        cutoff = datetime.utcnow().timestamp() - (minutes * 60)
-        
-        result = []
-        for reading in self.weather_data:
-            try:
-                ts = datetime.fromisoformat(
-                    reading["time_iso"].split("+")[0]
-                ).timestamp()
-                if ts < cutoff:
-                    continue
-                
-                # Get value
-                if field in reading:
-                    value = reading[field]
-                else:
-                    # Calculate if needed
-                    calculation = parameter.source_config.get("calculation")
-                    if calculation and "lux" in calculation:
-                        value = reading.get("lux", 0) / 127.0
-                    else:
-                        continue
-                
-                result.append({
-                    "time": reading["time_iso"],
-                    "value": float(value)
-                })
-            except Exception:
-                continue
+        if field not in VALUE_COLUMNS:
+            return np.empty(0), np.empty(0)
         
-        return result
+        # A copy: views into the ring are only valid while its lock is held
+        cols = self.weather_data.last_minutes(minutes, sensor=self.sensor_id)
+        values = cols[field].astype(np.float64)
+        keep = ~np.isnan(values)
+        return cols["ts"][keep], values[keep]
 
 
 class ExternalAPIDataSource(DataSourceAdapter):
@@ -188,23 +194,25 @@ class DataProvider:
     
     def __init__(
         self,
-        weather_data: Optional[deque] = None,
+        weather_data: Optional[SensorBufferRegistry] = None,
         api_base_url: Optional[str] = None,
         db_connection: Optional[str] = None,
+        sensor_id: Optional[str] = None,
     ):
         """
         Initialize data provider with available data sources.
         
         Args:
-            weather_data: Reference to sensor data deque
+            weather_data: Reference to the per-sensor ring buffers
             api_base_url: Base URL for external APIs
             db_connection: Database connection string
+            sensor_id: Read sensor parameters from this sensor only
         """
         self.sources: Dict[DataSourceType, DataSourceAdapter] = {}
         
         # Initialize available data sources
         if weather_data is not None:
-            self.sources[DataSourceType.SENSOR] = SensorDataSource(weather_data)
+            self.sources[DataSourceType.SENSOR] = SensorDataSource(weather_data, sensor_id)
         
         self.sources[DataSourceType.EXTERNAL_API] = ExternalAPIDataSource(api_base_url)
         self.sources[DataSourceType.DATABASE] = DatabaseDataSource(db_connection)
@@ -283,6 +291,34 @@ class DataProvider:
             return source.fetch_historical(param, minutes)
         
         return []
+    
+    def get_historical_arrays(
+        self,
+        parameter_name: str,
+        minutes: int = 60
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get historical data for a parameter as NumPy arrays.
+        
+        Preferred by KPI calculations that aggregate over a window: no
+        per-row dicts or timestamp strings are built.
+        
+        Args:
+            parameter_name: Name of the parameter
+            minutes: Number of minutes of history
+            
+        Returns:
+            (epoch seconds, values); both empty if the source has no history
+        """
+        from config import get_parameter
+        
+        param = get_parameter(parameter_name)
+        source = self.sources.get(param.source)
+        
+        if isinstance(source, SensorDataSource):
+            return source.fetch_historical_arrays(param, minutes)
+        
+        return np.empty(0), np.empty(0)
 
 
 # ==============================================================================
@@ -290,12 +326,16 @@ class DataProvider:
 # ==============================================================================
 
 
-def create_data_provider(weather_data: deque) -> DataProvider:
+def create_data_provider(
+    weather_data: SensorBufferRegistry,
+    sensor_id: Optional[str] = None,
+) -> DataProvider:
     """
     Create a data provider with default configuration.
     
     Args:
         weather_data: Reference to sensor data from readings.py
+        sensor_id: Optional sensor to compute parameters/KPIs for
         
     Returns:
         Configured DataProvider instance
@@ -304,4 +344,5 @@ def create_data_provider(weather_data: deque) -> DataProvider:
         weather_data=weather_data,
         api_base_url=get_manual_config("api.base_url"),
         db_connection=None,  # Add DB config when needed
+        sensor_id=sensor_id,
     )
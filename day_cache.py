@@ -0,0 +1,146 @@
+"""Size-bounded LRU cache of serialized /api/data payloads for closed days.
+
+A day whose last reading is safely in the past does not change, yet every
+dashboard load of ``/api/data?date=`` re-queried and re-serialized it. The
+first response for a (date, sensor, query options) key is now stored
+gzip-compressed together with a strong ETag (hash of the uncompressed
+body); later requests are answered from memory, or with ``304 Not
+Modified`` when the browser already holds that ETag.
+
+Rows can still land on a past day (spool replay after an outage, a gateway
+flushing its buffer, backfills). ``ReadingWriter`` reports every committed
+batch and ``invalidate_rows`` drops all cached entries of the affected
+dates, so the next request rebuilds them and gets a new ETag. Every
+invalidation also bumps the date's generation: a payload built before a
+commit but stored after it (``put`` with the generation read before the
+build) is not kept, so a stale body cannot outlive its invalidation.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+
+@dataclass
+class CachedPayload:
+    """One serialized response body, stored compressed"""
+    gzip_body: bytes
+    etag: str          # Strong ETag of the uncompressed body (without quotes)
+    raw_size: int
+
+    def body(self) -> bytes:
+        return gzip.decompress(self.gzip_body)
+
+
+class DayPayloadCache:
+    """
+    LRU of compressed payloads keyed by (date, ...), bounded by total bytes.
+
+    Usage:
+        cache = DayPayloadCache(max_bytes=64 * 1024 * 1024)
+        entry = cache.get(("2025-01-31", None, 800))
+        if entry is None:
+            generation = cache.generation("2025-01-31")   # before building body
+            entry = cache.put(("2025-01-31", None, 800), body, generation)
+        cache.invalidate_rows(rows)   # rows = (timestamp, ...) tuples
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, compress_level: int = 6):
+        """
+        Args:
+            max_bytes: Upper bound on the summed size of the compressed bodies
+            compress_level: gzip level used when storing a body
+        """
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self._entries: "OrderedDict[Tuple[Hashable, ...], CachedPayload]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._generations: Dict[str, int] = {}  # Invalidations per date
+
+        # Counters exposed through stats()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[CachedPayload]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def generation(self, date: str) -> int:
+        """Invalidation count of a date; read it before building a body to ``put``"""
+        with self._lock:
+            return self._generations.get(date, 0)
+
+    def put(self, key: Tuple[Hashable, ...], body: bytes, generation: Optional[int] = None) -> CachedPayload:
+        """
+        Compress and store a body (first element of key is the 'YYYY-MM-DD' date).
+
+        If ``generation`` is given and the date was invalidated since, the
+        body may predate the new rows and is returned without being stored.
+        """
+        entry = CachedPayload(
+            gzip_body=gzip.compress(body, self.compress_level),
+            etag=hashlib.blake2b(body, digest_size=16).hexdigest(),
+            raw_size=len(body),
+        )
+        if len(entry.gzip_body) > self.max_bytes:
+            return entry  # Too large to keep; still usable by the caller
+        with self._lock:
+            if generation is not None and self._generations.get(key[0], 0) != generation:
+                return entry
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.gzip_body)
+            self._entries[key] = entry
+            self._bytes += len(entry.gzip_body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.gzip_body)
+                self.evictions += 1
+        return entry
+
+    def invalidate_dates(self, dates: Iterable[str]) -> int:
+        """Drop every entry of the given dates. Returns how many were dropped."""
+        dates = set(dates)
+        if not dates:
+            return 0
+        with self._lock:
+            for date in dates:
+                self._generations[date] = self._generations.get(date, 0) + 1
+            stale = [key for key in self._entries if key[0] in dates]
+            for key in stale:
+                self._bytes -= len(self._entries.pop(key).gzip_body)
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def invalidate_rows(self, rows: Iterable[Tuple]) -> int:
+        """Drop the dates touched by newly written (timestamp, ...) rows"""
+        # Even with nothing cached: a body being built right now must see the new generation
+        dates = {row[0].strftime('%Y-%m-%d') for row in rows if isinstance(row[0], datetime)}
+        return self.invalidate_dates(dates)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
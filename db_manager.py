@@ -3,14 +3,19 @@ Database Manager for ZDEnergy Analytics
 Handles PostgreSQL connections, schema management, and data operations
 """
 
+import io
 import os
+import queue
+import threading
+import numpy as np
 import psycopg2
 from psycopg2 import pool, sql
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import Any, Iterator, List, Dict, Optional, Tuple
 import logging
 from dotenv import load_dotenv
+from sensor_dictionary import SensorDictionary
 
 # Load environment variables
 load_dotenv()
@@ -19,6 +24,203 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Natural key of a reading (added to existing databases by migrate_add_unique_reading_key.py)
+READING_KEY_CONSTRAINT = "uq_sensor_readings_sensor_ts"
+UNKNOWN_SENSOR_ID = "unknown"
+
+# Apply pending schema migrations on startup (see schema_migrations.py);
+# false only warns, for deployments that migrate from the command line
+DB_AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', 'true').lower() == 'true'
+
+# sensors dimension table (see sensor_dictionary.py) and the view that joins
+# the external sensor id back onto the readings
+SENSORS_TABLE = "sensors"
+NAMED_READINGS_VIEW = "sensor_readings_named"
+
+# Rows returned at most by the list readers (get_readings_by_time_range/_date).
+# Larger ranges stream through iter_readings_arrays or get_readings_page.
+LIST_READ_LIMIT = int(os.getenv('DB_LIST_READ_LIMIT', '100000'))
+
+# Monthly range partitions of sensor_readings (see schema_migrations.py and
+# migrate_partition_sensor_readings.py for existing databases)
+PARTITION_PREFIX = "sensor_readings_p"        # + YYYYMM
+DEFAULT_PARTITION = "sensor_readings_default"  # Catches rows outside every monthly partition
+PARTITION_MONTHS_AHEAD = int(os.getenv('DB_PARTITION_MONTHS_AHEAD', '3'))
+
+# Rollup tables: per sensor and time bucket, count/sum/min/max of every metric.
+# resolution -> (table, bucket expression over "timestamp", bucket width)
+ROLLUPS = {
+    "1m": ("sensor_rollup_1m", "date_trunc('minute', timestamp)", timedelta(minutes=1)),
+    "30m": (
+        "sensor_rollup_30m",
+        "date_trunc('hour', timestamp) + floor(date_part('minute', timestamp) / 30) * interval '30 minutes'",
+        timedelta(minutes=30),
+    ),
+    "1h": ("sensor_rollup_1h", "date_trunc('hour', timestamp)", timedelta(hours=1)),
+    "1d": ("sensor_rollup_1d", "date_trunc('day', timestamp)", timedelta(days=1)),
+}
+# Rollup column prefix -> sensor_readings column
+ROLLUP_METRICS = {
+    "temp": "temperature",
+    "rh": "humidity",
+    "lux": "lux",
+    "irradiance": "irradiance",
+}
+
+# CSV export via COPY: bytes per chunk handed to the HTTP response, and how
+# many chunks may wait in memory before COPY is paused (bounded memory)
+COPY_CHUNK_BYTES = 64 * 1024
+COPY_QUEUE_CHUNKS = 16
+
+# Columnar fetch via COPY ... TO STDOUT (FORMAT binary), see get_readings_arrays
+# and iter_readings_arrays
+ARRAY_COLUMNS = ("temperature", "humidity", "lux", "irradiance")
+_PG_COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\0"
+_PG_COPY_HEADER = 19  # Signature, flags, header extension length
+_PG_COPY_TRAILER = b"\xff\xff"  # int16 -1
+_PG_EPOCH = np.datetime64("2000-01-01T00:00:00", "us")
+
+def _rollup_select(table: str, bucket: str, source: str, alias: str = "") -> str:
+    """SELECT aggregating ``source`` rows into rollup rows for ``table``"""
+    aggregates = ",\n".join(
+        f"COUNT({column}), COALESCE(SUM({column}), 0), MIN({column}), MAX({column})"
+        for column in ROLLUP_METRICS.values()
+    )
+    columns = ", ".join(
+        f"{prefix}_count, {prefix}_sum, {prefix}_min, {prefix}_max" for prefix in ROLLUP_METRICS
+    )
+    return f"""
+        INSERT INTO {table} {alias} (bucket, sensor_id, sample_count, {columns})
+        SELECT {bucket}, COALESCE(sensor_id, '{UNKNOWN_SENSOR_ID}'), COUNT(*),
+               {aggregates}
+        FROM {source}
+        GROUP BY 1, 2
+    """
+
+
+def _rollup_merge_ctes(source: str) -> str:
+    """
+    Data-modifying CTEs that add the rows of ``source`` (a RETURNING CTE of
+    newly inserted readings) to every rollup table: counts and sums are
+    added, minima and maxima widened.
+    """
+    merges = ",\n".join(
+        f"{prefix}_count = t.{prefix}_count + EXCLUDED.{prefix}_count, "
+        f"{prefix}_sum = t.{prefix}_sum + EXCLUDED.{prefix}_sum, "
+        f"{prefix}_min = LEAST(t.{prefix}_min, EXCLUDED.{prefix}_min), "
+        f"{prefix}_max = GREATEST(t.{prefix}_max, EXCLUDED.{prefix}_max)"
+        for prefix in ROLLUP_METRICS
+    )
+    ctes = []
+    for resolution, (table, bucket, _) in ROLLUPS.items():
+        ctes.append(f"""
+        rollup_{resolution} AS (
+            {_rollup_select(table, bucket, source, alias="AS t")}
+            ON CONFLICT (sensor_id, bucket) DO UPDATE SET
+                sample_count = t.sample_count + EXCLUDED.sample_count,
+                {merges},
+                updated_at = NOW()
+        )""")
+    return ",".join(ctes)
+
+
+def qatar_date_range(oldest: Optional[datetime], newest: Optional[datetime]) -> Dict[str, Optional[str]]:
+    """Database (GMT+8) oldest/newest timestamps -> Qatar (GMT+3) 'YYYY-MM-DD' dates"""
+    shift = timedelta(hours=5)
+    return {
+        'min_date': (oldest - shift).strftime('%Y-%m-%d') if oldest else None,
+        'max_date': (newest - shift).strftime('%Y-%m-%d') if newest else None
+    }
+
+
+def _binary_header_size(data: bytes) -> int:
+    """Size of the binary COPY header at the start of ``data`` (which holds at least _PG_COPY_HEADER bytes)"""
+    if not data.startswith(_PG_COPY_SIGNATURE):
+        raise ValueError("not a PostgreSQL binary COPY stream")
+    return _PG_COPY_HEADER + int.from_bytes(data[15:19], "big")
+
+
+def _binary_row_type(columns: Tuple[str, ...], with_id: bool = False) -> np.dtype:
+    """Fixed layout of one (timestamp, [id,] real, real, ...) row: field count, then length + value per field"""
+    fields = [("nfields", ">i2"), ("ts_len", ">i4"), ("timestamp", ">i8")]
+    if with_id:
+        fields += [("id_len", ">i4"), ("id", ">i8")]
+    for name in columns:
+        fields += [(f"{name}_len", ">i4"), (name, ">f4")]
+    return np.dtype(fields)
+
+
+def decode_binary_copy(data: bytes, columns: Tuple[str, ...], with_id: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Decode COPY binary output of (timestamp without time zone, real, real, ...)
+    rows with no NULLs into NumPy arrays, without touching rows in Python.
+
+    Every row then has the same size (field count, then length + value per
+    field), so the whole body is one big-endian structured array. With
+    ``with_id`` the rows carry the int8 row id after the timestamp.
+    """
+    body = memoryview(data)[_binary_header_size(data):len(data) - len(_PG_COPY_TRAILER)]
+    return _decode_binary_rows(body, columns, with_id)
+
+
+def _decode_binary_rows(body, columns: Tuple[str, ...], with_id: bool = False) -> Dict[str, np.ndarray]:
+    """Decode whole binary COPY rows (no header or trailer) into NumPy arrays"""
+    row_type = _binary_row_type(columns, with_id)
+    if len(body) % row_type.itemsize:
+        raise ValueError("unexpected row layout in binary COPY stream")
+    rows = np.frombuffer(body, dtype=row_type)
+    if len(rows) and (
+        np.any(rows["nfields"] != len(columns) + 1 + with_id)
+        or np.any(rows["ts_len"] != 8)
+        or (with_id and np.any(rows["id_len"] != 8))
+        or any(np.any(rows[f"{name}_len"] != 4) for name in columns)
+    ):
+        raise ValueError("unexpected field sizes in binary COPY stream")
+
+    arrays = {"timestamp": _PG_EPOCH + rows["timestamp"].astype(np.int64).astype("timedelta64[us]")}
+    if with_id:
+        arrays["id"] = rows["id"].astype(np.int64)
+    for name in columns:
+        arrays[name] = rows[name].astype(np.float32)
+    return arrays
+
+
+def is_row_error(error: Exception) -> bool:
+    """
+    True if the database rejected the rows themselves (a value out of range,
+    a string too long, a constraint), so retrying the same rows cannot work.
+    Anything else (connection lost, pool exhausted) may pass on a retry.
+    """
+    return isinstance(error, (psycopg2.DataError, psycopg2.IntegrityError, ValueError, TypeError))
+
+
+def month_start(value: datetime) -> datetime:
+    """First instant of the month containing value (naive)"""
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Month start shifted by a number of months"""
+    years, month_index = divmod(value.month - 1 + months, 12)
+    return datetime(value.year + years, month_index + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+_READING_COLUMNS = "(timestamp, sensor_id, temperature, humidity, lux, irradiance)"
+_LEGACY_READING_COLUMNS = "(timestamp, temperature, humidity, lux, irradiance)"  # Before schema migration 2
+_KEYED_READING_COLUMNS = "(timestamp, sensor_key, temperature, humidity, lux, irradiance)"  # sensors dictionary
+_ON_CONFLICT = {
+    "nothing": "ON CONFLICT ({sensor}, timestamp) DO NOTHING",
+    "update": """ON CONFLICT ({sensor}, timestamp) DO UPDATE SET
+                    temperature = EXCLUDED.temperature,
+                    humidity = EXCLUDED.humidity,
+                    lux = EXCLUDED.lux,
+                    irradiance = EXCLUDED.irradiance""",
+}
+
 
 class DatabaseManager:
     """Manages database connections and operations"""
@@ -26,6 +228,13 @@ class DatabaseManager:
     def __init__(self):
         """Initialize database connection pool"""
         self.connection_pool = None
+        # Capability flags, set by detect_capabilities
+        self.has_sensor_id = True
+        self.has_sensor_dictionary = False
+        self.has_reading_key = False
+        self.is_partitioned = False
+        self.has_rollups = False
+        self.sensors = SensorDictionary(self)
         self._create_connection_pool()
     
     def _create_connection_pool(self):
@@ -55,9 +264,9 @@ class DatabaseManager:
             raise
     
     def return_connection(self, conn):
-        """Return a connection to the pool"""
+        """Return a connection to the pool (broken connections are discarded)"""
         try:
-            self.connection_pool.putconn(conn)
+            self.connection_pool.putconn(conn, close=bool(conn.closed))
         except Exception as e:
             logger.error(f"❌ Failed to return connection: {e}")
     
@@ -68,74 +277,97 @@ class DatabaseManager:
             logger.info("✅ All database connections closed")
     
     def initialize_schema(self):
-        """Create database tables if they don't exist"""
+        """
+        Bring the schema up to date (see schema_migrations.py) and detect
+        which optional features the database supports. On a current schema
+        this costs two catalog queries and no DDL.
+        """
+        from schema_migrations import run_migrations
+        
+        run_migrations(self, apply=DB_AUTO_MIGRATE)
+        self.detect_capabilities()
+        logger.info("✅ Database schema initialized successfully")
+    
+    def detect_capabilities(self):
+        """
+        Set the capability flags the write and read paths branch on, from a
+        single catalog query. Called once at startup instead of probing with
+        failing statements on every insert.
+        """
         conn = None
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-            
-            # Create sensor_readings table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS sensor_readings (
-                    id SERIAL PRIMARY KEY,
-                    timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                    sensor_id VARCHAR(100),
-                    temperature REAL,
-                    humidity REAL,
-                    lux REAL,
-                    irradiance REAL,
-                    created_at TIMESTAMPTZ DEFAULT NOW()
-                );
-            """)
-            
-            # Create index for fast time-based queries
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_sensor_readings_timestamp 
-                ON sensor_readings (timestamp DESC);
-            """)
-            
-            # Create KPI snapshots table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS kpi_snapshots (
-                    id SERIAL PRIMARY KEY,
-                    timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                    kpi_name VARCHAR(100) NOT NULL,
-                    value REAL NOT NULL,
-                    unit VARCHAR(50),
-                    metadata JSONB,
-                    created_at TIMESTAMPTZ DEFAULT NOW()
-                );
-            """)
-            
-            # Create index for KPI queries
             cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_kpi_snapshots_timestamp 
-                ON kpi_snapshots (timestamp DESC, kpi_name);
-            """)
-            
-            # Create system configuration table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS system_config (
-                    id SERIAL PRIMARY KEY,
-                    config_key VARCHAR(100) UNIQUE NOT NULL,
-                    config_value TEXT NOT NULL,
-                    description TEXT,
-                    updated_at TIMESTAMPTZ DEFAULT NOW()
-                );
-            """)
-            
-            conn.commit()
-            logger.info("✅ Database schema initialized successfully")
-            
+                SELECT
+                    EXISTS (SELECT 1 FROM information_schema.columns
+                            WHERE table_name = 'sensor_readings' AND column_name IN ('sensor_id', 'sensor_key')),
+                    EXISTS (SELECT 1 FROM information_schema.columns
+                            WHERE table_name = 'sensor_readings' AND column_name = 'sensor_key'),
+                    EXISTS (SELECT 1 FROM pg_constraint WHERE conname = %s),
+                    EXISTS (SELECT 1 FROM pg_partitioned_table
+                            WHERE partrelid = to_regclass('sensor_readings')),
+                    to_regclass(%s) IS NOT NULL;
+            """, (READING_KEY_CONSTRAINT, ROLLUPS["1d"][0]))
+            (self.has_sensor_id, self.has_sensor_dictionary, self.has_reading_key,
+             self.is_partitioned, self.has_rollups) = cursor.fetchone()
+            conn.rollback()
         except Exception as e:
-            if conn:
-                conn.rollback()
-            logger.error(f"❌ Failed to initialize schema: {e}")
+            logger.error(f"❌ Failed to detect database capabilities: {e}")
             raise
         finally:
             if conn:
                 cursor.close()
                 self.return_connection(conn)
+        
+        if not self.has_sensor_id:
+            logger.warning("⚠️  sensor_readings has no sensor_id column - run python schema_migrations.py")
+        if not self.has_reading_key:
+            logger.warning(
+                "⚠️  sensor_readings has no (sensor_id, timestamp) key - duplicates are not rejected. "
+                "Run migrate_add_unique_reading_key.py"
+            )
+        if not self.is_partitioned:
+            logger.warning(
+                "⚠️  sensor_readings is not partitioned - retention falls back to DELETE. "
+                "Run migrate_partition_sensor_readings.py"
+            )
+        if not self.has_rollups:
+            logger.warning("⚠️  Rollup tables are missing - run python schema_migrations.py")
+        if self.has_sensor_dictionary:
+            logger.info(f"📇 Loaded {self.sensors.load()} sensors into the sensor dictionary")
+        elif self.has_sensor_id:
+            logger.warning(
+                "⚠️  sensor_readings stores sensor_id as text in every row. "
+                "Run migrate_sensor_dictionary.py"
+            )
+    
+    @property
+    def sensor_column(self) -> str:
+        """Column of sensor_readings that identifies the sensor"""
+        return "sensor_key" if self.has_sensor_dictionary else "sensor_id"
+    
+    @property
+    def named_readings(self) -> str:
+        """Relation with a text sensor_id column: the dictionary view or the table itself"""
+        return NAMED_READINGS_VIEW if self.has_sensor_dictionary else "sensor_readings"
+    
+    def _sensor_filter(self, sensor_id: str, placeholder: str = "%s") -> Tuple[str, Any]:
+        """
+        Condition and parameter selecting one sensor's rows of sensor_readings.
+        With the dictionary the external id is resolved to its key first; an
+        unknown id becomes NULL, which matches no row.
+        """
+        if self.has_sensor_dictionary:
+            return f"sensor_key = {placeholder}", self.sensors.key(sensor_id)
+        return f"sensor_id = {placeholder}", sensor_id
+    
+    def _sensor_clause(self, sensor_id: Optional[str]) -> Tuple[str, Tuple]:
+        """'AND <condition>' and its parameters for an optional sensor filter"""
+        if not sensor_id:
+            return "", ()
+        condition, value = self._sensor_filter(sensor_id)
+        return f"AND {condition}", (value,)
     
     def insert_sensor_reading(
         self, 
@@ -145,10 +377,10 @@ class DatabaseManager:
         irradiance: Optional[float] = None,
         timestamp: Optional[datetime] = None,
         sensor_id: Optional[str] = None
-    ) -> int:
+    ) -> Optional[int]:
         """
         Insert a sensor reading into the database
-        Returns the inserted record ID
+        Returns the inserted record ID (None if the reading already exists)
         """
         conn = None
         try:
@@ -161,30 +393,15 @@ class DatabaseManager:
                 timestamp = datetime.utcnow() + timedelta(hours=8)
             # Just use timestamp as-is (no timezone conversion)
             
-            # Try inserting with sensor_id, fall back to without if column doesn't exist
-            try:
-                cursor.execute("""
-                    INSERT INTO sensor_readings (timestamp, sensor_id, temperature, humidity, lux, irradiance)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    RETURNING id;
-                """, (timestamp, sensor_id, temperature, humidity, lux, irradiance))
-            except Exception as e:
-                if "sensor_id" in str(e) and "does not exist" in str(e):
-                    # Column doesn't exist, rollback and insert without it
-                    conn.rollback()
-                    logger.warning("⚠️  sensor_id column not found, inserting without it")
-                    cursor.execute("""
-                        INSERT INTO sensor_readings (timestamp, temperature, humidity, lux, irradiance)
-                        VALUES (%s, %s, %s, %s, %s)
-                        RETURNING id;
-                    """, (timestamp, temperature, humidity, lux, irradiance))
-                else:
-                    raise
-            
-            record_id = cursor.fetchone()[0]
+            on_conflict = _ON_CONFLICT["nothing"] if self.has_reading_key else ""
+            params = self._reading_rows([(timestamp, sensor_id, temperature, humidity, lux, irradiance)])[0]
+            placeholders = f"({', '.join(['%s'] * len(params))})"
+            cursor.execute(self._insert_statement(placeholders, on_conflict, "id"), params)
+            
+            row = cursor.fetchone()
             conn.commit()
             
-            return record_id
+            return row[0] if row else None
             
         except Exception as e:
             if conn:
@@ -196,6 +413,194 @@ class DatabaseManager:
                 cursor.close()
                 self.return_connection(conn)
     
+    def _write_readings(self, cursor, rows: List[Tuple], on_conflict: str) -> int:
+        """
+        Multi-row INSERT of reading tuples on an open cursor (no commit).
+
+        Rows sharing a (sensor_id, timestamp) key are collapsed first, keeping
+        the last one: PostgreSQL rejects an upsert that touches a row twice.
+        The rollup tables are updated in the same statement from the rows
+        actually inserted, so skipped duplicates are never counted twice.
+        Returns the number of rows inserted or updated.
+        """
+        if not rows:
+            return 0
+
+        conflict_clause = ""
+        if self.has_reading_key:
+            unique = {}
+            for row in rows:
+                row = (row[0], row[1] or UNKNOWN_SENSOR_ID) + tuple(row[2:])
+                unique[(row[1], row[0])] = row
+            rows = list(unique.values())
+            conflict_clause = _ON_CONFLICT[on_conflict].format(sensor=self.sensor_column)
+
+        # Overwritten values cannot be subtracted from the rollups, so
+        # recompute the affected days from the raw rows instead
+        recompute = on_conflict == "update" and self.has_reading_key and self.has_rollups
+        result = execute_values(
+            cursor,
+            self._insert_statement("%s", conflict_clause, "1", merge_rollups=not recompute),
+            self._reading_rows(rows),
+            page_size=len(rows),
+            fetch=True
+        )
+        if recompute:
+            timestamps = [row[0] for row in rows]
+            self._refresh_rollups(cursor, min(timestamps), max(timestamps))
+        return len(result)
+
+    def _reading_rows(self, rows: List[Tuple]) -> List[Tuple]:
+        """(timestamp, sensor_id, ...) tuples -> parameters for _insert_statement"""
+        if not self.has_sensor_id:
+            return [(row[0],) + tuple(row[2:]) for row in rows]
+        rows = [(row[0], row[1] or UNKNOWN_SENSOR_ID) + tuple(row[2:]) for row in rows]
+        if self.has_sensor_dictionary:
+            keys = self.sensors.keys({row[1] for row in rows})
+            rows = [(row[0], keys[row[1]]) + row[2:] for row in rows]
+        return rows
+
+    def _insert_statement(self, values: str, conflict_clause: str, returning: str, merge_rollups: bool = True) -> str:
+        """
+        INSERT into sensor_readings shaped by the capability flags: sensor
+        keys or text ids (or the legacy column list without either), and
+        the rollup merge only where the rollup tables exist.
+        """
+        if self.has_sensor_dictionary:
+            columns = _KEYED_READING_COLUMNS
+        else:
+            columns = _READING_COLUMNS if self.has_sensor_id else _LEGACY_READING_COLUMNS
+        if not (merge_rollups and self.has_rollups and self.has_sensor_id):
+            return f"""
+                INSERT INTO sensor_readings {columns}
+                VALUES {values}
+                {conflict_clause}
+                RETURNING {returning};
+            """
+        # Rollups are keyed by the external id
+        named, source = "", "inserted"
+        if self.has_sensor_dictionary:
+            named = f"""
+            inserted_named AS (
+                SELECT i.*, s.external_id AS sensor_id
+                FROM inserted i JOIN {SENSORS_TABLE} s ON s.id = i.sensor_key
+            ),"""
+            source = "inserted_named"
+        return f"""
+            WITH inserted AS (
+                INSERT INTO sensor_readings {columns}
+                VALUES {values}
+                {conflict_clause}
+                RETURNING *
+            ),{named}{_rollup_merge_ctes(source)}
+            SELECT {returning} FROM inserted;
+        """
+
+    def upsert_sensor_readings_batch(self, rows: List[Tuple], on_conflict: str = "nothing") -> int:
+        """
+        Insert many sensor readings with a single multi-row INSERT and one commit,
+        skipping or overwriting readings that already exist.
+
+        Args:
+            rows: Tuples of (timestamp, sensor_id, temperature, humidity, lux, irradiance)
+            on_conflict: "nothing" keeps the stored reading (retransmits, replays),
+                "update" overwrites its values (backfills that correct data)
+
+        Returns:
+            Number of rows inserted (or updated with on_conflict="update")
+        """
+        if on_conflict not in _ON_CONFLICT:
+            raise ValueError(f"on_conflict must be one of {sorted(_ON_CONFLICT)}")
+        if not rows:
+            return 0
+
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            written = self._write_readings(cursor, rows, on_conflict)
+            conn.commit()
+            return written
+
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"❌ Failed to insert sensor reading batch ({len(rows)} rows): {e}")
+            raise
+        finally:
+            if conn:
+                cursor.close()
+                self.return_connection(conn)
+
+    def insert_sensor_readings_batch(self, rows: List[Tuple]) -> int:
+        """
+        Insert many sensor readings with a single multi-row INSERT and one commit.
+        Readings already stored for the same sensor and timestamp are skipped.
+
+        Args:
+            rows: Tuples of (timestamp, sensor_id, temperature, humidity, lux, irradiance)
+
+        Returns:
+            Number of rows written
+        """
+        return self.upsert_sensor_readings_batch(rows, on_conflict="nothing")
+
+    def insert_spooled_readings_batch(self, rows: List[Tuple], spool_id: str, end_offset: int) -> int:
+        """
+        Insert replayed spool rows and advance the spool checkpoint atomically.
+
+        Args:
+            rows: Tuples of (timestamp, sensor_id, temperature, humidity, lux, irradiance)
+            spool_id: Identifier of the spool file the rows came from
+            end_offset: Spool byte offset just past the last row in this batch
+
+        Returns:
+            Number of rows written
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            written = self._write_readings(cursor, rows, "nothing")
+            cursor.execute("""
+                INSERT INTO spool_checkpoints (spool_id, byte_offset, updated_at)
+                VALUES (%s, %s, NOW())
+                ON CONFLICT (spool_id) DO UPDATE
+                SET byte_offset = GREATEST(spool_checkpoints.byte_offset, EXCLUDED.byte_offset),
+                    updated_at = NOW();
+            """, (spool_id, end_offset))
+            conn.commit()
+
+            return written
+
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"❌ Failed to replay spooled readings ({len(rows)} rows): {e}")
+            raise
+        finally:
+            if conn:
+                cursor.close()
+                self.return_connection(conn)
+
+    def get_spool_checkpoint(self, spool_id: str) -> Optional[int]:
+        """Byte offset up to which a spool file has been replayed, if any"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT byte_offset FROM spool_checkpoints WHERE spool_id = %s;",
+                (spool_id,)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+        finally:
+            if conn:
+                cursor.close()
+                self.return_connection(conn)
+
     def get_latest_readings(self, limit: int = 100) -> List[Dict]:
         """Get the most recent sensor readings"""
         conn = None
@@ -224,23 +629,37 @@ class DatabaseManager:
     def get_readings_by_time_range(
         self, 
         start_time: datetime, 
-        end_time: datetime
+        end_time: datetime,
+        sensor_id: Optional[str] = None,
+        limit: int = LIST_READ_LIMIT
     ) -> List[Dict]:
-        """Get sensor readings within a time range (converts to Qatar time)"""
+        """
+        Get sensor readings within a time range, optionally for one sensor.
+
+        At most ``limit`` rows (the oldest) are returned, so a long range
+        cannot load every row into memory; use iter_readings_arrays or
+        get_readings_page to walk large ranges.
+        """
         conn = None
         try:
             conn = self.get_connection()
             cursor = conn.cursor(cursor_factory=RealDictCursor)
             
+            sensor_clause, sensor_params = self._sensor_clause(sensor_id)
+            params = (start_time, end_time) + sensor_params
+            
             # Use times as-is (no timezone conversion)
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT timestamp, temperature, humidity, lux, irradiance
                 FROM sensor_readings
-                WHERE timestamp BETWEEN %s AND %s
-                ORDER BY timestamp ASC;
-            """, (start_time, end_time))
+                WHERE timestamp BETWEEN %s AND %s {sensor_clause}
+                ORDER BY timestamp ASC
+                LIMIT %s;
+            """, params + (int(limit),))
             
             results = cursor.fetchall()
+            if len(results) >= limit:
+                logger.warning(f"⚠️ Time range read capped at {limit} rows; stream larger ranges with iter_readings_arrays")
             return [dict(row) for row in results]
             
         except Exception as e:
@@ -251,19 +670,401 @@ class DatabaseManager:
                 cursor.close()
                 self.return_connection(conn)
     
-    def get_readings_by_window(self, window_minutes: int = 60) -> List[Dict]:
+    def get_readings_since(
+        self,
+        start_time: datetime,
+        limit: int,
+        sensor_id: Optional[str] = None,
+        columns: Tuple[str, ...] = ARRAY_COLUMNS
+    ) -> Dict[str, np.ndarray]:
+        """
+        The first ``limit`` readings at or after ``start_time``, oldest first.
+
+        An index range scan on the timestamp, for ``/api/data?since=`` deltas,
+        returned as arrays like get_readings_arrays. Readings with the same
+        timestamp are ordered by id, so repeated calls return them in the
+        same order. Errors are raised, because an empty delta means
+        "nothing new".
+        """
+        columns = tuple(columns)
+        query, params = self._arrays_query(
+            columns, ["timestamp >= %s"], [start_time], sensor_id, 0,
+            order="ORDER BY timestamp ASC, id ASC LIMIT %s"
+        )
+        return self._fetch_arrays(query, params + [int(limit)], columns)
+    
+    def get_readings_page(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        page_size: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        sensor_id: Optional[str] = None,
+        columns: Tuple[str, ...] = ARRAY_COLUMNS
+    ) -> Dict[str, np.ndarray]:
+        """
+        One keyset page of a time range: up to ``page_size`` readings after
+        the ``(timestamp, id)`` key ``after``, in (timestamp, id) order.
+
+        Returned as arrays like get_readings_arrays, plus ``id`` (int64), so
+        the last row gives the key of the next page. The key condition is
+        spelled as ``timestamp >= t AND (timestamp > t OR id > i)`` so the
+        timestamp index bounds the scan; only rows sharing one timestamp are
+        sorted by id. The cost of a page does not grow with its offset.
+        """
+        columns = tuple(columns)
+        conditions = ["timestamp BETWEEN %s AND %s"]
+        params: List[Any] = [start_time, end_time]
+        if after:
+            after_time, after_id = after
+            conditions.append("timestamp >= %s AND (timestamp > %s OR id > %s)")
+            params += [after_time, after_time, int(after_id)]
+        query, params = self._arrays_query(
+            columns, conditions, params, sensor_id, 0,
+            order="ORDER BY timestamp ASC, id ASC LIMIT %s", with_id=True
+        )
+        return self._fetch_arrays(query, params + [int(page_size)], columns, with_id=True)
+    
+    def get_bucketed_readings(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        buckets: int,
+        sensor_id: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Split start_time..end_time into ``buckets`` equal slices and aggregate each in SQL.
+        
+        Used for server-side chart downsampling (see downsampling.py), so only
+        a few rows per bucket leave the database however long the range is.
+        
+        Returns:
+            One dict per non-empty bucket, in time order: sample_count,
+            first_time, last_time and <temp|rh|lux|irradiance>_min/_max
+        """
+        width = max((end_time - start_time).total_seconds() / max(buckets, 1), 0.001)
+        metrics = ",\n".join(
+            f"MIN({column}) AS {prefix}_min, MAX({column}) AS {prefix}_max"
+            for prefix, column in ROLLUP_METRICS.items()
+        )
+        sensor_clause, sensor_value = "", None
+        if sensor_id:
+            condition, sensor_value = self._sensor_filter(sensor_id, "%(sensor)s")
+            sensor_clause = f"AND {condition}"
+        
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(f"""
+                SELECT floor(extract(epoch FROM timestamp - %(start)s::timestamptz) / %(width)s) AS bucket,
+                       COUNT(*) AS sample_count,
+                       MIN(timestamp) AS first_time,
+                       MAX(timestamp) AS last_time,
+                       {metrics}
+                FROM sensor_readings
+                WHERE timestamp BETWEEN %(start)s AND %(end)s {sensor_clause}
+                GROUP BY 1
+                ORDER BY 1;
+            """, {'start': start_time, 'end': end_time, 'width': width, 'sensor': sensor_value})
+            
+            return [dict(row) for row in cursor.fetchall()]
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to get bucketed readings: {e}")
+            raise
+        finally:
+            if conn:
+                cursor.close()
+                self.return_connection(conn)
+    
+    def iter_readings_csv(
+        self,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        sensor_id: Optional[str] = None,
+        shift_hours: int = -5
+    ) -> Iterator[bytes]:
+        """
+        Stream readings as CSV bytes produced by PostgreSQL's COPY TO STDOUT.
+
+        Time shifting (default GMT+8 -> Qatar GMT+3), timestamp formatting and
+        rounding happen in SQL, so Python only forwards chunks (see _iter_copy:
+        memory stays bounded whatever the range).
+
+        Args:
+            start_time: Inclusive lower bound (None = from the oldest reading)
+            end_time: Inclusive upper bound (None = up to the newest reading)
+            sensor_id: Only export readings from this sensor
+            shift_hours: Hours added to the stored timestamps
+
+        Yields:
+            CSV chunks including the header row
+        """
+        conditions = []
+        params: List[Any] = [f"{int(shift_hours)} hours"]
+        if start_time is not None:
+            conditions.append("timestamp >= %s")
+            params.append(start_time)
+        if end_time is not None:
+            conditions.append("timestamp <= %s")
+            params.append(end_time)
+        if sensor_id:
+            condition, value = self._sensor_filter(sensor_id)
+            conditions.append(condition)
+            params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+            SELECT
+                to_char(timestamp + %s::interval, 'YYYY-MM-DD HH24:MI:SS') AS "Timestamp",
+                round(temperature::numeric, 2) AS "Temperature (°C)",
+                round(humidity::numeric, 2) AS "Humidity (%%)",
+                round(lux::numeric, 2) AS "Lux",
+                round(irradiance::numeric, 3) AS "Irradiance (W/m²)"
+            FROM sensor_readings
+            {where}
+            ORDER BY timestamp ASC
+        """
+
+        return self._iter_copy(query, params, "FORMAT csv, HEADER true", "CSV export")
+    
+    def _iter_copy(self, query: str, params: List[Any], options: str, label: str) -> Iterator[bytes]:
+        """
+        Run ``COPY (query) TO STDOUT WITH (options)`` and yield its output in chunks.
+
+        COPY runs on a background thread feeding a bounded queue; when the
+        consumer falls behind, COPY blocks, so memory stays at about
+        COPY_QUEUE_CHUNKS x COPY_CHUNK_BYTES whatever the size of the result.
+        The connection is taken when the generator is first advanced.
+        """
+        chunks: "queue.Queue[Any]" = queue.Queue(maxsize=COPY_QUEUE_CHUNKS)
+        cancelled = threading.Event()
+        done = object()
+
+        def put(item: Any) -> None:
+            # Blocks while the queue is full, but gives up once the consumer is gone
+            while not cancelled.is_set():
+                try:
+                    chunks.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+            raise RuntimeError(f"{label} cancelled")
+
+        class _Sink:
+            """File-like target for copy_expert that batches rows into chunks"""
+            def __init__(self):
+                self.buffer = bytearray()
+
+            def write(self, data):
+                self.buffer += data.encode("utf-8") if isinstance(data, str) else data
+                if len(self.buffer) >= COPY_CHUNK_BYTES:
+                    put(bytes(self.buffer))
+                    self.buffer.clear()
+
+        def run_copy(conn) -> None:
+            cursor = conn.cursor()
+            try:
+                sink = _Sink()
+                copy_sql = cursor.mogrify(query, params).decode("utf-8")
+                cursor.copy_expert(f"COPY ({copy_sql}) TO STDOUT WITH ({options})", sink)
+                if sink.buffer:
+                    put(bytes(sink.buffer))
+                put(done)
+            except Exception as e:
+                # A COPY aborted half way leaves the connection unusable
+                conn.close()
+                if not cancelled.is_set():
+                    logger.error(f"❌ {label} COPY failed: {e}")
+                    try:
+                        put(e)
+                    except RuntimeError:
+                        pass
+            finally:
+                if not conn.closed:
+                    cursor.close()
+                    conn.rollback()
+                self.return_connection(conn)
+
+        def generate() -> Iterator[bytes]:
+            conn = self.get_connection()  # Fail here (before any output) if the DB is down
+            thread = threading.Thread(target=run_copy, args=(conn,), daemon=True, name="copy-stream")
+            thread.start()
+            try:
+                while True:
+                    item = chunks.get()
+                    if item is done:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                # Client went away or we finished: let the COPY thread exit
+                cancelled.set()
+
+        return generate()
+    
+    def get_readings_arrays(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        columns: Tuple[str, ...] = ARRAY_COLUMNS,
+        sensor_id: Optional[str] = None,
+        shift_hours: int = 0
+    ) -> Dict[str, np.ndarray]:
+        """
+        Fetch readings as NumPy arrays through a binary COPY.
+        
+        Meant for analytics over millions of rows: PostgreSQL sends fixed-size
+        binary rows that are decoded in one vectorized step, so no Python
+        object is created per value.
+        
+        Args:
+            start_time: Inclusive lower bound
+            end_time: Inclusive upper bound
+            columns: Any of temperature, humidity, lux, irradiance
+            sensor_id: Only rows from this sensor
+            shift_hours: Hours added to the timestamps (-5 for Qatar time)
+            
+        Returns:
+            {'timestamp': datetime64[us] wall-clock times, <column>: float32
+            (NaN where NULL)}, ordered by time
+        """
+        columns = tuple(columns)
+        query, params = self._arrays_query(
+            columns, ["timestamp BETWEEN %s AND %s"], [start_time, end_time], sensor_id, shift_hours
+        )
+        return self._fetch_arrays(query, params, columns)
+    
+    def _arrays_query(
+        self,
+        columns: Tuple[str, ...],
+        conditions: List[str],
+        params: List[Any],
+        sensor_id: Optional[str],
+        shift_hours: int,
+        order: str = "ORDER BY timestamp ASC",
+        with_id: bool = False
+    ) -> Tuple[str, List[Any]]:
+        """SELECT of (shifted wall-clock timestamp, [id,] columns...) for the binary COPY readers"""
+        unknown = set(columns) - set(ARRAY_COLUMNS)
+        if unknown:
+            raise ValueError(f"unknown columns {sorted(unknown)}, expected some of {list(ARRAY_COLUMNS)}")
+        conditions = list(conditions)
+        params = [f"{int(shift_hours)} hours", *params]
+        if sensor_id:
+            condition, value = self._sensor_filter(sensor_id)
+            conditions.append(condition)
+            params.append(value)
+        
+        # NULL -> NaN keeps every field fixed-width; AT TIME ZONE gives the
+        # stored wall-clock time, as the other readers return it
+        values = "".join(f", COALESCE({name}, 'NaN'::real)" for name in columns)
+        if with_id:
+            values = ", id::int8" + values
+        query = f"""
+            SELECT (timestamp AT TIME ZONE current_setting('TimeZone')) + %s::interval{values}
+            FROM sensor_readings
+            WHERE {' AND '.join(conditions)}
+            {order}
+        """
+        return query, params
+    
+    def _fetch_arrays(
+        self,
+        query: str,
+        params: List[Any],
+        columns: Tuple[str, ...],
+        with_id: bool = False
+    ) -> Dict[str, np.ndarray]:
+        """Run a binary COPY of an _arrays_query in one go and decode it"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            copy_sql = cursor.mogrify(query, params).decode("utf-8")
+            buffer = io.BytesIO()
+            cursor.copy_expert(f"COPY ({copy_sql}) TO STDOUT WITH (FORMAT binary)", buffer)
+            conn.rollback()
+            return decode_binary_copy(buffer.getvalue(), columns, with_id)
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"❌ Failed to fetch reading arrays: {e}")
+            raise
+        finally:
+            if conn:
+                cursor.close()
+                self.return_connection(conn)
+    
+    def iter_readings_arrays(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        columns: Tuple[str, ...] = ARRAY_COLUMNS,
+        sensor_id: Optional[str] = None,
+        shift_hours: int = 0
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Stream readings as batches of NumPy arrays (same shape as get_readings_arrays).
+
+        The binary COPY is read in COPY_CHUNK_BYTES chunks (see _iter_copy),
+        and every chunk's whole rows are decoded in one np.frombuffer call, so
+        a long range needs bounded memory and no Python object per row.
+        """
+        columns = tuple(columns)
+        query, params = self._arrays_query(
+            columns, ["timestamp BETWEEN %s AND %s"], [start_time, end_time], sensor_id, shift_hours
+        )
+        row_size = _binary_row_type(columns).itemsize
+        
+        def generate() -> Iterator[Dict[str, np.ndarray]]:
+            pending = b""
+            header = None
+            for chunk in self._iter_copy(query, params, "FORMAT binary", "Array stream"):
+                pending += chunk
+                if header is None:
+                    if len(pending) < _PG_COPY_HEADER:
+                        continue
+                    header = _binary_header_size(pending)
+                    if len(pending) < header:
+                        header = None
+                        continue
+                    pending = pending[header:]
+                whole = len(pending) // row_size * row_size
+                if whole:
+                    yield _decode_binary_rows(memoryview(pending)[:whole], columns)
+                    pending = pending[whole:]
+            if header is None or pending != _PG_COPY_TRAILER:
+                raise ValueError("truncated binary COPY stream")
+        
+        return generate()
+    
+    def get_readings_by_window(
+        self,
+        window_minutes: int = 60,
+        sensor_id: Optional[str] = None
+    ) -> List[Dict]:
         """Get sensor readings for the last N minutes (based on database time GMT+8)"""
         # Database stores GMT+8 time, so use that for queries
         # Add 8 hours to current UTC time to match database timezone
         end_time = datetime.utcnow() + timedelta(hours=8)
         start_time = end_time - timedelta(minutes=window_minutes)
-        return self.get_readings_by_time_range(start_time, end_time)
+        return self.get_readings_by_time_range(start_time, end_time, sensor_id)
     
-    def get_readings_by_date(self, date_str: str) -> List[Dict]:
-        """Get all readings for a specific date (YYYY-MM-DD).
+    def get_readings_by_date(
+        self,
+        date_str: str,
+        sensor_id: Optional[str] = None,
+        limit: int = LIST_READ_LIMIT
+    ) -> List[Dict]:
+        """Get the readings of a specific date (YYYY-MM-DD).
         
         Args:
             date_str: Date in format 'YYYY-MM-DD'
+            sensor_id: Only return readings from this sensor
+            limit: Return at most this many (the oldest) readings
             
         Returns:
             List of readings for that day
@@ -278,7 +1079,10 @@ class DatabaseManager:
             start_time = date.replace(hour=0, minute=0, second=0, microsecond=0)
             end_time = date.replace(hour=23, minute=59, second=59, microsecond=999999)
             
-            cursor.execute("""
+            sensor_clause, sensor_params = self._sensor_clause(sensor_id)
+            params = (start_time, end_time) + sensor_params
+            
+            cursor.execute(f"""
                 SELECT 
                     sensor_id as id,
                     timestamp,
@@ -286,12 +1090,15 @@ class DatabaseManager:
                     humidity as rh,
                     lux,
                     irradiance
-                FROM sensor_readings
-                WHERE timestamp >= %s AND timestamp <= %s
-                ORDER BY timestamp ASC;
-            """, (start_time, end_time))
+                FROM {self.named_readings}
+                WHERE timestamp >= %s AND timestamp <= %s {sensor_clause}
+                ORDER BY timestamp ASC
+                LIMIT %s;
+            """, params + (int(limit),))
             
             results = cursor.fetchall()
+            if len(results) >= limit:
+                logger.warning(f"⚠️ Readings of {date_str} capped at {limit} rows; stream them with iter_readings_arrays")
             
             # Convert to list of dicts with proper formatting
             readings = []
@@ -330,21 +1137,15 @@ class DatabaseManager:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            # Convert timestamps to Qatar time before extracting date
-            # Database stores GMT+8. Qatar is GMT+3.
-            # So we subtract 5 hours from the stored timestamp.
+            # Plain MIN/MAX so the timestamp index answers them; the Qatar
+            # shift is applied afterwards (wrapping the column in an
+            # expression would force a full scan)
             cursor.execute("""
-                SELECT 
-                    MIN(timestamp - INTERVAL '5 hours') as min_date,
-                    MAX(timestamp - INTERVAL '5 hours') as max_date
+                SELECT MIN(timestamp), MAX(timestamp)
                 FROM sensor_readings;
             """)
             
-            row = cursor.fetchone()
-            return {
-                'min_date': row[0].strftime('%Y-%m-%d') if row[0] else None,
-                'max_date': row[1].strftime('%Y-%m-%d') if row[1] else None
-            }
+            return qatar_date_range(*cursor.fetchone())
             
         except Exception as e:
             logger.error(f"❌ Failed to get date range: {e}")
@@ -378,10 +1179,10 @@ class DatabaseManager:
                 RETURNING id;
             """, (timestamp, kpi_name, value, unit, psycopg2.extras.Json(metadata or {})))
             
-            record_id = cursor.fetchone()[0]
+            row = cursor.fetchone()
             conn.commit()
             
-            return record_id
+            return row[0] if row else None
             
         except Exception as e:
             if conn:
@@ -464,17 +1265,315 @@ class DatabaseManager:
                 cursor.close()
                 self.return_connection(conn)
     
-    def cleanup_old_data(self, days_to_keep: int = 90):
-        """Delete data older than specified days (for data retention policy)"""
+    def _estimate_rows(self, cursor, table: str) -> int:
+        """Row count of a table (and its partitions) from the planner/statistics collector, no scan"""
+        cursor.execute("""
+            SELECT COALESCE(SUM(GREATEST(COALESCE(s.n_live_tup, 0), c.reltuples::bigint, 0)), 0)
+            FROM pg_class c
+            LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+            WHERE c.oid = %s::regclass
+               OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass);
+        """, (table, table))
+        return int(cursor.fetchone()[0])
+    
+    def get_fast_statistics(self) -> Dict:
+        """
+        Cheap version of get_statistics for frequently polled endpoints.
+        
+        Row counts are estimates (pg_class / pg_stat_user_tables), and the
+        oldest/newest reading come from index-backed MIN/MAX, so nothing
+        scans the tables.
+        """
         conn = None
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            # Database stores GMT+8, so add 8 hours to UTC
-            cutoff_date = datetime.utcnow() + timedelta(hours=8) - timedelta(days=days_to_keep)
+            estimated_readings = self._estimate_rows(cursor, 'sensor_readings')
+            estimated_kpis = self._estimate_rows(cursor, 'kpi_snapshots')
+            cursor.execute("SELECT MIN(timestamp), MAX(timestamp) FROM sensor_readings;")
+            oldest, newest = cursor.fetchone()
+            
+            return {
+                'total_readings': estimated_readings,
+                'oldest_reading': oldest,
+                'newest_reading': newest,
+                'total_kpi_snapshots': estimated_kpis
+            }
             
-            # Delete old sensor readings
+        except Exception as e:
+            logger.error(f"❌ Failed to get fast statistics: {e}")
+            raise
+        finally:
+            if conn:
+                cursor.close()
+                self.return_connection(conn)
+    
+    # ------------------------------------------------------------------
+    # Rollups
+    # ------------------------------------------------------------------
+    
+    def _refresh_rollups(self, cursor, start_time: datetime, end_time: datetime) -> None:
+        """Recompute every rollup for the whole days spanning start_time..end_time"""
+        start = start_time.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = end_time.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        for table, bucket, _ in ROLLUPS.values():
+            cursor.execute(f"DELETE FROM {table} WHERE bucket >= %s AND bucket < %s;", (start, end))
+            cursor.execute(
+                _rollup_select(table, bucket, f"{self.named_readings} WHERE timestamp >= %s AND timestamp < %s") + ";",
+                (start, end)
+            )
+    
+    def refresh_rollups(self, start_time: datetime, end_time: datetime) -> None:
+        """
+        Rebuild the rollups of the days spanning start_time..end_time from raw readings.
+        
+        Used to build rollups for data that existed before the rollup tables
+        (see migrate_build_rollups.py) and after bulk corrections.
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._refresh_rollups(cursor, start_time, end_time)
+            conn.commit()
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"❌ Failed to refresh rollups: {e}")
+            raise
+        finally:
+            if conn:
+                cursor.close()
+                self.return_connection(conn)
+    
+    def get_rollups(
+        self,
+        resolution: str,
+        start_time: datetime,
+        end_time: datetime,
+        sensor_id: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Get aggregated readings per time bucket from a rollup table.
+        
+        Args:
+            resolution: One of "1m", "30m", "1h", "1d"
+            start_time: Inclusive lower bound on the bucket start
+            end_time: Inclusive upper bound on the bucket start
+            sensor_id: One sensor, or None to combine all sensors per bucket
+            
+        Returns:
+            Dicts with bucket, sample_count and <metric>_mean/_min/_max/_sum
+            for temp, rh, lux and irradiance. irradiance_sum (W/m² summed over
+            samples) times the sampling interval in hours gives Wh/m².
+        """
+        if resolution not in ROLLUPS:
+            raise ValueError(f"resolution must be one of {list(ROLLUPS)}")
+        table = ROLLUPS[resolution][0]
+        
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            
+            metrics = ",\n".join(
+                f"""SUM({prefix}_sum) / NULLIF(SUM({prefix}_count), 0) AS {prefix}_mean,
+                    MIN({prefix}_min) AS {prefix}_min,
+                    MAX({prefix}_max) AS {prefix}_max,
+                    SUM({prefix}_sum) AS {prefix}_sum"""
+                for prefix in ROLLUP_METRICS
+            )
+            sensor_clause = "AND sensor_id = %s" if sensor_id else ""
+            params = (start_time, end_time, sensor_id) if sensor_id else (start_time, end_time)
+            cursor.execute(f"""
+                SELECT bucket, SUM(sample_count)::bigint AS sample_count,
+                       {metrics}
+                FROM {table}
+                WHERE bucket BETWEEN %s AND %s {sensor_clause}
+                GROUP BY bucket
+                ORDER BY bucket ASC;
+            """, params)
+            
+            return [dict(row) for row in cursor.fetchall()]
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to get {resolution} rollups: {e}")
+            return []
+        finally:
+            if conn:
+                cursor.close()
+                self.return_connection(conn)
+    
+    # ------------------------------------------------------------------
+    # Partition maintenance
+    # ------------------------------------------------------------------
+    
+    def _create_partition(
+        self, cursor, month: datetime, parent: str = "sensor_readings", prefix: str = PARTITION_PREFIX
+    ) -> bool:
+        """
+        Create the monthly partition starting at ``month`` if it is missing.
+        
+        Rows for that month that already landed in the default partition are
+        moved into the new partition (PostgreSQL refuses to create it otherwise).
+        Migrations building a replacement table pass their own ``prefix`` and
+        rename the partitions when they swap tables.
+        Returns True if a partition was created.
+        """
+        name = f"{prefix}{month:%Y%m}"
+        cursor.execute("SELECT to_regclass(%s);", (name,))
+        if cursor.fetchone()[0] is not None:
+            return False
+        
+        start, end = month, add_months(month, 1)
+        default = DEFAULT_PARTITION if parent == "sensor_readings" else f"{parent}_default"
+        cursor.execute("SELECT to_regclass(%s);", (default,))
+        has_default = cursor.fetchone()[0] is not None
+        strays = False
+        if has_default:
+            cursor.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {default} WHERE timestamp >= %s AND timestamp < %s);",
+                (start, end)
+            )
+            strays = cursor.fetchone()[0]
+        
+        if strays:
+            cursor.execute(f"ALTER TABLE {parent} DETACH PARTITION {default};")
+        cursor.execute(
+            f"CREATE TABLE {name} PARTITION OF {parent} FOR VALUES FROM (%s) TO (%s);",
+            (start, end)
+        )
+        if strays:
+            cursor.execute(f"""
+                WITH moved AS (
+                    DELETE FROM {default} WHERE timestamp >= %s AND timestamp < %s RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved;
+            """, (start, end))
+            cursor.execute(f"ALTER TABLE {parent} ATTACH PARTITION {default} DEFAULT;")
+            logger.info(f"🔧 Moved {cursor.rowcount} rows from {default} into {name}")
+        
+        logger.info(f"✅ Created partition {name}")
+        return True
+    
+    def _ensure_partitions(self, cursor, months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+        """Create partitions for the current month and the next ``months_ahead`` months"""
+        # Database stores GMT+8, so add 8 hours to UTC
+        current = month_start(datetime.utcnow() + timedelta(hours=8))
+        created = []
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if self._create_partition(cursor, month):
+                created.append(partition_name(month))
+        return created
+    
+    def ensure_partitions(self, months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+        """Create upcoming monthly partitions (safe to call repeatedly). Returns created names."""
+        if not self.is_partitioned:
+            return []
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            created = self._ensure_partitions(cursor, months_ahead)
+            conn.commit()
+            return created
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"❌ Failed to create partitions: {e}")
+            raise
+        finally:
+            if conn:
+                cursor.close()
+                self.return_connection(conn)
+    
+    def list_partitions(self) -> List[Dict]:
+        """Monthly partitions of sensor_readings with their month and size"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT c.relname, c.reltuples::bigint, pg_total_relation_size(c.oid)
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'sensor_readings'::regclass
+                ORDER BY c.relname;
+            """)
+            partitions = []
+            for name, estimated_rows, size in cursor.fetchall():
+                month = None
+                if name.startswith(PARTITION_PREFIX):
+                    month = datetime.strptime(name[len(PARTITION_PREFIX):], '%Y%m')
+                partitions.append({
+                    'name': name,
+                    'month': month.strftime('%Y-%m') if month else None,
+                    'estimated_rows': max(estimated_rows, 0),
+                    'bytes': size,
+                })
+            return partitions
+        except Exception as e:
+            logger.error(f"❌ Failed to list partitions: {e}")
+            return []
+        finally:
+            if conn:
+                cursor.close()
+                self.return_connection(conn)
+    
+    def drop_partitions_before(self, cutoff: datetime) -> List[str]:
+        """
+        Detach and drop every monthly partition that lies entirely before cutoff.
+        
+        Each partition is dropped in its own short transaction; no rows are
+        deleted one by one, so there is no bloat and almost no WAL.
+        """
+        dropped = []
+        for partition in self.list_partitions():
+            if partition['month'] is None:
+                continue
+            month = datetime.strptime(partition['month'], '%Y-%m')
+            if add_months(month, 1) > cutoff:
+                continue
+            conn = None
+            try:
+                conn = self.get_connection()
+                cursor = conn.cursor()
+                cursor.execute(f"ALTER TABLE sensor_readings DETACH PARTITION {partition['name']};")
+                cursor.execute(f"DROP TABLE {partition['name']};")
+                conn.commit()
+                dropped.append(partition['name'])
+                logger.info(f"🗑️  Dropped partition {partition['name']}")
+            except Exception as e:
+                if conn:
+                    conn.rollback()
+                logger.error(f"❌ Failed to drop partition {partition['name']}: {e}")
+                raise
+            finally:
+                if conn:
+                    cursor.close()
+                    self.return_connection(conn)
+        return dropped
+    
+    def cleanup_old_data(self, days_to_keep: int = 90):
+        """Delete data older than specified days (for data retention policy)
+        
+        On a partitioned sensor_readings, whole months are dropped first and
+        only the rows of the month containing the cutoff are deleted.
+        """
+        # Database stores GMT+8, so add 8 hours to UTC
+        cutoff_date = datetime.utcnow() + timedelta(hours=8) - timedelta(days=days_to_keep)
+        
+        dropped = self.drop_partitions_before(cutoff_date) if self.is_partitioned else []
+        
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            # Delete old sensor readings (partition pruning limits this to the
+            # boundary month and the default partition)
             cursor.execute("""
                 DELETE FROM sensor_readings
                 WHERE timestamp < %s;
@@ -491,7 +1590,10 @@ class DatabaseManager:
             deleted_kpis = cursor.rowcount
             
             conn.commit()
-            logger.info(f"✅ Cleaned up {deleted_readings} old readings and {deleted_kpis} old KPI snapshots")
+            logger.info(
+                f"✅ Cleaned up {len(dropped)} partitions, {deleted_readings} old readings "
+                f"and {deleted_kpis} old KPI snapshots"
+            )
             
             return deleted_readings, deleted_kpis
             
@@ -508,13 +1610,35 @@ class DatabaseManager:
 
 # Global database manager instance
 db_manager = None
+_db_manager_lock = threading.Lock()
 
 def get_db_manager() -> DatabaseManager:
-    """Get or create the global database manager instance"""
+    """
+    Get or create the global database manager instance.
+
+    Many threads call this at startup (writer, spool replay, stats refresher,
+    maintenance, requests). Creation is serialized, and the manager is only
+    published once migrations and capability detection have succeeded, so
+    no thread sees a second pool or default capability flags.
+    """
     global db_manager
-    if db_manager is None:
-        db_manager = DatabaseManager()
-        db_manager.initialize_schema()
+    manager = db_manager
+    if manager is not None:
+        return manager
+    with _db_manager_lock:
+        if db_manager is None:
+            manager = DatabaseManager()
+            try:
+                manager.initialize_schema()
+            except Exception:
+                manager.close_all_connections()
+                raise
+            db_manager = manager
+        return db_manager
+
+
+def current_db_manager() -> Optional[DatabaseManager]:
+    """The global database manager if it was already created (never connects)"""
     return db_manager
 
 
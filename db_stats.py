@@ -0,0 +1,124 @@
+"""In-process snapshot of database statistics for polled endpoints.
+
+``/api/health``, ``/api/status`` and ``/api/dates`` used to run COUNT(*)
+and MIN/MAX over ``sensor_readings`` on every request, and every open
+dashboard tab polls them. They now read this snapshot instead:
+
+* row counts come from ``pg_class`` / ``pg_stat_user_tables`` estimates
+  (``DatabaseManager.get_fast_statistics``), plus the rows this process has
+  written since the last refresh, so the total keeps moving between refreshes
+* oldest/newest reading come from index-backed MIN/MAX
+* a refresh runs on a background thread once the snapshot is older than
+  ``refresh_seconds``; requests never wait for it, except the very first one
+
+Every snapshot carries ``refreshed_at`` and ``age_seconds`` so clients can
+tell how fresh it is.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from db_manager import qatar_date_range
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseStatsSnapshot:
+    """
+    Cached database statistics, refreshed in the background.
+
+    Usage:
+        snapshot = DatabaseStatsSnapshot(get_db_manager, lambda: writer.persisted)
+        snapshot.get()   # {'total_readings': ..., 'date_range': ..., 'age_seconds': ...}
+    """
+
+    def __init__(
+        self,
+        db_provider: Callable[[], Any],
+        written_counter: Optional[Callable[[], int]] = None,
+        refresh_seconds: float = 30.0,
+    ):
+        """
+        Args:
+            db_provider: Returns the DatabaseManager
+            written_counter: Rows this process has persisted so far (monotonic)
+            refresh_seconds: Age after which a background refresh is started
+        """
+        self.db_provider = db_provider
+        self.written_counter = written_counter
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._stats: Optional[Dict[str, Any]] = None
+        self._refreshed_at: Optional[float] = None
+        self._written_at_refresh = 0
+        self.refreshes = 0
+        self.last_error: Optional[str] = None
+
+    def _written(self) -> int:
+        return self.written_counter() if self.written_counter else 0
+
+    def refresh(self) -> None:
+        """Query the database now (blocking)"""
+        written = self._written()
+        try:
+            stats = self.db_provider().get_fast_statistics()
+        except Exception as e:
+            with self._lock:
+                self.last_error = str(e)
+                self._refreshing = False
+            raise
+        with self._lock:
+            self._stats = stats
+            self._refreshed_at = time.time()
+            self._written_at_refresh = written
+            self._refreshing = False
+            self.refreshes += 1
+            self.last_error = None
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning(f"⚠️  Database statistics refresh failed: {e}")
+
+    def get(self) -> Dict[str, Any]:
+        """
+        The latest snapshot. Starts a background refresh when it is stale;
+        blocks only if there is no snapshot yet.
+
+        Raises:
+            The database error if no snapshot could ever be taken
+        """
+        with self._lock:
+            stale = self._refreshed_at is None or time.time() - self._refreshed_at >= self.refresh_seconds
+            start_refresh = stale and not self._refreshing and self._stats is not None
+            if start_refresh:
+                self._refreshing = True
+        if self._stats is None:
+            self.refresh()
+        elif start_refresh:
+            threading.Thread(target=self._refresh_in_background, daemon=True, name="db-stats-refresh").start()
+
+        with self._lock:
+            stats = dict(self._stats)
+            refreshed_at = self._refreshed_at
+            written_since = max(0, self._written() - self._written_at_refresh)
+        stats['total_readings'] = stats.get('total_readings', 0) + written_since
+        stats['date_range'] = qatar_date_range(stats.get('oldest_reading'), stats.get('newest_reading'))
+        stats['estimated'] = True
+        stats['refreshed_at'] = datetime.utcfromtimestamp(refreshed_at).isoformat() + 'Z'
+        stats['age_seconds'] = round(time.time() - refreshed_at, 1)
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "refresh_seconds": self.refresh_seconds,
+            "refreshes": self.refreshes,
+            "last_error": self.last_error,
+        }
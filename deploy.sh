@@ -19,9 +19,10 @@ echo "📦 Installing dependencies..."
 pip install -r requirements.txt
 
 # Ensure systemd uses a single Gunicorn worker with threads (safe for TCP thread)
+# gunicorn.conf.py sets the worker and thread count (GUNICORN_THREADS in .env)
 if grep -q "ExecStart=.*gunicorn" /etc/systemd/system/zdenergy.service; then
 	echo "🔧 Patching systemd unit for single-worker gunicorn..."
-	sudo sed -i 's/ExecStart=.*gunicorn.*/ExecStart='"$(pwd | sed 's/\//\\\//g')"'\/venv\/bin\/gunicorn -w 1 --threads 8 -b 0.0.0.0:5000 --timeout 120 readings:app/' /etc/systemd/system/zdenergy.service || true
+	sudo sed -i 's/ExecStart=.*gunicorn.*/ExecStart='"$(pwd | sed 's/\//\\\//g')"'\/venv\/bin\/gunicorn -c gunicorn.conf.py -b 0.0.0.0:5000 --timeout 120 readings:app/' /etc/systemd/system/zdenergy.service || true
 	echo "🔄 Reloading systemd daemon..."
 	sudo systemctl daemon-reload
 fi
@@ -0,0 +1,154 @@
+"""Shape-preserving downsampling of reading columns for charts.
+
+A chart a thousand pixels wide cannot show more than about a thousand points
+per series, so ``/api/data?points=N`` reduces the readings server-side
+before they are serialized. Two algorithms are available:
+
+    lttb    Largest-Triangle-Three-Buckets: keeps the points that span the
+            largest triangles with their neighbours, so peaks, dips and the
+            overall shape survive. The default.
+    minmax  Per time bucket, keep the minimum and maximum of each metric.
+            Guarantees that no spike is lost; looks like Chart.js' own
+            min/max decimation.
+
+Both work on the columnar layout of ``ring_buffer`` (``ts`` epoch seconds
+plus one array per metric). Any extra column (e.g. ``time`` holding the
+database datetimes) is carried along unchanged. Each metric is reduced
+separately and the selected rows are merged, so every series keeps its own
+extremes; the result has at most about ``points`` rows per metric.
+
+For database ranges the bulk of the work is done by PostgreSQL:
+``get_bucketed_readings`` returns per-bucket first/last time and min/max
+per metric, ``expand_buckets`` turns those into two rows per bucket, and
+LTTB (if requested) runs on that much smaller set.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+from ring_buffer import VALUE_COLUMNS
+
+METHODS = ("lttb", "minmax")
+DEFAULT_METHOD = "lttb"
+LTTB_OVERSAMPLING = 2  # SQL buckets per output point before LTTB picks the shape
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """
+    Indices of the ``n`` points LTTB keeps from the series (x, y).
+
+    x must be sorted. The first and last points are always kept. Each pick
+    depends on the previous one, so buckets are walked in order, but the
+    triangle areas inside a bucket are computed in one NumPy operation.
+    """
+    size = len(x)
+    if n >= size:
+        return np.arange(size)
+    if n < 3:
+        return np.array([0, size - 1][:max(n, 0)], dtype=np.intp)
+
+    x = x.astype(np.float64, copy=False)
+    y = y.astype(np.float64, copy=False)
+    # n - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, size - 1, n - 1).astype(np.intp)
+    out = np.empty(n, dtype=np.intp)
+    out[0] = 0
+    out[-1] = size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else size
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, buckets: int) -> np.ndarray:
+    """
+    Indices of the minimum and maximum of y in each of ``buckets`` equal time
+    buckets (x sorted). NaNs are ignored; all-NaN buckets contribute nothing.
+    """
+    size = len(x)
+    if size == 0:
+        return np.arange(0)
+    span = float(x[-1] - x[0])
+    if span <= 0 or buckets <= 1:
+        bucket = np.zeros(size, dtype=np.intp)
+    else:
+        bucket = np.minimum(((x - x[0]) * (buckets / span)).astype(np.intp), buckets - 1)
+
+    y = y.astype(np.float64, copy=False)
+    valid = ~np.isnan(y)
+    picks = []
+    for key in (np.where(valid, y, np.inf), np.where(valid, -y, np.inf)):
+        # Sorted by bucket, then value: the first row of each bucket is its extreme
+        order = np.lexsort((key, bucket))
+        starts = np.flatnonzero(np.r_[True, np.diff(bucket[order]) != 0])
+        first = order[starts]
+        picks.append(first[valid[first]])
+    return np.union1d(*picks)
+
+
+def downsample(cols: Dict[str, np.ndarray], points: int, method: str = DEFAULT_METHOD) -> Dict[str, np.ndarray]:
+    """
+    Reduce reading columns to about ``points`` rows per metric.
+
+    Columns are returned unchanged when they already fit.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {list(METHODS)}")
+    x = cols["ts"]
+    size = len(x)
+    if size <= points:
+        return cols
+
+    keep = [np.array([0, size - 1])]
+    for name in VALUE_COLUMNS:
+        y = cols[name]
+        finite = np.flatnonzero(~np.isnan(y))
+        if len(finite) == 0:
+            continue
+        if method == "lttb":
+            keep.append(finite[lttb_indices(x[finite], y[finite], points)])
+        else:
+            keep.append(finite[minmax_indices(x[finite], y[finite], max(1, points // 2))])
+    index = np.unique(np.concatenate(keep))
+    return {name: col[index] for name, col in cols.items()}
+
+
+def expand_buckets(rows: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Turn ``get_bucketed_readings`` rows into reading columns: each bucket
+    becomes a row at its first timestamp holding every metric's minimum and
+    a row at its last timestamp holding the maxima (one row if the bucket
+    has a single sample). ``time`` keeps the database datetimes.
+    """
+    if not rows:
+        return {"ts": np.empty(0), "time": np.empty(0, dtype=object),
+                **{name: np.empty(0, dtype=np.float32) for name in VALUE_COLUMNS}}
+
+    first = np.array([r["first_time"] for r in rows], dtype=object)
+    last = np.array([r["last_time"] for r in rows], dtype=object)
+    single = np.array([r["sample_count"] <= 1 for r in rows])
+
+    time = np.column_stack((first, last)).ravel()
+    keep = np.column_stack((np.ones(len(rows), dtype=bool), ~single)).ravel()
+    cols = {
+        "time": time[keep],
+        "ts": np.array([t.timestamp() for t in time[keep]], dtype=np.float64),
+    }
+    for name in VALUE_COLUMNS:
+        pairs = np.array(
+            [(r[f"{name}_min"], r[f"{name}_max"]) for r in rows], dtype=np.float64
+        )  # None -> nan
+        cols[name] = pairs.ravel()[keep]
+    return cols
@@ -140,17 +140,17 @@ def example_handle_missing_data(weather_data):
 # ==============================================================================
 
 if __name__ == "__main__":
-    from collections import deque
+    from ring_buffer import SensorBufferRegistry
     
     # Create sample weather data
-    sample_data = deque([
-        {
-            "time_iso": "2025-10-15T10:00:00",
-            "temp": 25.5,
-            "rh": 65.2,
-            "lux": 12500.0,
-        }
-    ], maxlen=10000)
+    sample_data = SensorBufferRegistry(default_capacity=10000)
+    sample_data.append({
+        "id": "sample-sensor",
+        "time_iso": "2025-10-15T10:00:00",
+        "temp": 25.5,
+        "rh": 65.2,
+        "lux": 12500.0,
+    })
     
     print("=" * 60)
     print("PLUGGABLE PARAMETER SYSTEM - USAGE EXAMPLES")
@@ -0,0 +1,17 @@
+"""Gunicorn settings shared by zdenergy.service and deploy.sh.
+
+Gunicorn must run a single worker: the TCP ingest server (port 6000) and
+the in-memory ring buffers live in that one process. Requests are served by
+its threads, and every open /api/stream holds one of them, so the thread
+count comes from GUNICORN_THREADS in .env, the same file readings.py reads
+to cap LIVE_STREAM_MAX_CLIENTS below it.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+workers = 1
+threads = int(os.getenv('GUNICORN_THREADS', '48'))
@@ -0,0 +1,253 @@
+"""Event-driven TCP ingest server for sensor gateways.
+
+A single thread multiplexes every gateway connection with ``selectors``
+(epoll on Linux), so a second site connecting on port 6000 is accepted
+immediately instead of waiting in the listen backlog while the first one
+is being served.
+
+The server only deals with sockets: it accepts connections, reads whatever
+bytes are available, closes idle peers and keeps connection counters.
+Each connection carries its own ``JsonFramer``; framing and parsing of the
+payload are left to the ``on_data`` / ``on_close`` callbacks supplied by the
+application (see ``readings.py``).
+"""
+
+from __future__ import annotations
+
+import selectors
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from json_framer import JsonFramer
+
+
+RECV_SIZE = 4096
+
+
+@dataclass
+class GatewayConnection:
+    """State kept for one connected gateway"""
+    sock: socket.socket
+    addr: Tuple[str, int]
+    connected_at: float = field(default_factory=time.time)
+    last_activity: float = field(default_factory=time.time)
+    bytes_received: int = 0
+    framer: JsonFramer = field(default_factory=JsonFramer)  # Partial payload state
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "address": f"{self.addr[0]}:{self.addr[1]}",
+            "connected_seconds": round(now - self.connected_at, 1),
+            "idle_seconds": round(now - self.last_activity, 1),
+            "bytes_received": self.bytes_received,
+            "buffered_bytes": len(self.framer),
+            "oversized_frames": self.framer.oversized_frames,
+        }
+
+
+class IngestServer:
+    """
+    Non-blocking TCP server multiplexing many gateway connections on one thread.
+
+    Usage:
+        server = IngestServer("0.0.0.0", 6000, on_data=handle, on_close=flush)
+        server.serve_forever()  # blocks; call server.stop() from another thread
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        on_data: Callable[[GatewayConnection, bytes], None],
+        on_close: Optional[Callable[[GatewayConnection], None]] = None,
+        idle_timeout: float = 60.0,
+        max_connections: int = 512,
+        backlog: int = 128,
+        on_activity: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Args:
+            host: Interface to bind
+            port: TCP port to listen on
+            on_data: Called with (connection, bytes) for every successful recv
+            on_close: Called once when a connection is closed (for final flush)
+            idle_timeout: Seconds without data before a connection is dropped
+            max_connections: Connections beyond this are refused immediately
+            backlog: Listen backlog passed to ``listen()``
+            on_activity: Called on every loop iteration (heartbeat for health checks)
+        """
+        self.host = host
+        self.port = port
+        self.on_data = on_data
+        self.on_close = on_close
+        self.on_activity = on_activity
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.backlog = backlog
+
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._listener: Optional[socket.socket] = None
+        self._connections: Dict[int, GatewayConnection] = {}
+        self._lock = threading.Lock()  # Guards _connections for stats() readers
+        self._running = False
+
+        # Counters exposed through stats()
+        self.total_accepted = 0
+        self.total_closed = 0
+        self.total_idle_timeouts = 0
+        self.total_refused = 0
+        self.peak_connections = 0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def serve_forever(self, poll_interval: float = 1.0) -> None:
+        """Bind, listen and run the event loop until stop() is called"""
+        self._selector = selectors.DefaultSelector()
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((self.host, self.port))
+        self._listener.listen(self.backlog)
+        self._listener.setblocking(False)
+        self._selector.register(self._listener, selectors.EVENT_READ, data=None)
+        self._running = True
+
+        try:
+            while self._running:
+                for key, _ in self._selector.select(timeout=poll_interval):
+                    if key.data is None:
+                        self._accept()
+                    else:
+                        self._read(key.data)
+                self._close_idle()
+                if self.on_activity:
+                    self.on_activity()
+        finally:
+            self._shutdown()
+
+    def stop(self) -> None:
+        """Ask the event loop to exit after the current iteration"""
+        self._running = False
+
+    def _shutdown(self) -> None:
+        for conn in list(self._connections.values()):
+            self._close(conn)
+        if self._selector and self._listener:
+            try:
+                self._selector.unregister(self._listener)
+            except Exception:
+                pass
+        if self._listener:
+            self._listener.close()
+        if self._selector:
+            self._selector.close()
+        self._listener = None
+        self._selector = None
+
+    # ------------------------------------------------------------------
+    # Event handlers
+    # ------------------------------------------------------------------
+
+    def _accept(self) -> None:
+        # Drain every pending connection; the listener is edge-agnostic
+        while True:
+            try:
+                sock, addr = self._listener.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+
+            if len(self._connections) >= self.max_connections:
+                self.total_refused += 1
+                print(f"⚠️  Refusing gateway {addr}: {self.max_connections} connections already open")
+                sock.close()
+                continue
+
+            sock.setblocking(False)
+            conn = GatewayConnection(sock=sock, addr=addr)
+            self._selector.register(sock, selectors.EVENT_READ, data=conn)
+            with self._lock:
+                self._connections[sock.fileno()] = conn
+                self.total_accepted += 1
+                self.peak_connections = max(self.peak_connections, len(self._connections))
+            print(f"🔌 Gateway connected from {addr} ({len(self._connections)} open)")
+
+    def _read(self, conn: GatewayConnection) -> None:
+        try:
+            data = conn.sock.recv(RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            print(f"❌ Error receiving data from {conn.addr}: {e}")
+            self._close(conn)
+            return
+
+        if not data:
+            # Connection closed gracefully
+            print(f"📴 Gateway {conn.addr} disconnected")
+            self._close(conn)
+            return
+
+        conn.last_activity = time.time()
+        conn.bytes_received += len(data)
+        try:
+            self.on_data(conn, data)
+        except Exception as e:
+            # A bad payload must never take down the loop for other gateways
+            print(f"❌ Error handling data from {conn.addr}: {e}")
+
+    def _close_idle(self) -> None:
+        if not self.idle_timeout:
+            return
+        cutoff = time.time() - self.idle_timeout
+        for conn in list(self._connections.values()):
+            if conn.last_activity < cutoff:
+                print(f"⚠️  Socket timeout for {conn.addr} - closing connection")
+                self.total_idle_timeouts += 1
+                self._close(conn)
+
+    def _close(self, conn: GatewayConnection) -> None:
+        fileno = conn.sock.fileno()
+        with self._lock:
+            if self._connections.pop(fileno, None) is None:
+                return
+            self.total_closed += 1
+        try:
+            self._selector.unregister(conn.sock)
+        except Exception:
+            pass
+        if self.on_close:
+            try:
+                self.on_close(conn)
+            except Exception as e:
+                print(f"❌ Error flushing data from {conn.addr}: {e}")
+        conn.sock.close()
+        print(f"🔒 Connection closed for {conn.addr}")
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    @property
+    def active_connections(self) -> int:
+        return len(self._connections)
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection counters for /api/health"""
+        with self._lock:
+            gateways: List[Dict[str, Any]] = [c.to_dict() for c in self._connections.values()]
+        return {
+            "active_connections": len(gateways),
+            "peak_connections": self.peak_connections,
+            "total_accepted": self.total_accepted,
+            "total_closed": self.total_closed,
+            "idle_timeouts": self.total_idle_timeouts,
+            "refused": self.total_refused,
+            "max_connections": self.max_connections,
+            "idle_timeout_seconds": self.idle_timeout,
+            "gateways": gateways,
+        }
@@ -0,0 +1,240 @@
+"""Incremental JSON frame decoder for the gateway TCP stream.
+
+Gateways send either newline-delimited JSON objects or objects concatenated
+back to back, and a single object may be split across several ``recv``
+calls. ``JsonFramer`` keeps the brace depth and string/escape state between
+chunks, so every byte is scanned exactly once no matter how the stream is
+chunked. It works directly on a ``bytearray`` and only decodes complete
+frames.
+
+Usage:
+    framer = JsonFramer()
+    for frame in framer.feed(chunk):
+        handle(frame)          # frame is a complete '{...}' bytes object
+    for frame in framer.flush():
+        handle(frame)          # on disconnect
+"""
+
+from __future__ import annotations
+
+import re
+from typing import List
+
+
+DEFAULT_MAX_FRAME_SIZE = 64 * 1024  # bytes
+
+# Bytes that change state, per scanning mode
+_OUTSIDE = re.compile(rb"[{\n]")        # Looking for the start of an object
+# Inside an object: a complete string literal is consumed as one token, so
+# braces inside strings are skipped; a lone quote means the string continues
+# past the end of the buffer.
+_IN_OBJECT = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[{}"]', re.DOTALL)
+_IN_STRING = re.compile(rb'["\\]')      # Inside a string literal
+_WHITESPACE = b" \t\r\n"
+
+
+class JsonFramer:
+    """
+    Stateful splitter turning a byte stream into complete JSON object frames.
+
+    Bytes outside any object that are not whitespace (e.g. a garbage line)
+    are returned as their own frame when the line ends, so the caller can
+    count them as invalid, exactly like the old newline split did.
+
+    Frames larger than ``max_frame_size`` are dropped and the framer
+    resynchronises at the next newline.
+    """
+
+    def __init__(self, max_frame_size: int = DEFAULT_MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self._buf = bytearray()
+        self._pos = 0          # Next byte to scan
+        self._start = -1       # Start of the object being framed (-1 = none)
+        self._junk = -1        # Start of non-JSON bytes on the current line
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._resync = False   # Discarding until newline after an oversized frame
+
+        # Counters
+        self.frames = 0
+        self.oversized_frames = 0
+        self.discarded_bytes = 0
+
+    def __len__(self) -> int:
+        """Number of buffered, not yet framed bytes"""
+        return len(self._buf) - self._consumed_prefix()
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Append a chunk and return all frames it completes"""
+        if not data:
+            return []
+        self._buf += data
+        frames: List[bytes] = []
+        self._scan(frames)
+        self._compact()
+        return frames
+
+    def flush(self) -> List[bytes]:
+        """Return any trailing junk line and reset state (call on disconnect)"""
+        frames: List[bytes] = []
+        if self._junk != -1:
+            junk = bytes(self._buf[self._junk:]).strip()
+            if junk:
+                frames.append(junk)
+        if self._start != -1:
+            # Incomplete object at EOF - cannot be parsed, discard it
+            self.discarded_bytes += len(self._buf) - self._start
+        self.reset()
+        return frames
+
+    def reset(self) -> None:
+        self._buf = bytearray()
+        self._pos = 0
+        self._start = -1
+        self._junk = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._resync = False
+
+    # ------------------------------------------------------------------
+
+    def _scan(self, frames: List[bytes]) -> None:
+        buf = self._buf
+        end = len(buf)
+        pos = self._pos
+        has_newline = True  # Cleared once no newline is left in the buffer
+
+        while pos < end:
+            if self._resync:
+                nl = buf.find(b"\n", pos)
+                if nl == -1:
+                    self.discarded_bytes += end - pos
+                    pos = end
+                    break
+                self.discarded_bytes += nl + 1 - pos
+                pos = nl + 1
+                self._resync = False
+                continue
+
+            if self._start == -1:
+                if self._junk == -1 and has_newline:
+                    # Fast path for newline-delimited gateways: a line whose
+                    # only '{' is the first byte and only '}' is the last byte
+                    # holds exactly one flat object and needs no scanning.
+                    nl = buf.find(b"\n", pos)
+                    if nl == -1:
+                        has_newline = False
+                    else:
+                        line = bytes(buf[pos:nl]).strip()
+                        if (line[:1] == b"{"
+                                and line.find(b"}") == len(line) - 1
+                                and line.count(b"{") == 1
+                                and len(line) <= self.max_frame_size):
+                            frames.append(line)
+                            self.frames += 1
+                            pos = nl + 1
+                            continue
+                m = _OUTSIDE.search(buf, pos)
+                stop = m.start() if m else end
+                if self._junk == -1 and buf[pos:stop].strip(_WHITESPACE):
+                    self._junk = pos
+                if m is None:
+                    pos = end
+                    break
+                pos = m.end()
+                if buf[m.start()] == 0x0A:  # newline ends a junk line
+                    if self._junk != -1:
+                        junk = bytes(buf[self._junk:m.start()]).strip()
+                        if junk:
+                            frames.append(junk)
+                        self._junk = -1
+                else:  # '{' starts an object
+                    if self._junk != -1:
+                        junk = bytes(buf[self._junk:m.start()]).strip()
+                        if junk:
+                            frames.append(junk)
+                        self._junk = -1
+                    self._start = m.start()
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                m = _IN_STRING.search(buf, pos)
+                if m is None:
+                    pos = end
+                    break
+                if buf[m.start()] == 0x5C:  # backslash escapes the next byte
+                    if m.end() < end:
+                        pos = m.end() + 1
+                    else:
+                        self._escape = True
+                        pos = end
+                        break
+                else:
+                    self._in_string = False
+                    pos = m.end()
+                continue
+
+            m = _IN_OBJECT.search(buf, pos)
+            if m is None:
+                pos = end
+                break
+            ch = buf[m.start()]
+            pos = m.end()
+            if ch == 0x22:    # "
+                if pos - m.start() == 1:  # Unterminated string literal
+                    self._in_string = True
+            elif ch == 0x7B:  # {
+                self._depth += 1
+            else:             # }
+                self._depth -= 1
+                if self._depth == 0:
+                    if pos - self._start > self.max_frame_size:
+                        self.oversized_frames += 1
+                        self.discarded_bytes += pos - self._start
+                    else:
+                        frames.append(bytes(buf[self._start:pos]))
+                        self.frames += 1
+                    self._start = -1
+
+        self._pos = pos
+
+        # Enforce the frame size limit on the object or junk line in progress
+        pending = self._start if self._start != -1 else self._junk
+        if pending != -1 and end - pending > self.max_frame_size:
+            self.oversized_frames += 1
+            self.discarded_bytes += end - pending
+            self._start = -1
+            self._junk = -1
+            self._depth = 0
+            self._in_string = False
+            self._escape = False
+            self._resync = True
+            self._pos = end
+
+    def _consumed_prefix(self) -> int:
+        """Index before which every byte has been framed or discarded"""
+        keep = self._pos
+        if self._start != -1:
+            keep = min(keep, self._start)
+        if self._junk != -1:
+            keep = min(keep, self._junk)
+        return keep
+
+    def _compact(self) -> None:
+        """Drop consumed bytes so the buffer only holds the partial frame"""
+        cut = self._consumed_prefix()
+        if cut == 0:
+            return
+        del self._buf[:cut]
+        self._pos -= cut
+        if self._start != -1:
+            self._start -= cut
+        if self._junk != -1:
+            self._junk -= cut
@@ -0,0 +1,180 @@
+"""Fan-out of live readings to Server-Sent Events subscribers.
+
+The dashboard used to poll ``/api/data`` every 5 seconds and download the
+whole window again each time. Now it keeps one ``/api/stream`` connection
+open, and the ingest path publishes every parsed reading here:
+
+* each reading is serialized to an SSE frame once, whatever the number of
+  subscribers, and the same bytes are queued for every subscriber
+* every subscriber has a bounded queue; a subscriber whose queue is full
+  (a stalled tab, a slow link) is dropped instead of slowing down ingest
+  or growing memory, and its browser reconnects and reloads
+* idle connections get a comment line every ``heartbeat_seconds`` so
+  proxies and load balancers keep them open
+
+``publish`` never blocks, so it is safe to call from the network thread.
+"""
+
+from __future__ import annotations
+
+import json
+import queue
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+
+from ring_buffer import LUX_TO_IRRADIANCE
+
+RETRY_MS = 3000  # Browser reconnect delay sent to EventSource
+_CLOSE = b""     # Queue sentinel: end this subscriber's stream
+
+
+class Subscriber:
+    """One open /api/stream connection"""
+
+    def __init__(self, sensor: Optional[str], queue_size: int):
+        self.sensor = sensor
+        self.queue: "queue.Queue[bytes]" = queue.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def offer(self, frame: bytes) -> bool:
+        """Queue a frame without blocking. False (and the subscriber is dropped) when full."""
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except queue.Full:
+            self.dropped = True
+            return False
+
+
+class LiveBroadcaster:
+    """
+    Publishes readings to SSE subscribers.
+
+    Usage:
+        broadcaster = LiveBroadcaster()
+        broadcaster.publish(reading)                  # from the ingest path
+        subscriber = broadcaster.subscribe(sensor=None)
+        return Response(broadcaster.events(subscriber), mimetype="text/event-stream")
+    """
+
+    def __init__(self, queue_size: int = 256, heartbeat_seconds: float = 15.0, max_subscribers: int = 32):
+        """
+        Args:
+            queue_size: Frames buffered per subscriber before it is dropped
+            heartbeat_seconds: Idle time after which a keepalive comment is sent
+            max_subscribers: Open streams allowed at once (each holds a server thread)
+        """
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_subscribers = max_subscribers
+        self._subscribers: set = set()
+        self._lock = threading.Lock()
+        self._seq = 0
+
+        # Counters exposed through stats()
+        self.published = 0
+        self.delivered = 0
+        self.dropped_subscribers = 0
+        self.refused = 0
+        self.heartbeats = 0
+
+    @staticmethod
+    def reading_payload(reading: Dict[str, Any]) -> Dict[str, Any]:
+        """Parsed reading -> the /api/data row shape, plus the sensor id"""
+        irradiance = reading.get("irradiance")
+        if irradiance is None and reading.get("lux") is not None:
+            irradiance = reading["lux"] / LUX_TO_IRRADIANCE
+        payload = {
+            "id": str(reading.get("id", "unknown")),
+            "time": datetime.utcfromtimestamp(reading["epoch"]).strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        for name, value in (("temp", reading.get("temp")), ("rh", reading.get("rh")),
+                            ("lux", reading.get("lux")), ("irradiance", irradiance)):
+            payload[name] = None if value is None else round(float(value), 3)
+        return payload
+
+    def publish(self, reading: Dict[str, Any]) -> int:
+        """Serialize a reading once and queue it for every matching subscriber. Returns deliveries."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._seq += 1
+            seq = self._seq
+        self.published += 1
+        if not subscribers:
+            return 0
+
+        payload = self.reading_payload(reading)
+        frame = f"id: {seq}\nevent: reading\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n".encode()
+        delivered = 0
+        for subscriber in subscribers:
+            if subscriber.sensor is not None and subscriber.sensor != payload["id"]:
+                continue
+            if subscriber.offer(frame):
+                delivered += 1
+            else:
+                self._drop(subscriber)
+        self.delivered += delivered
+        return delivered
+
+    def subscribe(self, sensor: Optional[str] = None) -> Optional[Subscriber]:
+        """Register a subscriber, or None when max_subscribers streams are already open"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.refused += 1
+                return None
+            subscriber = Subscriber(sensor, self.queue_size)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _drop(self, subscriber: Subscriber) -> None:
+        """Disconnect a subscriber that fell behind; its client reconnects and reloads"""
+        with self._lock:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers.discard(subscriber)
+            self.dropped_subscribers += 1
+        # Make room for the close sentinel so its stream ends promptly
+        try:
+            subscriber.queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            subscriber.queue.put_nowait(_CLOSE)
+        except queue.Full:
+            pass
+
+    def events(self, subscriber: Subscriber) -> Iterator[bytes]:
+        """SSE byte stream for one subscriber; unsubscribes when the client goes away"""
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            while True:
+                try:
+                    frame = subscriber.queue.get(timeout=self.heartbeat_seconds)
+                except queue.Empty:
+                    self.heartbeats += 1
+                    yield b": keepalive\n\n"
+                    continue
+                if frame == _CLOSE or subscriber.dropped:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            subscribers = len(self._subscribers)
+        return {
+            "subscribers": subscribers,
+            "max_subscribers": self.max_subscribers,
+            "queue_size": self.queue_size,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_subscribers": self.dropped_subscribers,
+            "refused": self.refused,
+            "heartbeats": self.heartbeats,
+        }
@@ -0,0 +1,233 @@
+"""
+Database Migration Script: Add (sensor_id, timestamp) Unique Key
+Removes duplicate readings and adds a unique constraint so gateway retransmits,
+spool replays and CSV backfills can no longer create duplicate rows
+Safe to run - checks if the constraint exists before adding, and can be re-run
+"""
+
+from datetime import timedelta
+
+from db_manager import get_db_manager, READING_KEY_CONSTRAINT, UNKNOWN_SENSOR_ID
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEDUPE_CHUNK = timedelta(days=1)  # Time slice deleted per transaction
+UNIQUE_INDEX = "uq_sensor_readings_sensor_ts_idx"
+
+
+def fill_missing_sensor_ids():
+    """Give rows without a sensor_id the 'unknown' id (NULLs never conflict in a unique key)"""
+    db = get_db_manager()
+    conn = None
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        logger.info("🔧 Setting sensor_id = 'unknown' where it is NULL...")
+        cursor.execute(
+            "UPDATE sensor_readings SET sensor_id = %s WHERE sensor_id IS NULL;",
+            (UNKNOWN_SENSOR_ID,)
+        )
+        updated = cursor.rowcount
+        cursor.execute(f"""
+            ALTER TABLE sensor_readings
+            ALTER COLUMN sensor_id SET DEFAULT '{UNKNOWN_SENSOR_ID}',
+            ALTER COLUMN sensor_id SET NOT NULL;
+        """)
+
+        conn.commit()
+        logger.info(f"   - {updated} rows updated, sensor_id is now NOT NULL")
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.error(f"❌ Failed to fill missing sensor ids: {e}")
+        raise
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+
+def dedupe_sensor_readings(chunk: timedelta = DEDUPE_CHUNK) -> int:
+    """
+    Delete duplicate (sensor_id, timestamp) readings, keeping the newest row (highest id).
+
+    The table is processed in time slices of ``chunk``, one set-based DELETE
+    and commit per slice, so locks stay short and progress survives an
+    interruption. Duplicates share a timestamp, so they never straddle slices.
+
+    Returns:
+        Number of rows deleted
+    """
+    db = get_db_manager()
+    conn = None
+    deleted = 0
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT MIN(timestamp), MAX(timestamp) FROM sensor_readings;")
+        oldest, newest = cursor.fetchone()
+        if oldest is None:
+            logger.info("✅ sensor_readings is empty - nothing to dedupe")
+            return 0
+
+        start = oldest
+        while start <= newest:
+            end = start + chunk
+            cursor.execute("""
+                DELETE FROM sensor_readings
+                WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (
+                            PARTITION BY sensor_id, timestamp ORDER BY id DESC
+                        ) AS rn
+                        FROM sensor_readings
+                        WHERE timestamp >= %s AND timestamp < %s
+                    ) ranked
+                    WHERE rn > 1
+                );
+            """, (start, end))
+            conn.commit()
+            if cursor.rowcount:
+                deleted += cursor.rowcount
+                logger.info(f"   - {start:%Y-%m-%d %H:%M}: removed {cursor.rowcount} duplicates")
+            start = end
+
+        logger.info(f"✅ Dedupe finished: {deleted} duplicate rows removed")
+        return deleted
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.error(f"❌ Dedupe failed after removing {deleted} rows: {e}")
+        raise
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+
+def migrate_add_unique_reading_key():
+    """Dedupe sensor_readings and add the (sensor_id, timestamp) unique constraint"""
+    db = get_db_manager()
+    conn = None
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT 1 FROM pg_constraint WHERE conname = %s;",
+            (READING_KEY_CONSTRAINT,)
+        )
+        if cursor.fetchone():
+            logger.info("✅ Unique reading key already exists - no migration needed")
+            return
+        cursor.close()
+        db.return_connection(conn)
+        conn = None
+
+        fill_missing_sensor_ids()
+        dedupe_sensor_readings()
+
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        # Build the index without blocking ingest, then attach it as the constraint.
+        # CONCURRENTLY cannot run inside a transaction block.
+        logger.info("🔧 Building unique index on (sensor_id, timestamp)...")
+        conn.autocommit = True
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {UNIQUE_INDEX};")  # Left invalid by an interrupted run
+        cursor.execute(f"""
+            CREATE UNIQUE INDEX CONCURRENTLY {UNIQUE_INDEX}
+            ON sensor_readings (sensor_id, timestamp);
+        """)
+        conn.autocommit = False
+
+        # If the running app inserted a new duplicate since the dedupe, the build
+        # above fails - just run the script again. Attaching the index is quick.
+        logger.info("🔧 Adding unique constraint...")
+        cursor.execute(f"""
+            ALTER TABLE sensor_readings
+            ADD CONSTRAINT {READING_KEY_CONSTRAINT} UNIQUE USING INDEX {UNIQUE_INDEX};
+        """)
+
+        conn.commit()
+        db.has_reading_key = True
+        logger.info("✅ Migration completed successfully!")
+        logger.info(f"   - Added constraint {READING_KEY_CONSTRAINT} UNIQUE (sensor_id, timestamp)")
+        logger.info("   - Restart the app so batch inserts switch to ON CONFLICT upserts")
+
+    except Exception as e:
+        if conn:
+            conn.autocommit = False
+            conn.rollback()
+        logger.error(f"❌ Migration failed: {e}")
+        raise
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+
+def count_duplicates():
+    """Display how many duplicate readings the table currently holds"""
+    db = get_db_manager()
+    conn = None
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT COUNT(*), COALESCE(SUM(n - 1), 0)
+            FROM (
+                SELECT COUNT(*) AS n
+                FROM sensor_readings
+                GROUP BY sensor_id, timestamp
+                HAVING COUNT(*) > 1
+            ) dupes;
+        """)
+        keys, extra_rows = cursor.fetchone()
+
+        print("\n" + "="*60)
+        print("📋 Duplicate readings in sensor_readings:")
+        print("="*60)
+        print(f"  • Keys with duplicates: {keys}")
+        print(f"  • Rows to remove:       {extra_rows}")
+        print("="*60 + "\n")
+
+    except Exception as e:
+        logger.error(f"❌ Failed to count duplicates: {e}")
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+
+if __name__ == "__main__":
+    print("\n" + "="*60)
+    print("🔄 Database Migration Tool")
+    print("="*60)
+    print("Task: Remove duplicate readings and add a unique (sensor_id, timestamp) key")
+    print("="*60 + "\n")
+
+    # Show current duplicates
+    count_duplicates()
+
+    # Ask for confirmation
+    response = input("Do you want to proceed with the migration? (yes/no): ")
+
+    if response.lower() in ['yes', 'y']:
+        print()
+        migrate_add_unique_reading_key()
+        print()
+        count_duplicates()
+    else:
+        print("\n❌ Migration cancelled by user\n")
@@ -0,0 +1,101 @@
+"""
+Database Migration Script: Build Rollups for Existing Readings
+Fills the sensor_rollup_* tables (1 min / 30 min / hourly / daily) from the
+readings stored before the rollups existed. New readings are rolled up by the
+write path as they are inserted.
+Safe to run - every day is rebuilt from the raw rows, so it can be re-run
+"""
+
+from datetime import timedelta
+
+from db_manager import get_db_manager, ROLLUPS
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BUILD_CHUNK = timedelta(days=1)  # Days rebuilt per transaction
+
+
+def build_rollups(chunk: timedelta = BUILD_CHUNK) -> int:
+    """
+    Rebuild all rollups day by day, one committed transaction per chunk.
+
+    Returns:
+        Number of chunks rebuilt
+    """
+    db = get_db_manager()
+    db.initialize_schema()  # Applies the rollup tables migration if pending
+    conn = None
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT MIN(timestamp), MAX(timestamp) FROM sensor_readings;")
+        oldest, newest = cursor.fetchone()
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+    if oldest is None:
+        logger.info("✅ sensor_readings is empty - nothing to roll up")
+        return 0
+
+    chunks = 0
+    start = oldest.replace(hour=0, minute=0, second=0, microsecond=0)
+    while start <= newest:
+        # refresh_rollups covers whole days, so the end is the chunk's last day
+        end = start + chunk - timedelta(days=1)
+        db.refresh_rollups(start, end)
+        chunks += 1
+        logger.info(f"   - {start:%Y-%m-%d}: rollups rebuilt")
+        start += chunk
+
+    logger.info(f"✅ Rollups built for {chunks} chunks")
+    return chunks
+
+
+def show_rollups():
+    """Display row counts of the rollup tables"""
+    db = get_db_manager()
+    conn = None
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        print("\n" + "="*60)
+        print("📋 Rollup tables:")
+        print("="*60)
+        for resolution, (table, _, _) in ROLLUPS.items():
+            cursor.execute(f"SELECT COUNT(*), MIN(bucket), MAX(bucket) FROM {table};")
+            count, first, last = cursor.fetchone()
+            print(f"  • {resolution:>4} {table:20} {count:>10} rows  {first} → {last}")
+        print("="*60 + "\n")
+
+    except Exception as e:
+        logger.error(f"❌ Failed to read rollup tables: {e}")
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+
+if __name__ == "__main__":
+    print("\n" + "="*60)
+    print("🔄 Database Migration Tool")
+    print("="*60)
+    print("Task: Build rollup tables from existing readings")
+    print("="*60 + "\n")
+
+    # Ask for confirmation
+    response = input("Do you want to proceed with the migration? (yes/no): ")
+
+    if response.lower() in ['yes', 'y']:
+        print()
+        build_rollups()
+        print()
+        show_rollups()
+    else:
+        print("\n❌ Migration cancelled by user\n")
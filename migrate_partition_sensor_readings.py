@@ -0,0 +1,286 @@
+"""
+Database Migration Script: Partition sensor_readings by Month
+Converts the existing sensor_readings table into a monthly range-partitioned
+table while the app keeps writing to it
+Safe to run - checks if the table is already partitioned, and can be re-run
+
+Steps:
+  1. Create sensor_readings_new (partitioned) with monthly partitions covering
+     the existing data plus the upcoming months, and a default partition
+  2. Copy rows across in id order, in short committed batches (online)
+  3. Lock the old table against writes, copy the remaining tail, and swap the
+     table, index and constraint names in one short transaction
+  4. Keep the old table as sensor_readings_unpartitioned for verification
+     (drop it yourself once you are happy)
+"""
+
+from db_manager import (
+    get_db_manager,
+    month_start,
+    add_months,
+    DEFAULT_PARTITION,
+    PARTITION_MONTHS_AHEAD,
+    READING_KEY_CONSTRAINT,
+    UNKNOWN_SENSOR_ID,
+)
+from datetime import datetime, timedelta
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NEW_TABLE = "sensor_readings_new"
+OLD_TABLE = "sensor_readings_unpartitioned"
+COPY_BATCH = 50000  # Rows copied per transaction
+
+# Names on the old table that the partitioned table needs to take over
+OLD_INDEXES = ["idx_sensor_readings_timestamp", "idx_sensor_readings_sensor_id"]
+OLD_CONSTRAINTS = ["sensor_readings_pkey", READING_KEY_CONSTRAINT]
+
+
+def is_partitioned(cursor) -> bool:
+    cursor.execute("""
+        SELECT 1 FROM pg_partitioned_table
+        WHERE partrelid = 'sensor_readings'::regclass;
+    """)
+    return cursor.fetchone() is not None
+
+
+def create_partitioned_table():
+    """Create sensor_readings_new with partitions for all existing and upcoming months"""
+    db = get_db_manager()
+    conn = None
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        logger.info(f"🔧 Creating {NEW_TABLE}...")
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {NEW_TABLE} (
+                id INTEGER NOT NULL DEFAULT nextval('sensor_readings_id_seq'),
+                timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                sensor_id VARCHAR(100) NOT NULL DEFAULT '{UNKNOWN_SENSOR_ID}',
+                temperature REAL,
+                humidity REAL,
+                lux REAL,
+                irradiance REAL,
+                created_at TIMESTAMPTZ DEFAULT NOW(),
+                CONSTRAINT {NEW_TABLE}_pkey PRIMARY KEY (id, timestamp),
+                CONSTRAINT {READING_KEY_CONSTRAINT}_new UNIQUE (sensor_id, timestamp)
+            ) PARTITION BY RANGE (timestamp);
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_sensor_readings_timestamp_new
+            ON {NEW_TABLE} (timestamp DESC);
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_sensor_readings_sensor_id_new
+            ON {NEW_TABLE} (sensor_id);
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {NEW_TABLE}_default
+            PARTITION OF {NEW_TABLE} DEFAULT;
+        """)
+
+        # One partition per month from the oldest reading to a few months ahead
+        cursor.execute("SELECT MIN(timestamp) FROM sensor_readings;")
+        oldest = cursor.fetchone()[0]
+        # Database stores GMT+8, so add 8 hours to UTC
+        current = month_start(datetime.utcnow() + timedelta(hours=8))
+        month = month_start(oldest.replace(tzinfo=None)) if oldest else current
+        last = add_months(current, PARTITION_MONTHS_AHEAD)
+        created = 0
+        while month <= last:
+            if db._create_partition(cursor, month, parent=NEW_TABLE):
+                created += 1
+            month = add_months(month, 1)
+
+        conn.commit()
+        logger.info(f"   - {created} monthly partitions created")
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.error(f"❌ Failed to create partitioned table: {e}")
+        raise
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+
+def _copy_batch(cursor, after_id: int, limit=None):
+    """Copy rows with id > after_id (up to limit) into the new table. Returns (max id, rows)."""
+    limit_clause = "LIMIT %s" if limit else ""
+    params = (after_id, limit) if limit else (after_id,)
+    cursor.execute(f"""
+        WITH batch AS (
+            SELECT id, timestamp, COALESCE(sensor_id, '{UNKNOWN_SENSOR_ID}') AS sensor_id,
+                   temperature, humidity, lux, irradiance, created_at
+            FROM sensor_readings
+            WHERE id > %s
+            ORDER BY id
+            {limit_clause}
+        ), copied AS (
+            INSERT INTO {NEW_TABLE} (id, timestamp, sensor_id, temperature, humidity, lux, irradiance, created_at)
+            SELECT * FROM batch
+            ON CONFLICT DO NOTHING
+        )
+        SELECT MAX(id), COUNT(*) FROM batch;
+    """, params)
+    max_id, count = cursor.fetchone()
+    return (max_id if max_id is not None else after_id), count
+
+
+def copy_rows() -> int:
+    """Copy existing rows in committed batches while the app keeps writing. Returns last copied id."""
+    db = get_db_manager()
+    conn = None
+    last_id = 0
+    total = 0
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        # Resume after an interrupted run
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {NEW_TABLE};")
+        last_id = cursor.fetchone()[0]
+
+        while True:
+            last_id, count = _copy_batch(cursor, last_id, COPY_BATCH)
+            conn.commit()
+            if count == 0:
+                break
+            total += count
+            logger.info(f"   - copied {total} rows (up to id {last_id})")
+
+        # Duplicate (sensor_id, timestamp) rows are skipped by ON CONFLICT
+        logger.info(f"✅ Bulk copy finished ({total} rows read)")
+        return last_id
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.error(f"❌ Copy failed at id {last_id}: {e}")
+        raise
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+
+def swap_tables(last_id: int):
+    """Copy the tail under a write lock and swap names in one transaction"""
+    db = get_db_manager()
+    conn = None
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        # Blocks writers (they queue up / spool) but not readers
+        logger.info("🔒 Locking sensor_readings against writes...")
+        cursor.execute("LOCK TABLE sensor_readings IN EXCLUSIVE MODE;")
+        last_id, count = _copy_batch(cursor, last_id)
+        logger.info(f"   - copied {count} rows written during the bulk copy")
+
+        logger.info("🔧 Swapping tables...")
+        cursor.execute(f"ALTER TABLE sensor_readings RENAME TO {OLD_TABLE};")
+        for index in OLD_INDEXES:
+            cursor.execute(f"ALTER INDEX IF EXISTS {index} RENAME TO {index}_old;")
+        for constraint in OLD_CONSTRAINTS:
+            cursor.execute(
+                "SELECT 1 FROM pg_constraint WHERE conname = %s AND conrelid = %s::regclass;",
+                (constraint, OLD_TABLE)
+            )
+            if cursor.fetchone():
+                cursor.execute(f"ALTER TABLE {OLD_TABLE} RENAME CONSTRAINT {constraint} TO {constraint}_old;")
+
+        cursor.execute(f"ALTER TABLE {NEW_TABLE} RENAME TO sensor_readings;")
+        cursor.execute(f"ALTER TABLE sensor_readings RENAME CONSTRAINT {NEW_TABLE}_pkey TO sensor_readings_pkey;")
+        cursor.execute(
+            f"ALTER TABLE sensor_readings RENAME CONSTRAINT {READING_KEY_CONSTRAINT}_new TO {READING_KEY_CONSTRAINT};"
+        )
+        for index in OLD_INDEXES:
+            cursor.execute(f"ALTER INDEX {index}_new RENAME TO {index};")
+        cursor.execute(f"ALTER TABLE {NEW_TABLE}_default RENAME TO {DEFAULT_PARTITION};")
+
+        # The id sequence must survive dropping the old table later
+        cursor.execute("ALTER SEQUENCE sensor_readings_id_seq OWNED BY sensor_readings.id;")
+
+        conn.commit()
+        logger.info("✅ Migration completed successfully!")
+        logger.info("   - sensor_readings is now partitioned by month")
+        logger.info(f"   - Old table kept as {OLD_TABLE}; drop it after verifying:")
+        logger.info(f"       DROP TABLE {OLD_TABLE};")
+        logger.info("   - Restart the app so retention switches to dropping partitions")
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.error(f"❌ Swap failed (nothing was renamed): {e}")
+        raise
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+
+def migrate_partition_sensor_readings():
+    """Convert sensor_readings into a monthly range-partitioned table"""
+    db = get_db_manager()
+    conn = None
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        if is_partitioned(cursor):
+            logger.info("✅ sensor_readings is already partitioned - no migration needed")
+            return
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+    create_partitioned_table()
+    last_id = copy_rows()
+    swap_tables(last_id)
+
+
+def show_partitions():
+    """Display the partitions of sensor_readings"""
+    db = get_db_manager()
+    partitions = db.list_partitions()
+
+    print("\n" + "="*60)
+    print("📋 sensor_readings partitions:")
+    print("="*60)
+    if not partitions:
+        print("  (table is not partitioned)")
+    for partition in partitions:
+        print(f"  • {partition['name']:32} ~{partition['estimated_rows']:>10} rows  "
+              f"{partition['bytes'] / 1024 / 1024:8.1f} MB")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*60)
+    print("🔄 Database Migration Tool")
+    print("="*60)
+    print("Task: Convert sensor_readings to monthly range partitions")
+    print("="*60 + "\n")
+
+    show_partitions()
+
+    # Ask for confirmation
+    response = input("Do you want to proceed with the migration? (yes/no): ")
+
+    if response.lower() in ['yes', 'y']:
+        print()
+        migrate_partition_sensor_readings()
+        print()
+        show_partitions()
+    else:
+        print("\n❌ Migration cancelled by user\n")
@@ -0,0 +1,336 @@
+"""
+Database Migration Script: Dictionary-encode sensor_readings.sensor_id
+Rewrites sensor_readings so every row carries a SMALLINT sensor_key
+(referencing the sensors table) instead of a VARCHAR(100) sensor_id, while the
+app keeps writing to it
+Safe to run - checks if the table is already converted, and can be re-run
+
+Steps:
+  1. Apply pending schema migrations (creates the sensors table)
+  2. Create sensor_readings_keyed (partitioned by month) with monthly
+     partitions covering the existing data plus the upcoming months
+  3. Copy rows across in id order, in short committed batches (online),
+     registering every sensor_id met in the sensors table first
+  4. Lock the old table against writes, copy the remaining tail, and swap the
+     table, partition, index and constraint names in one short transaction
+  5. Keep the old table as sensor_readings_text_ids for verification
+     (drop it yourself once you are happy)
+
+Rollup tables stay keyed by the external sensor id and need no rebuild.
+"""
+
+from db_manager import (
+    get_db_manager,
+    month_start,
+    add_months,
+    partition_name,
+    DEFAULT_PARTITION,
+    NAMED_READINGS_VIEW,
+    PARTITION_MONTHS_AHEAD,
+    READING_KEY_CONSTRAINT,
+    SENSORS_TABLE,
+    UNKNOWN_SENSOR_ID,
+)
+from schema_migrations import create_named_readings_view, run_migrations
+from datetime import datetime, timedelta
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NEW_TABLE = "sensor_readings_keyed"
+OLD_TABLE = "sensor_readings_text_ids"
+NEW_PARTITION_PREFIX = f"{NEW_TABLE}_p"  # Renamed to sensor_readings_pYYYYMM by the swap
+COPY_BATCH = 50000  # Rows copied per transaction
+
+# Names on the old table that the new table needs to take over
+# (the sensor_id index has no successor: the unique key leads with sensor_key)
+OLD_INDEXES = ["idx_sensor_readings_timestamp", "idx_sensor_readings_sensor_id"]
+OLD_CONSTRAINTS = ["sensor_readings_pkey", READING_KEY_CONSTRAINT]
+
+
+def is_converted(cursor) -> bool:
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'sensor_readings' AND column_name = 'sensor_key';
+    """)
+    return cursor.fetchone() is not None
+
+
+def create_keyed_table():
+    """Create sensor_readings_keyed with partitions for all existing and upcoming months"""
+    db = get_db_manager()
+    conn = None
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        logger.info(f"🔧 Creating {NEW_TABLE}...")
+        # 8-byte timestamp first, so id and sensor_key share the next 8 bytes
+        # without alignment padding (40-byte tuples instead of 48)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {NEW_TABLE} (
+                timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                id INTEGER NOT NULL DEFAULT nextval('sensor_readings_id_seq'),
+                sensor_key SMALLINT NOT NULL,
+                temperature REAL,
+                humidity REAL,
+                lux REAL,
+                irradiance REAL,
+                created_at TIMESTAMPTZ DEFAULT NOW(),
+                CONSTRAINT {NEW_TABLE}_pkey PRIMARY KEY (id, timestamp),
+                CONSTRAINT {READING_KEY_CONSTRAINT}_new UNIQUE (sensor_key, timestamp)
+            ) PARTITION BY RANGE (timestamp);
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_sensor_readings_timestamp_new
+            ON {NEW_TABLE} (timestamp DESC);
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {NEW_TABLE}_default
+            PARTITION OF {NEW_TABLE} DEFAULT;
+        """)
+
+        # One partition per month from the oldest reading to a few months ahead
+        cursor.execute("SELECT MIN(timestamp) FROM sensor_readings;")
+        oldest = cursor.fetchone()[0]
+        # Database stores GMT+8, so add 8 hours to UTC
+        current = month_start(datetime.utcnow() + timedelta(hours=8))
+        month = month_start(oldest.replace(tzinfo=None)) if oldest else current
+        last = add_months(current, PARTITION_MONTHS_AHEAD)
+        created = 0
+        while month <= last:
+            if db._create_partition(cursor, month, parent=NEW_TABLE, prefix=NEW_PARTITION_PREFIX):
+                created += 1
+            month = add_months(month, 1)
+
+        conn.commit()
+        logger.info(f"   - {created} monthly partitions created")
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.error(f"❌ Failed to create keyed table: {e}")
+        raise
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+
+def _copy_batch(cursor, after_id: int, limit=None):
+    """Copy rows with id > after_id (up to limit) into the new table. Returns (max id, rows)."""
+    limit_clause = "LIMIT %s" if limit else ""
+    params = (after_id, limit) if limit else (after_id,)
+    batch = f"""
+        SELECT id, timestamp, COALESCE(sensor_id, '{UNKNOWN_SENSOR_ID}') AS sensor_id,
+               temperature, humidity, lux, irradiance, created_at
+        FROM sensor_readings
+        WHERE id > %s
+        ORDER BY id
+        {limit_clause}
+    """
+    # A separate statement, so the copy below sees the new sensors
+    cursor.execute(f"""
+        INSERT INTO {SENSORS_TABLE} (external_id)
+        SELECT DISTINCT sensor_id FROM ({batch}) batch
+        ON CONFLICT (external_id) DO NOTHING;
+    """, params)
+    cursor.execute(f"""
+        WITH batch AS ({batch}), copied AS (
+            INSERT INTO {NEW_TABLE} (timestamp, id, sensor_key, temperature, humidity, lux, irradiance, created_at)
+            SELECT b.timestamp, b.id, s.id, b.temperature, b.humidity, b.lux, b.irradiance, b.created_at
+            FROM batch b JOIN {SENSORS_TABLE} s ON s.external_id = b.sensor_id
+            ON CONFLICT DO NOTHING
+        )
+        SELECT MAX(id), COUNT(*) FROM batch;
+    """, params)
+    max_id, count = cursor.fetchone()
+    return (max_id if max_id is not None else after_id), count
+
+
+def copy_rows() -> int:
+    """Copy existing rows in committed batches while the app keeps writing. Returns last copied id."""
+    db = get_db_manager()
+    conn = None
+    last_id = 0
+    total = 0
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        # Resume after an interrupted run
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {NEW_TABLE};")
+        last_id = cursor.fetchone()[0]
+
+        while True:
+            last_id, count = _copy_batch(cursor, last_id, COPY_BATCH)
+            conn.commit()
+            if count == 0:
+                break
+            total += count
+            logger.info(f"   - copied {total} rows (up to id {last_id})")
+
+        # Duplicate (sensor, timestamp) rows are skipped by ON CONFLICT
+        logger.info(f"✅ Bulk copy finished ({total} rows read)")
+        return last_id
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.error(f"❌ Copy failed at id {last_id}: {e}")
+        raise
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+
+def _partitions(cursor, parent: str):
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass;
+    """, (parent,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def swap_tables(last_id: int):
+    """Copy the tail under a write lock and swap names in one transaction"""
+    db = get_db_manager()
+    conn = None
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        # Blocks writers (they queue up / spool) but not readers
+        logger.info("🔒 Locking sensor_readings against writes...")
+        cursor.execute("LOCK TABLE sensor_readings IN EXCLUSIVE MODE;")
+        last_id, count = _copy_batch(cursor, last_id)
+        logger.info(f"   - copied {count} rows written during the bulk copy")
+
+        logger.info("🔧 Swapping tables...")
+        cursor.execute(f"ALTER TABLE sensor_readings RENAME TO {OLD_TABLE};")
+        for partition in _partitions(cursor, OLD_TABLE):
+            cursor.execute(f"ALTER TABLE {partition} RENAME TO {partition}_old;")
+        for index in OLD_INDEXES:
+            cursor.execute(f"ALTER INDEX IF EXISTS {index} RENAME TO {index}_old;")
+        for constraint in OLD_CONSTRAINTS:
+            cursor.execute(
+                "SELECT 1 FROM pg_constraint WHERE conname = %s AND conrelid = %s::regclass;",
+                (constraint, OLD_TABLE)
+            )
+            if cursor.fetchone():
+                cursor.execute(f"ALTER TABLE {OLD_TABLE} RENAME CONSTRAINT {constraint} TO {constraint}_old;")
+
+        cursor.execute(f"ALTER TABLE {NEW_TABLE} RENAME TO sensor_readings;")
+        cursor.execute(f"ALTER TABLE sensor_readings RENAME CONSTRAINT {NEW_TABLE}_pkey TO sensor_readings_pkey;")
+        cursor.execute(
+            f"ALTER TABLE sensor_readings RENAME CONSTRAINT {READING_KEY_CONSTRAINT}_new TO {READING_KEY_CONSTRAINT};"
+        )
+        cursor.execute("ALTER INDEX idx_sensor_readings_timestamp_new RENAME TO idx_sensor_readings_timestamp;")
+        for partition in _partitions(cursor, "sensor_readings"):
+            if partition.startswith(NEW_PARTITION_PREFIX):
+                month = datetime.strptime(partition[len(NEW_PARTITION_PREFIX):], '%Y%m')
+                cursor.execute(f"ALTER TABLE {partition} RENAME TO {partition_name(month)};")
+        cursor.execute(f"ALTER TABLE {NEW_TABLE}_default RENAME TO {DEFAULT_PARTITION};")
+
+        # The id sequence must survive dropping the old table later
+        cursor.execute("ALTER SEQUENCE sensor_readings_id_seq OWNED BY sensor_readings.id;")
+        create_named_readings_view(cursor)
+
+        conn.commit()
+        logger.info("✅ Migration completed successfully!")
+        logger.info(f"   - sensor_readings now stores sensor_key SMALLINT ({SENSORS_TABLE}.id)")
+        logger.info(f"   - {NAMED_READINGS_VIEW} joins the external sensor_id back")
+        logger.info(f"   - Old table kept as {OLD_TABLE}; drop it after verifying:")
+        logger.info(f"       DROP TABLE {OLD_TABLE};")
+        logger.info("   - Restart the app so inserts and readers switch to sensor keys")
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.error(f"❌ Swap failed (nothing was renamed): {e}")
+        raise
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+
+def migrate_sensor_dictionary():
+    """Convert sensor_readings to dictionary-encoded sensor keys"""
+    db = get_db_manager()
+    run_migrations(db)
+    conn = None
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        if is_converted(cursor):
+            logger.info("✅ sensor_readings already uses sensor keys - no migration needed")
+            return
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+    create_keyed_table()
+    last_id = copy_rows()
+    swap_tables(last_id)
+
+
+def show_table_size():
+    """Display the size of sensor_readings and its indexes"""
+    db = get_db_manager()
+    conn = None
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COALESCE(SUM(pg_table_size(c.oid)), 0), COALESCE(SUM(pg_indexes_size(c.oid)), 0)
+            FROM pg_class c
+            WHERE c.oid = 'sensor_readings'::regclass
+               OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = 'sensor_readings'::regclass);
+        """)
+        table_bytes, index_bytes = cursor.fetchone()
+        layout = "sensor_key SMALLINT" if is_converted(cursor) else "sensor_id VARCHAR(100)"
+
+        print("\n" + "="*60)
+        print(f"📋 sensor_readings ({layout}):")
+        print("="*60)
+        print(f"  • heap     {table_bytes / 1024 / 1024:10.1f} MB")
+        print(f"  • indexes  {index_bytes / 1024 / 1024:10.1f} MB")
+        print("="*60 + "\n")
+
+    except Exception as e:
+        logger.error(f"❌ Failed to read table size: {e}")
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+
+if __name__ == "__main__":
+    print("\n" + "="*60)
+    print("🔄 Database Migration Tool")
+    print("="*60)
+    print("Task: Replace sensor_id VARCHAR with a SMALLINT sensor_key")
+    print("="*60 + "\n")
+
+    show_table_size()
+
+    # Ask for confirmation
+    response = input("Do you want to proceed with the migration? (yes/no): ")
+
+    if response.lower() in ['yes', 'y']:
+        print()
+        migrate_sensor_dictionary()
+        print()
+        show_table_size()
+    else:
+        print("\n❌ Migration cancelled by user\n")
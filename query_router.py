@@ -0,0 +1,135 @@
+"""Pick the cheapest storage tier that can answer a readings query.
+
+Three tiers can serve ``/api/data``, from cheapest to most expensive:
+
+    memory  The per-sensor ring buffers (``SensorBufferRegistry``). Only
+            usable while they still hold the whole requested range: nothing
+            before the process started, nothing already evicted.
+    rollup  The ``sensor_rollup_*`` tables (1 min / 30 min / 1 h / 1 d
+            aggregates). Usable when the caller wants a chart of ``points``
+            points (or an explicit ``resolution``) and a rollup bucket is no
+            wider than one point - so the chart loses nothing.
+    raw     ``sensor_readings`` itself; always possible.
+
+``QueryRouter.plan`` only decides; ``readings.py`` runs the plan. Every plan
+is counted per tier so ``/api/health`` shows how often each tier is hit.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from db_manager import ROLLUPS
+from ring_buffer import SensorBufferRegistry
+
+TIER_MEMORY = "memory"
+TIER_ROLLUP = "rollup"
+TIER_RAW = "raw"
+
+
+def wall_clock_epoch(value: datetime) -> float:
+    """Naive sensor wall-clock datetime -> ring buffer epoch (see ring_buffer.reading_epoch)"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+@dataclass
+class QueryPlan:
+    """Where a query will be answered from, and why"""
+    tier: str
+    reason: str
+    resolution: Optional[str] = None  # Rollup resolution for the rollup tier
+
+    @property
+    def counter(self) -> str:
+        return f"{self.tier}_{self.resolution}" if self.resolution else self.tier
+
+    def to_dict(self) -> Dict[str, Any]:
+        plan = {"tier": self.tier, "reason": self.reason}
+        if self.resolution:
+            plan["resolution"] = self.resolution
+        return plan
+
+
+class QueryRouter:
+    """
+    Chooses memory, rollup or raw storage per request.
+
+    Usage:
+        router = QueryRouter(weather_data)
+        plan = router.plan(start_dt, end_dt, sensor=None, points=800)
+        if plan.tier == TIER_MEMORY: ...
+    """
+
+    def __init__(self, buffers: SensorBufferRegistry, rollups_enabled: bool = True):
+        """
+        Args:
+            buffers: The live in-memory readings
+            rollups_enabled: False to never plan the rollup tier
+        """
+        self.buffers = buffers
+        self.rollups_enabled = rollups_enabled
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {TIER_MEMORY: 0, TIER_RAW: 0}
+        for resolution in ROLLUPS:
+            self._hits[f"{TIER_ROLLUP}_{resolution}"] = 0
+
+    def memory_covers(self, start: datetime, sensor: Optional[str] = None) -> bool:
+        """True if the ring buffers hold every reading from ``start`` onwards"""
+        return wall_clock_epoch(start) >= self.buffers.coverage_start(sensor)
+
+    def plan(
+        self,
+        start: datetime,
+        end: datetime,
+        sensor: Optional[str] = None,
+        points: Optional[int] = None,
+        resolution: Optional[str] = None,
+    ) -> QueryPlan:
+        """
+        Decide the tier for readings in [start, end] (naive GMT+8 wall clock).
+
+        Args:
+            start: Range start
+            end: Range end
+            sensor: One sensor_id, or None for all sensors
+            points: Target number of points (chart width), None for every row
+            resolution: Explicit rollup resolution ("1m", "30m", "1h", "1d")
+        """
+        if resolution is not None and resolution not in ROLLUPS:
+            raise ValueError(f"resolution must be one of {list(ROLLUPS)}")
+
+        if resolution:
+            plan = QueryPlan(TIER_ROLLUP, "resolution requested", resolution)
+        elif self.memory_covers(start, sensor):
+            plan = QueryPlan(TIER_MEMORY, "range is held in the ring buffers")
+        else:
+            plan = self._plan_storage(start, end, points)
+        self.record(plan)
+        return plan
+
+    def _plan_storage(self, start: datetime, end: datetime, points: Optional[int]) -> QueryPlan:
+        if not points:
+            return QueryPlan(TIER_RAW, "every row requested")
+        if not self.rollups_enabled:
+            return QueryPlan(TIER_RAW, "rollups disabled")
+        point_width = (end - start) / points
+        # Coarsest rollup whose buckets still fit inside one chart point
+        best = None
+        for name, (_, _, width) in ROLLUPS.items():
+            if width <= point_width and (best is None or width > ROLLUPS[best][2]):
+                best = name
+        if best is None:
+            return QueryPlan(TIER_RAW, "range too short for rollups")
+        return QueryPlan(TIER_ROLLUP, f"{points} points over {end - start}", best)
+
+    def record(self, plan: QueryPlan) -> None:
+        with self._lock:
+            self._hits[plan.counter] = self._hits.get(plan.counter, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-tier hit counters for /api/health"""
+        with self._lock:
+            return {"hits": dict(self._hits), "rollups_enabled": self.rollups_enabled}
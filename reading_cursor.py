@@ -0,0 +1,133 @@
+"""Opaque position in the readings stream for ``/api/data?since=``.
+
+A refresh after the first load should only move the readings the client
+does not have yet. Every time-range response of ``/api/data`` therefore
+carries a ``cursor``, and ``/api/data?since=<cursor>`` returns only the
+readings after it, oldest first, together with the next cursor.
+
+A cursor is the wall-clock time of the last reading delivered (epoch
+milliseconds, in the ring buffer encoding, see ``ring_buffer.reading_epoch``)
+plus a sequence number: how many readings with exactly that timestamp
+were already delivered. Several sensors report in the same second, so the
+timestamp alone cannot say where to resume. The ``since`` query asks for
+``timestamp >= epoch``, which is a binary search in the ring buffers or an
+index range scan in the database, and skips ``seq`` readings at ``epoch``.
+
+Readings at the same timestamp are ordered by row id in the database and
+by sensor in memory. If a client's cursor moves between the two (memory
+no longer covers it), readings at that one timestamp may be repeated.
+
+Clients must treat the encoded form (``"<epoch_ms>-<seq>"``) as opaque.
+
+``PageKey`` is the keyset position of ``/api/data?after=`` pages: the
+wall-clock time (epoch microseconds, the database resolution) and row id
+of the last reading of a page. Pages read only the database, where every
+row has an id, so the key is exact even when readings share a timestamp.
+Its encoded form is ``"<epoch_us>,<id>"``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from query_router import wall_clock_epoch
+
+
+def epoch_ms(ts: np.ndarray) -> np.ndarray:
+    """Ring buffer epochs (float seconds) -> int64 milliseconds, the cursor's resolution"""
+    return np.round(np.asarray(ts, dtype=np.float64) * 1000).astype(np.int64)
+
+
+def row_epoch_ms(timestamp: datetime) -> int:
+    """Database timestamp (wall clock of the session time zone) -> epoch milliseconds"""
+    return int(round(wall_clock_epoch(timestamp.replace(tzinfo=None)) * 1000))
+
+
+@dataclass(frozen=True)
+class ReadingCursor:
+    """Resume point: after ``seq`` readings at ``epoch_ms``"""
+    epoch_ms: int
+    seq: int = 0
+
+    def encode(self) -> str:
+        return f"{self.epoch_ms}-{self.seq}"
+
+    @classmethod
+    def decode(cls, token: str) -> "ReadingCursor":
+        """Parse an encoded cursor; ValueError if it is malformed"""
+        try:
+            epoch, seq = token.split("-")
+            cursor = cls(int(epoch), int(seq))
+        except (AttributeError, ValueError):
+            raise ValueError(f"invalid cursor {token!r}")
+        if cursor.seq < 0:
+            raise ValueError(f"invalid cursor {token!r}")
+        return cursor
+
+    @classmethod
+    def after(cls, ms) -> Optional["ReadingCursor"]:
+        """Cursor after every reading of a result, given its epoch_ms (None if empty)"""
+        ms = np.asarray(ms, dtype=np.int64)
+        if not len(ms):
+            return None
+        last = int(ms.max())
+        return cls(last, int(np.count_nonzero(ms == last)))
+
+    @property
+    def start(self) -> datetime:
+        """Naive wall-clock datetime of ``epoch_ms``, the inclusive lower bound to query"""
+        return datetime(1970, 1, 1) + timedelta(milliseconds=self.epoch_ms)
+
+    @property
+    def start_epoch(self) -> float:
+        """``epoch_ms`` as a ring buffer epoch"""
+        return self.epoch_ms / 1000.0
+
+    def skip(self, ms) -> int:
+        """Leading readings of a ``timestamp >= start`` result (sorted) already delivered"""
+        ms = np.asarray(ms, dtype=np.int64)
+        return min(self.seq, int(np.searchsorted(ms, self.epoch_ms, side="right")))
+
+    def advance(self, ms) -> "ReadingCursor":
+        """Cursor after delivering ``ms`` (sorted, all after this cursor)"""
+        cursor = self.after(ms)
+        if cursor is None:
+            return self
+        if cursor.epoch_ms == self.epoch_ms:
+            return ReadingCursor(self.epoch_ms, self.seq + cursor.seq)
+        return cursor
+
+
+@dataclass(frozen=True)
+class PageKey:
+    """Keyset position: the (timestamp, id) of the last reading delivered"""
+    epoch_us: int
+    id: int
+
+    def encode(self) -> str:
+        return f"{self.epoch_us},{self.id}"
+
+    @classmethod
+    def decode(cls, token: str) -> "PageKey":
+        """Parse an encoded page key; ValueError if it is malformed"""
+        try:
+            epoch, row_id = token.split(",")
+            return cls(int(epoch), int(row_id))
+        except (AttributeError, ValueError):
+            raise ValueError(f"invalid page key {token!r}")
+
+    @classmethod
+    def last(cls, arrays: Dict[str, np.ndarray]) -> Optional["PageKey"]:
+        """Key of the last row of a ``get_readings_page`` result (None if empty)"""
+        if not len(arrays["id"]):
+            return None
+        epoch_us = arrays["timestamp"][-1:].astype("datetime64[us]").astype(np.int64)[0]
+        return cls(int(epoch_us), int(arrays["id"][-1]))
+
+    def to_db(self) -> Tuple[datetime, int]:
+        """``(naive wall-clock datetime, id)``, the ``after`` of ``get_readings_page``"""
+        return datetime(1970, 1, 1) + timedelta(microseconds=self.epoch_us), self.id
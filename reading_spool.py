@@ -0,0 +1,363 @@
+"""Durable on-disk spool for readings that could not be written to PostgreSQL.
+
+When a batch insert fails (database down, pool exhausted, network split) the
+``ReadingWriter`` appends the rows here instead of losing them, and replays
+them in bulk once the database accepts writes again.
+
+File layout (``<directory>/spool.log``)::
+
+    header   8-byte magic b"ZDSPOOL1" + 16-byte spool id (uuid4)
+    record   <u32 payload length> <u32 crc32(payload)> <payload>
+    payload  <4 x f64: temperature, humidity, lux, irradiance (NaN = NULL)>
+             <timestamp isoformat> b"\\0" <sensor_id>   (UTF-8)
+
+Appends go through a buffered file and are fsync'ed at most every
+``fsync_interval_ms`` (or explicitly by the writer after spooling a failed
+batch), so a burst of rows costs one fsync. Only synced bytes are replayed.
+
+Replay maps the file with ``mmap`` and walks records from the last
+checkpoint. Each replayed batch is inserted *together with* its end offset
+(``spool_checkpoints`` table) in one transaction, so a crash mid-replay
+either commits both or neither: restarting resumes exactly after the last
+committed batch and never inserts a row twice. A batch the database rejects
+for its data is split in halves until the bad rows are found; those are
+skipped (their checkpoint is committed alone) and counted as ``rejected``,
+so one malformed record cannot stall the spool. Once everything has been
+replayed the file is atomically replaced by an empty one with a new spool id.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from db_manager import is_row_error
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ZDSPOOL1"
+HEADER_SIZE = len(MAGIC) + 16
+_RECORD_HEADER = struct.Struct("<II")
+_VALUES = struct.Struct("<4d")
+SPOOL_FILENAME = "spool.log"
+
+
+def encode_row(row: Tuple) -> bytes:
+    """(timestamp, sensor_id, temperature, humidity, lux, irradiance) -> record bytes"""
+    timestamp, sensor_id, temperature, humidity, lux, irradiance = row
+    values = _VALUES.pack(*(math.nan if v is None else float(v) for v in (temperature, humidity, lux, irradiance)))
+    payload = values + timestamp.isoformat().encode("utf-8") + b"\0" + str(sensor_id).encode("utf-8")
+    return _RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_payload(payload: bytes) -> Tuple:
+    values = [None if math.isnan(v) else v for v in _VALUES.unpack_from(payload)]
+    ts_raw, _, sensor_raw = payload[_VALUES.size:].partition(b"\0")
+    timestamp = datetime.fromisoformat(ts_raw.decode("utf-8"))
+    return (timestamp, sensor_raw.decode("utf-8"), *values)
+
+
+class ReadingSpool:
+    """
+    Append-only, fsync-batched spool file with idempotent replay.
+
+    Usage:
+        spool = ReadingSpool("spool")
+        spool.open()
+        spool.append(rows)              # any thread
+        spool.sync(force=True)          # make them durable
+        spool.replay(get_db_manager())  # writer thread, once the DB is back
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        fsync_interval_ms: int = 200,
+        max_bytes: int = 1024 * 1024 * 1024,
+    ):
+        """
+        Args:
+            directory: Where spool.log lives (created if missing)
+            fsync_interval_ms: Upper bound on how long appended rows stay unsynced
+            max_bytes: Rows are dropped once the spool file reaches this size
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, SPOOL_FILENAME)
+        self.fsync_interval = fsync_interval_ms / 1000.0
+        self.max_bytes = max_bytes
+        self.spool_id: Optional[str] = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._end = 0            # Bytes written (buffered or not)
+        self._synced = 0         # Bytes known to be on disk
+        self._dirty = False
+        self._last_sync = 0.0
+        self._replay_offset = HEADER_SIZE
+        self._checkpoint_loaded = False
+
+        # Counters exposed through stats()
+        self.spooled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.rejected = 0  # Rows the database refused on their own, skipped by replay
+        self.corrupt_bytes = 0
+        self.fsyncs = 0
+        self.last_replay_rate: Optional[float] = None  # Rows/s of the last replay pass
+        self.last_replay_time: Optional[float] = None
+
+    # ------------------------------------------------------------------
+    # File lifecycle
+    # ------------------------------------------------------------------
+
+    def open(self) -> None:
+        """Open (or create) the spool file, dropping a torn tail from a crash"""
+        with self._lock:
+            if self._file is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= HEADER_SIZE:
+                with open(self.path, "rb") as f:
+                    header = f.read(HEADER_SIZE)
+                if header[:len(MAGIC)] == MAGIC:
+                    self.spool_id = uuid.UUID(bytes=header[len(MAGIC):]).hex
+                    valid_end = self._scan_valid_end()
+                    self._file = open(self.path, "r+b")
+                    self._file.truncate(valid_end)
+                    self._file.seek(valid_end)
+                    self._end = self._synced = valid_end
+                    if valid_end > HEADER_SIZE:
+                        logger.info(f"📼 Found {valid_end - HEADER_SIZE} bytes of spooled readings to replay")
+                    return
+                logger.error(f"❌ {self.path} is not a spool file, starting a new one")
+            self._start_new_file()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._sync_locked()
+                self._file.close()
+                self._file = None
+
+    def _start_new_file(self) -> None:
+        """Atomically replace the spool with an empty one under a new id (lock held)"""
+        spool_id = uuid.uuid4()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC + spool_id.bytes)
+            f.flush()
+            os.fsync(f.fileno())
+        if self._file is not None:
+            self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "r+b")
+        self._file.seek(HEADER_SIZE)
+        self.spool_id = spool_id.hex
+        self._end = self._synced = HEADER_SIZE
+        self._replay_offset = HEADER_SIZE
+        self._checkpoint_loaded = False
+        self._dirty = False
+
+    def _scan_valid_end(self) -> int:
+        """Offset just past the last complete, checksummed record"""
+        size = os.path.getsize(self.path)
+        if size <= HEADER_SIZE:
+            return HEADER_SIZE
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            offset = HEADER_SIZE
+            for _, end in _iter_records(mm, offset, size):
+                offset = end
+            if offset < size:
+                logger.warning(f"⚠️  Discarding {size - offset} bytes of incomplete spool records")
+            return offset
+
+    # ------------------------------------------------------------------
+    # Appending
+    # ------------------------------------------------------------------
+
+    def append(self, rows: List[Tuple]) -> int:
+        """Buffer rows for the spool. Returns how many were accepted."""
+        data = b"".join(encode_row(row) for row in rows)
+        with self._lock:
+            if self._file is None:
+                raise RuntimeError("spool is not open")
+            if self._end + len(data) > self.max_bytes:
+                self.dropped += len(rows)
+                return 0
+            self._file.write(data)
+            self._end += len(data)
+            self._dirty = True
+            self.spooled += len(rows)
+            return len(rows)
+
+    def sync(self, force: bool = False) -> None:
+        """fsync buffered appends if forced or the fsync interval has passed"""
+        if not self._dirty:
+            return
+        if not force and time.monotonic() - self._last_sync < self.fsync_interval:
+            return
+        with self._lock:
+            self._sync_locked()
+
+    def _sync_locked(self) -> None:
+        if not self._dirty or self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._synced = self._end
+        self._dirty = False
+        self._last_sync = time.monotonic()
+        self.fsyncs += 1
+
+    @property
+    def has_pending(self) -> bool:
+        return self._end > self._replay_offset
+
+    # ------------------------------------------------------------------
+    # Replay
+    # ------------------------------------------------------------------
+
+    def replay(
+        self,
+        db: Any,
+        batch_size: int = 500,
+        max_batches: int = 20,
+        on_batch: Optional[Callable[[List[Tuple]], None]] = None,
+    ) -> int:
+        """
+        Insert up to ``max_batches`` batches of spooled rows.
+
+        Each batch is committed together with its checkpoint through
+        ``db.insert_spooled_readings_batch``. Connection errors propagate so
+        the caller can back off, and nothing is skipped. Rows the database
+        rejects for their data are isolated and skipped (see _replay_batch).
+        ``on_batch`` is called with each batch once it is committed.
+
+        Returns:
+            Number of rows replayed
+        """
+        self.sync(force=True)
+        if not self._checkpoint_loaded:
+            checkpoint = db.get_spool_checkpoint(self.spool_id)
+            if checkpoint is not None and checkpoint > self._replay_offset:
+                self._replay_offset = checkpoint
+            self._checkpoint_loaded = True
+
+        started = time.perf_counter()
+        replayed = 0
+        limit = self._synced
+        if limit > self._replay_offset:
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), limit, access=mmap.ACCESS_READ) as mm:
+                batch: List[Tuple] = []
+                ends: List[int] = []  # Spool offset just past each row of the batch
+                batches = 0
+                end = self._replay_offset
+                for payload, end in _iter_records(mm, self._replay_offset, limit):
+                    batch.append(decode_payload(payload))
+                    ends.append(end)
+                    if len(batch) >= batch_size:
+                        replayed += self._replay_batch(db, batch, ends, on_batch)
+                        self._replay_offset = end
+                        batch, ends = [], []
+                        batches += 1
+                        if batches >= max_batches:
+                            break
+                else:
+                    if batch:
+                        replayed += self._replay_batch(db, batch, ends, on_batch)
+                    if end < limit:
+                        # A checksum mismatch inside synced data: the length
+                        # prefix cannot be trusted, so the rest is unreadable
+                        self.corrupt_bytes += limit - end
+                        logger.error(f"❌ Spool corrupt at offset {end}, skipping {limit - end} bytes")
+                    self._replay_offset = limit
+
+        elapsed = time.perf_counter() - started
+        if replayed:
+            self.replayed += replayed
+            self.last_replay_rate = replayed / elapsed if elapsed > 0 else None
+            self.last_replay_time = time.time()
+            logger.info(f"📼 Replayed {replayed} spooled readings ({self.pending_bytes} bytes left)")
+
+        with self._lock:
+            if self._replay_offset >= self._end and self._end > HEADER_SIZE:
+                self._start_new_file()
+        return replayed
+
+    def _replay_batch(
+        self,
+        db: Any,
+        rows: List[Tuple],
+        ends: List[int],
+        on_batch: Optional[Callable[[List[Tuple]], None]],
+    ) -> int:
+        """
+        Commit one batch with its checkpoint. If the database rejects the
+        batch for its data, replay each half separately; a single rejected
+        row is skipped by committing its checkpoint without it.
+        """
+        try:
+            written = db.insert_spooled_readings_batch(rows, self.spool_id, ends[-1])
+        except Exception as e:
+            if not is_row_error(e):
+                raise
+            if len(rows) == 1:
+                db.insert_spooled_readings_batch([], self.spool_id, ends[0])
+                self.rejected += 1
+                logger.error(f"❌ Skipping spooled reading {rows[0]!r} rejected by the database: {e}")
+                return 0
+            middle = len(rows) // 2
+            return (self._replay_batch(db, rows[:middle], ends[:middle], on_batch)
+                    + self._replay_batch(db, rows[middle:], ends[middle:], on_batch))
+        if on_batch:
+            on_batch(rows)
+        return written
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    @property
+    def pending_bytes(self) -> int:
+        return max(0, self._end - self._replay_offset)
+
+    def stats(self) -> Dict[str, Any]:
+        """Spool size and replay counters for /api/health"""
+        return {
+            "path": self.path,
+            "spool_id": self.spool_id,
+            "size_bytes": self._end,
+            "pending_bytes": self.pending_bytes,
+            "max_bytes": self.max_bytes,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "corrupt_bytes": self.corrupt_bytes,
+            "fsyncs": self.fsyncs,
+            "replay_rows_per_second": round(self.last_replay_rate, 1) if self.last_replay_rate else None,
+            "last_replay_time": datetime.utcfromtimestamp(self.last_replay_time).isoformat() if self.last_replay_time else None,
+        }
+
+
+def _iter_records(buf, offset: int, limit: int):
+    """Yield (payload, end offset) for each intact record in buf[offset:limit]"""
+    header_size = _RECORD_HEADER.size
+    while offset + header_size <= limit:
+        length, crc = _RECORD_HEADER.unpack_from(buf, offset)
+        end = offset + header_size + length
+        if end > limit:
+            return
+        payload = bytes(buf[offset + header_size:end])
+        if zlib.crc32(payload) != crc:
+            return
+        yield payload, end
+        offset = end
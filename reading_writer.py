@@ -0,0 +1,372 @@
+"""Write-behind persistence queue for sensor readings.
+
+The TCP ingest thread must never wait on PostgreSQL. Instead of inserting
+each reading synchronously, ``_ingest_line`` hands a row tuple to
+``ReadingWriter.submit``, which only appends to a bounded in-process queue.
+A dedicated writer thread drains the queue and flushes every ``batch_size``
+rows or every ``flush_interval_ms`` milliseconds, whichever comes first,
+with one multi-row INSERT and a single commit. A batch the database
+rejects because of its data (a value out of range, a string too long) is
+split in halves until the bad rows are found; only those are dropped and
+counted as ``rejected``.
+
+With a ``ReadingSpool`` attached, rows that cannot be written (failed flush
+or full queue) are appended to the on-disk spool instead of being lost. While
+the spool holds unreplayed rows, new batches are spooled too (so readings
+stay roughly in order and a dead database is not retried for every batch),
+and the writer thread replays the spool in bulk, backing off between failed
+attempts.
+
+Rows are tuples in the column order used by
+``DatabaseManager.insert_sensor_readings_batch``:
+    (timestamp, sensor_id, temperature, humidity, lux, irradiance)
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from db_manager import is_row_error
+from reading_spool import ReadingSpool
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # Sentinel telling the writer thread to flush and exit
+
+
+class ReadingWriter:
+    """
+    Bounded queue plus background writer thread for batched inserts.
+
+    Usage:
+        writer = ReadingWriter(get_db_manager)
+        writer.start()
+        writer.submit((ts, "sensor-1", 24.1, 50.5, 546.6, 4.3))
+        writer.stop()  # flushes whatever is still queued
+    """
+
+    def __init__(
+        self,
+        db_provider: Callable[[], Any],
+        max_queue: int = 50000,
+        batch_size: int = 500,
+        flush_interval_ms: int = 1000,
+        spool: Optional[ReadingSpool] = None,
+        replay_retry_seconds: float = 5.0,
+        on_persisted: Optional[Callable[[List[Tuple]], None]] = None,
+    ):
+        """
+        Args:
+            db_provider: Returns the DatabaseManager (called lazily on the writer thread)
+            max_queue: Rows held in memory before new readings are spooled or dropped
+            batch_size: Flush as soon as this many rows are pending
+            flush_interval_ms: Flush pending rows at least this often
+            spool: Durable overflow for rows the database could not take
+            replay_retry_seconds: Wait between replay attempts while the database is down
+            on_persisted: Called on the writer thread with every batch committed
+                to the database (directly or by spool replay), e.g. to invalidate caches
+        """
+        self.db_provider = db_provider
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.spool = spool
+        self.replay_retry_seconds = replay_retry_seconds
+        self.on_persisted = on_persisted
+        self._next_replay = 0.0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()  # Stop request when _STOP cannot be queued
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        # Counters exposed through stats()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.rejected = 0  # Rows the database refused on their own (bad values), never retried
+        self.spooled = 0
+        self.duplicates = 0  # Rows the database already had (same sensor_id and timestamp)
+        self.flushes = 0
+        self.max_queue_depth = 0
+        self.last_flush_ms: Optional[float] = None
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self.last_flush_time: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # Producer side (network thread)
+    # ------------------------------------------------------------------
+
+    def submit(self, row: Tuple) -> bool:
+        """
+        Queue one row without blocking.
+
+        If the queue is full the row goes to the spool (when configured).
+        Returns False only if the row was dropped.
+        """
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            spooled = self._spool_rows([row])
+            with self._stats_lock:
+                if not spooled:
+                    self.dropped += 1
+            return spooled
+        with self._stats_lock:
+            self.enqueued += 1
+            depth = self._queue.qsize()
+            if depth > self.max_queue_depth:
+                self.max_queue_depth = depth
+        return True
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Start the writer thread exactly once"""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self.spool is not None:
+                self.spool.open()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="db-writer")
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Flush all queued rows and stop the writer thread, waiting at most
+        about ``timeout`` seconds.
+
+        Rows the writer could not get to in time are spooled from here when
+        possible; the rest are lost and counted as dropped.
+        """
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            # Queue stuck full (database down, spool full or absent): never block exit on it
+            self._stop_event.set()
+        thread.join(max(0.0, deadline - time.monotonic()))
+        if not thread.is_alive():
+            return
+
+        self._stop_event.set()
+        rows: List[Tuple] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                rows.append(item)
+        spooled = len(rows) if rows and self._spool_rows(rows, sync=True) else 0
+        lost = len(rows) - spooled
+        if lost:
+            with self._stats_lock:
+                self.dropped += lost
+        logger.warning(
+            f"⚠️  DB writer did not finish within {timeout}s: "
+            f"{spooled} queued readings spooled, {lost} lost"
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    def _run(self) -> None:
+        batch: List[Tuple] = []
+        deadline = time.monotonic() + self.flush_interval
+        stopping = False
+
+        while not stopping:
+            stopping = self._stop_event.is_set()
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                    # Drain whatever else is already waiting, up to a full batch
+                    while len(batch) < self.batch_size:
+                        item = self._queue.get_nowait()
+                        if item is _STOP:
+                            stopping = True
+                            break
+                        batch.append(item)
+            except queue.Empty:
+                pass
+
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+            if self.spool is not None:
+                self.spool.sync()
+                self._maybe_replay()
+
+        # Shutdown: write everything that is still queued
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+        if self.spool is not None:
+            self.spool.close()
+
+    def _flush(self, batch: List[Tuple]) -> None:
+        # Outage in progress: keep appending to the spool until replay catches up
+        if self.spool is not None and self.spool.has_pending and self._spool_rows(batch, sync=True):
+            return
+
+        started = time.perf_counter()
+        rejected: List[Tuple] = []
+        try:
+            written, rejected = self._insert_isolating(self.db_provider(), batch)
+            error = None
+        except Exception as e:
+            written = 0
+            error = str(e)
+            logger.error(f"❌ DB writer failed to flush {len(batch)} readings: {e}")
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+
+        spooled = error is not None and self._spool_rows(batch, sync=True)
+        if spooled:
+            self._next_replay = time.monotonic() + self.replay_retry_seconds
+        elif error is None:
+            self._notify_persisted(batch)
+
+        with self._stats_lock:
+            self.flushes += 1
+            self.written += written
+            if error is None:
+                self.rejected += len(rejected)
+                self.duplicates += len(batch) - len(rejected) - written
+                if rejected:
+                    self.last_error = f"{len(rejected)} readings rejected by the database"
+            else:
+                if not spooled:
+                    self.failed += len(batch)
+                self.last_error = error
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+            self.last_flush_time = time.time()
+
+    def _insert_isolating(self, db: Any, rows: List[Tuple]) -> Tuple[int, List[Tuple]]:
+        """
+        Insert rows; if the database rejects the batch for its data, insert
+        each half separately until the bad rows are isolated.
+
+        Returns:
+            (rows written, rows rejected). Errors that are not about the rows
+            (connection lost, pool exhausted) are raised.
+        """
+        try:
+            return db.insert_sensor_readings_batch(rows), []
+        except Exception as e:
+            if not is_row_error(e):
+                raise
+            if len(rows) == 1:
+                logger.error(f"❌ Database rejected reading {rows[0]!r}: {e}")
+                return 0, list(rows)
+        middle = len(rows) // 2
+        written, rejected = self._insert_isolating(db, rows[:middle])
+        more_written, more_rejected = self._insert_isolating(db, rows[middle:])
+        return written + more_written, rejected + more_rejected
+
+    def _spool_rows(self, rows: List[Tuple], sync: bool = False) -> bool:
+        """Append rows to the spool; False if there is no spool or it is full"""
+        if self.spool is None:
+            return False
+        try:
+            accepted = self.spool.append(rows)
+            if sync:
+                self.spool.sync(force=True)
+        except Exception as e:
+            logger.error(f"❌ Failed to spool {len(rows)} readings: {e}")
+            return False
+        if accepted:
+            with self._stats_lock:
+                self.spooled += accepted
+        return accepted == len(rows)
+
+    def _maybe_replay(self) -> None:
+        """Replay spooled rows unless the last attempt failed recently"""
+        if not self.spool.has_pending or time.monotonic() < self._next_replay:
+            return
+        try:
+            self.spool.replay(self.db_provider(), self.batch_size, on_batch=self._notify_persisted)
+        except Exception as e:
+            self._next_replay = time.monotonic() + self.replay_retry_seconds
+            with self._stats_lock:
+                self.last_error = str(e)
+            logger.warning(f"⚠️  Spool replay failed, retrying in {self.replay_retry_seconds:.0f}s: {e}")
+
+    def _notify_persisted(self, rows: List[Tuple]) -> None:
+        if self.on_persisted is None:
+            return
+        try:
+            self.on_persisted(rows)
+        except Exception as e:
+            logger.error(f"❌ on_persisted callback failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    @property
+    def persisted(self) -> int:
+        """Rows inserted into the database so far, directly or by spool replay"""
+        return self.written + (self.spool.replayed if self.spool is not None else 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and flush latency counters for /api/health"""
+        with self._stats_lock:
+            return {
+                "running": self.running,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "queue_capacity": self._queue.maxsize,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "spooled": self.spooled,
+                "duplicates": self.duplicates,
+                "flushes": self.flushes,
+                "batch_size": self.batch_size,
+                "flush_interval_ms": int(self.flush_interval * 1000),
+                "last_flush_ms": round(self.last_flush_ms, 2) if self.last_flush_ms is not None else None,
+                "avg_flush_ms": round(self._total_flush_ms / self.flushes, 2) if self.flushes else None,
+                "max_flush_ms": round(self.max_flush_ms, 2),
+                "seconds_since_last_flush": round(time.time() - self.last_flush_time, 1) if self.last_flush_time else None,
+                "last_error": self.last_error,
+                "spool": self.spool.stats() if self.spool is not None else None,
+            }
@@ -6,46 +6,149 @@ Features:
  - Stores data in PostgreSQL database for persistence
  - Maintains in-memory buffer for real-time display
  - Flask web UI with three live line charts (Temperature, Humidity, Lux) using Chart.js
- - Polling every 5 seconds to update charts (simple + robust). Can later be upgraded to WebSockets/SSE.
+ - Live charts fed by Server-Sent Events (/api/stream), with 5-second polling as the fallback
 """
 
 from __future__ import annotations
 
 import json
-import socket
+import math
+import os
 import threading
-from collections import deque
+import zlib
 from datetime import datetime, timedelta, timezone
-from typing import Deque, Dict, Any, List
-import csv
-from io import StringIO
+from itertools import chain
+from typing import Dict, Any, Iterator
 
-from flask import Flask, jsonify, make_response, request, render_template, Response
+from flask import Flask, jsonify, make_response, request, render_template, Response, stream_with_context
 
 # Import KPI calculation modules
 from data_sources import create_data_provider
 from kpi_calculator import create_kpi_calculator
 
 # Import database manager
-from db_manager import get_db_manager
+from db_manager import current_db_manager, get_db_manager, ROLLUPS
 
 # Import cleaning tracker
 from cleaning_tracker import get_cleaning_tracker
 
+# Import event-driven gateway server
+from ingest_server import IngestServer, GatewayConnection
+
+# Import write-behind persistence queue and its on-disk outage spool
+from reading_writer import ReadingWriter
+from reading_spool import ReadingSpool
+
+# Import cached database statistics for polled endpoints
+from db_stats import DatabaseStatsSnapshot
+
+# Import the closed-day payload cache
+from day_cache import DayPayloadCache
+
+# Import the live reading fan-out for /api/stream
+from live_stream import LiveBroadcaster
+
+# Import columnar in-memory buffer
+from ring_buffer import SensorBufferRegistry
+
+# Import chart downsampling and the storage tier router
+from downsampling import downsample, expand_buckets, DEFAULT_METHOD, LTTB_OVERSAMPLING, METHODS
+from query_router import QueryRouter, QueryPlan, TIER_MEMORY, TIER_ROLLUP, TIER_RAW, wall_clock_epoch
+
+# Import the /api/data?since= delta cursor
+from reading_cursor import PageKey, ReadingCursor, row_epoch_ms
+
+# Import the columnar JSON and gzip encodings
+from api_encoding import ReadingColumns, encode_readings, rows_fragment, gzip_bytes, gzip_chunks, COLUMNAR, FORMATS, ROWS
+
 APP_HOST = "0.0.0.0"
 HTTP_PORT = 5000
 TCP_PORT = 6000
-MAX_SAMPLES = 1000  # Reduced for in-memory buffer (real-time display only)
+TCP_IDLE_TIMEOUT = 60  # Seconds without data before a gateway connection is dropped
+TCP_MAX_CONNECTIONS = 512  # Concurrent gateway connections accepted by the ingest server
+MAX_SAMPLES = int(os.getenv('MAX_SAMPLES', '86400'))  # In-memory rows per sensor (64 B each: 24 h of per-second data ≈ 5.5 MB per sensor)
+MAX_SENSORS = int(os.getenv('MAX_SENSORS', '256'))  # Sensors kept in memory; readings from further new ids are only persisted
+MAX_BUFFER_MB = int(os.getenv('MAX_BUFFER_MB', '256'))  # Total ring buffer memory; new sensor ids past it are only persisted
+# Per-sensor overrides of MAX_SAMPLES, e.g. "e4643048d7292c2e:3600,site-b-pyrano:172800"
+SENSOR_BUFFER_CAPACITIES = {
+		sensor_id.strip(): int(capacity)
+		for sensor_id, _, capacity in (
+				item.rpartition(':') for item in os.getenv('SENSOR_BUFFER_CAPACITIES', '').split(',') if ':' in item
+		)
+}
+# Database storage mode:
+#   "throttled" - persist at most one reading per sensor every DB_THROTTLE_SECONDS
+#   "full"      - persist every reading (lossless, relies on batched writes)
+DB_STORAGE_MODE = os.getenv('DB_STORAGE_MODE', 'throttled').lower()
+DB_THROTTLE_SECONDS = float(os.getenv('DB_THROTTLE_SECONDS', '60'))
+DB_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', '500'))  # Rows per multi-row INSERT
+DB_FLUSH_INTERVAL_MS = int(os.getenv('DB_FLUSH_INTERVAL_MS', '1000'))  # Max time a queued reading waits before being written
+DB_QUEUE_SIZE = int(os.getenv('DB_QUEUE_SIZE', '50000'))  # Readings buffered in memory while the database is slow
+# Readings the database cannot take (outage, full queue) are spooled here and replayed later
+SPOOL_DIR = os.getenv('SPOOL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spool'))
+SPOOL_MAX_MB = int(os.getenv('SPOOL_MAX_MB', '1024'))
+SPOOL_FSYNC_MS = int(os.getenv('SPOOL_FSYNC_MS', '200'))  # Max time a spooled reading waits for fsync
+DB_RETENTION_DAYS = int(os.getenv('DB_RETENTION_DAYS', '0'))  # Drop readings older than this (0 = keep everything)
+DB_MAINTENANCE_INTERVAL = 6 * 3600  # Seconds between partition/retention maintenance runs
+DB_STATS_REFRESH_SECONDS = float(os.getenv('DB_STATS_REFRESH_SECONDS', '30'))  # Max age of the cached row counts / date range
+DAY_CACHE_MB = int(os.getenv('DAY_CACHE_MB', '64'))  # Compressed /api/data?date= payloads kept in memory
+DAY_CACHE_GRACE_MINUTES = int(os.getenv('DAY_CACHE_GRACE_MINUTES', '60'))  # A day is cached once it ended this long ago
+DAY_CACHE_MAX_AGE = int(os.getenv('DAY_CACHE_MAX_AGE', '0'))  # Browser/proxy max-age for closed days (0 = revalidate by ETag)
+QUERY_ROLLUPS = os.getenv('QUERY_ROLLUPS', 'true').lower() == 'true'  # Let /api/data read rollup tables (build them first)
+GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', '48'))  # Server threads (gunicorn.conf.py reads the same setting)
+LIVE_STREAM_MAX_CLIENTS = int(os.getenv('LIVE_STREAM_MAX_CLIENTS', '32'))  # Open /api/stream connections (one server thread each)
+# Keep a third of the server threads for regular requests, whatever the stream limit says
+_LIVE_STREAM_THREAD_CAP = GUNICORN_THREADS - max(1, GUNICORN_THREADS // 3)
+if LIVE_STREAM_MAX_CLIENTS > _LIVE_STREAM_THREAD_CAP:
+	print(f"⚠️ LIVE_STREAM_MAX_CLIENTS={LIVE_STREAM_MAX_CLIENTS} would tie up the {GUNICORN_THREADS} GUNICORN_THREADS, using {_LIVE_STREAM_THREAD_CAP}")
+	LIVE_STREAM_MAX_CLIENTS = max(0, _LIVE_STREAM_THREAD_CAP)
+LIVE_STREAM_QUEUE = int(os.getenv('LIVE_STREAM_QUEUE', '256'))  # Readings buffered per client before it is dropped as too slow
+LIVE_STREAM_HEARTBEAT_SECONDS = float(os.getenv('LIVE_STREAM_HEARTBEAT_SECONDS', '15'))  # Keepalive comment on idle streams
+GZIP_MIN_BYTES = int(os.getenv('GZIP_MIN_BYTES', '8192'))  # JSON responses at least this large are gzipped when accepted
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '5'))  # 1 (fastest) .. 9 (smallest); 5 is ~4x faster than 9 for ~8% more bytes
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '50000'))  # Largest /api/data?page_size= (rows held per request)
 DEBUG = True  # Set False for quieter logs
 
 app = Flask(__name__)
 
-# Thread-safe ring buffer for structured readings
-weather_data: Deque[Dict[str, Any]] = deque(maxlen=MAX_SAMPLES)
-_data_lock = threading.Lock()
-
-# Track last database insertion time
-_last_db_insertion_time = None
+# One thread-safe ring buffer per sensor_id for structured readings
+weather_data = SensorBufferRegistry(
+		MAX_SAMPLES, SENSOR_BUFFER_CAPACITIES, max_sensors=MAX_SENSORS, max_bytes=MAX_BUFFER_MB * 1024 * 1024
+)
+
+# Row counts and date range served to /api/health, /api/status and /api/dates
+db_stats_snapshot = DatabaseStatsSnapshot(
+		get_db_manager,
+		written_counter=lambda: _db_writer.persisted,
+		refresh_seconds=DB_STATS_REFRESH_SECONDS,
+)
+
+# Picks memory, rollup or raw storage for each /api/data request
+query_router = QueryRouter(weather_data, rollups_enabled=QUERY_ROLLUPS)
+
+# Pushes every ingested reading to the open /api/stream connections
+live_stream = LiveBroadcaster(
+		queue_size=LIVE_STREAM_QUEUE,
+		heartbeat_seconds=LIVE_STREAM_HEARTBEAT_SECONDS,
+		max_subscribers=LIVE_STREAM_MAX_CLIENTS,
+)
+
+# Track last database insertion time per sensor_id (throttled mode only).
+# Only touched by the TCP thread, so no lock is needed.
+_last_db_insertion_by_sensor: Dict[str, datetime] = {}
+
+# Serialized payloads of closed days; invalidated when rows for a day are written
+day_cache = DayPayloadCache(max_bytes=DAY_CACHE_MB * 1024 * 1024)
+
+# Background writer that batches readings into PostgreSQL
+_db_writer = ReadingWriter(
+		get_db_manager,
+		max_queue=DB_QUEUE_SIZE,
+		batch_size=DB_BATCH_SIZE,
+		flush_interval_ms=DB_FLUSH_INTERVAL_MS,
+		spool=ReadingSpool(SPOOL_DIR, fsync_interval_ms=SPOOL_FSYNC_MS, max_bytes=SPOOL_MAX_MB * 1024 * 1024),
+		on_persisted=day_cache.invalidate_rows,
+)
 
 # Debug / metrics state
 bytes_received = 0
@@ -55,10 +158,17 @@ last_valid_raw = ""
 last_invalid_raw = ""
 
 
+MAX_SENSOR_ID_LENGTH = 100  # sensor_id / sensors.external_id are VARCHAR(100)
+MAX_READING_VALUE = 3.4e38  # Largest magnitude a REAL column holds
+
+
 def parse_reading(raw: str) -> Dict[str, Any] | None:
 		"""Attempt to parse a JSON reading, return dict or None if invalid.
 
 		Ensures required keys exist; normalizes time to ISO 8601 string.
+		Rejects values the database cannot store (sensor ids over
+		MAX_SENSOR_ID_LENGTH characters, NaN, infinite or out-of-range numbers),
+		so one bad reading never reaches a write batch.
 		"""
 		raw = raw.strip()
 		if not raw:
@@ -80,177 +190,112 @@ def parse_reading(raw: str) -> Dict[str, Any] | None:
 				except Exception:
 						dt = datetime.utcnow()
 				obj["time_iso"] = dt.isoformat()
-				# Cast numeric fields
-				for num_key in ("temp", "rh", "lux"):
+				# Epoch for the columnar buffer; naive sensor wall clock is encoded as UTC
+				obj["epoch"] = (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+				sensor_id = obj.get("id")
+				if sensor_id is not None and (len(str(sensor_id)) > MAX_SENSOR_ID_LENGTH or "\0" in str(sensor_id)):
+						return None
+				# Cast numeric fields (irradiance is optional)
+				for num_key in ("temp", "rh", "lux", "irradiance"):
+						if num_key == "irradiance" and obj.get(num_key) is None:
+								continue
 						try:
 								obj[num_key] = float(obj[num_key])
 						except Exception:
 								return None
+						if not math.isfinite(obj[num_key]) or abs(obj[num_key]) > MAX_READING_VALUE:
+								return None
 				return obj
 		except json.JSONDecodeError:
 				return None
 
 
 def tcp_server():
-		"""Receives data from gateway over plain TCP with robust error handling.
+		"""Receives data from gateways over plain TCP with robust error handling.
 
 		Expects newline-delimited JSON objects or single JSON objects per packet.
-		Automatically recovers from errors and keeps running.
+		All gateway connections are multiplexed on this thread by IngestServer,
+		so several sites can stream at the same time. Automatically recovers
+		from errors and keeps running.
 		"""
-		global _tcp_last_activity
+		global _tcp_last_activity, _ingest_server
 		print(f"🚀 Starting TCP Server on port {TCP_PORT}...")
 		
 		while True:  # Outer loop: restart server on fatal errors
-				s = None
 				try:
 						_tcp_last_activity = datetime.utcnow()
-						s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-						s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-						# Set socket timeout to detect stale connections
-						s.settimeout(300)  # 5 minute timeout
-						s.bind((APP_HOST, TCP_PORT))
-						s.listen(5)
+						_ingest_server = IngestServer(
+								APP_HOST,
+								TCP_PORT,
+								on_data=_handle_gateway_data,
+								on_close=_handle_gateway_close,
+								idle_timeout=TCP_IDLE_TIMEOUT,
+								max_connections=TCP_MAX_CONNECTIONS,
+								on_activity=_touch_tcp_activity,
+						)
 						print(f"✅ TCP Server listening on port {TCP_PORT}")
-						
-						while True:  # Inner loop: accept connections
-								try:
-										_tcp_last_activity = datetime.utcnow()
-										client, addr = s.accept()
-										print(f"🔌 Gateway connected from {addr}")
-										
-										# Set client socket timeout
-										client.settimeout(60)  # 60 second timeout for recv
-										
-										buffer = ""
-										try:
-												while True:
-														try:
-																_tcp_last_activity = datetime.utcnow()
-																data = client.recv(4096)
-																if not data:
-																		# Connection closed gracefully
-																		print(f"📴 Gateway {addr} disconnected")
-																		objs, buffer = _extract_json_objects(buffer)
-																		for obj in objs:
-																				_ingest_line(obj)
-																		break
-																
-																decoded_chunk = data.decode("utf-8", errors="ignore")
-																buffer += decoded_chunk
-																
-																# Update debug counters
-																global bytes_received
-																bytes_received += len(data)
-																
-																if DEBUG:
-																		print(f"[TCP] recv {len(data)} bytes, buffer_len={len(buffer)} preview={decoded_chunk[:80]!r}")
-																
-																# Support newline delim (common for gateways)
-																if "\n" in buffer:
-																		parts = buffer.split("\n")
-																		buffer = parts.pop()
-																		for p in parts:
-																				_ingest_line(p)
-																
-																# Extract any complete JSON blobs and keep remainder (partial)
-																objs, buffer = _extract_json_objects(buffer)
-																for obj in objs:
-																		_ingest_line(obj)
-																		
-														except socket.timeout:
-																print(f"⚠️  Socket timeout for {addr} - closing connection")
-																break
-														except Exception as e:
-																print(f"❌ Error receiving data from {addr}: {e}")
-																break
-												
-										finally:
-												client.close()
-												print(f"🔒 Connection closed for {addr}")
-												
-								except socket.timeout:
-										# Accept timeout - this is normal, just continue
-										continue
-								except Exception as e:
-										print(f"❌ Error accepting connection: {e}")
-										# Continue accepting new connections
-										continue
-						
+						_ingest_server.serve_forever()
 				except Exception as e:
 						print(f"💥 Fatal TCP server error: {e}")
 						print("🔄 Restarting TCP server in 5 seconds...")
-						if s:
-								try:
-										s.close()
-								except:
-										pass
 						import time
 						time.sleep(5)
 						# Loop continues, server will restart
 
 
-def _extract_json_objects(buffer: str):
-		"""Extract complete JSON objects from buffer (supports concatenated objects).
+def _touch_tcp_activity() -> None:
+		global _tcp_last_activity
+		_tcp_last_activity = datetime.utcnow()
+
+
+def _handle_gateway_data(conn: GatewayConnection, data: bytes) -> None:
+		"""Frame and ingest bytes received from one gateway connection.
 
-		Returns (objects_list, remaining_partial_buffer).
-		Keeps an in-progress (partial) JSON object in the remaining buffer so
-		that subsequent TCP reads can complete it.
+		The connection's JsonFramer keeps partial-object state between chunks,
+		so each byte is scanned once and only complete frames are decoded.
 		"""
-		objs: List[str] = []
-		start = -1
-		depth = 0
-		in_string = False
-		escape = False
-		for i, ch in enumerate(buffer):
-				if start == -1:
-						if ch == '{':
-								start = i
-								depth = 1
-						else:
-								continue
-						continue
-				# Inside a candidate object
-				if in_string:
-						if escape:
-								escape = False
-						elif ch == '\\':
-								escape = True
-						elif ch == '"':
-								in_string = False
-				elif ch == '"':
-						in_string = True
-				elif ch == '{':
-						depth += 1
-				elif ch == '}':
-						depth -= 1
-						if depth == 0 and start != -1:
-								objs.append(buffer[start : i + 1])
-								start = -1
-		# Determine remaining (partial) buffer
-		if start != -1 and depth > 0:
-				remaining = buffer[start:]
-		else:
-				remaining = ''
-		return objs, remaining
+		global bytes_received
+		bytes_received += len(data)
+		
+		frames = conn.framer.feed(data)
+		
+		if DEBUG:
+				print(f"[TCP] recv {len(data)} bytes from {conn.addr}, frames={len(frames)} pending={len(conn.framer)} preview={bytes(data[:80])!r}")
+		
+		for frame in frames:
+				_ingest_line(frame.decode("utf-8", errors="ignore"))
+
+
+def _handle_gateway_close(conn: GatewayConnection) -> None:
+		"""Ingest whatever remains buffered when a gateway disconnects."""
+		for frame in conn.framer.flush():
+				_ingest_line(frame.decode("utf-8", errors="ignore"))
 
 
 def _ingest_line(line: str) -> None:
 		reading = parse_reading(line)
 		if reading:
-				global messages_parsed, last_valid_raw, _last_db_insertion_time
+				global messages_parsed, last_valid_raw
 				
 				messages_parsed += 1
 				last_valid_raw = line[:500]
 				
-				# Store in memory for real-time display
-				with _data_lock:
-						weather_data.append(reading)
+				# Store in memory for real-time display (routed to the sensor's own ring)
+				weather_data.append(reading)
 				
-				# Store in database for persistence (throttled to once per 5 minutes)
+				# Push to live dashboards (never blocks; slow clients are dropped)
+				live_stream.publish(reading)
+				
+				# Queue for database persistence. In throttled mode each sensor is
+				# persisted at most once per DB_THROTTLE_SECONDS; in full mode
+				# every reading is kept. The write-behind writer thread batches
+				# the INSERTs, so this never blocks the network thread on PostgreSQL.
 				try:
 						now = datetime.utcnow()
-						if _last_db_insertion_time is None or (now - _last_db_insertion_time).total_seconds() >= 60:
-								db = get_db_manager()
+						sensor_id = reading.get('id', 'unknown')
+						last_insert = _last_db_insertion_by_sensor.get(sensor_id)
+						if (DB_STORAGE_MODE == 'full' or last_insert is None
+										or (now - last_insert).total_seconds() >= DB_THROTTLE_SECONDS):
 								# Parse timestamp - keep as-is from sensor (GMT+8 China time)
 								# Database stores GMT+8, conversion to Qatar time happens on retrieval
 								timestamp = datetime.fromisoformat(reading['time_iso'])
@@ -263,19 +308,23 @@ def _ingest_line(line: str) -> None:
 								if irradiance is None and reading.get('lux'):
 										irradiance = reading['lux'] / 127.0  # Convert lux to W/m²
 								
-								db.insert_sensor_reading(
-										temperature=reading.get('temp'),
-										humidity=reading.get('rh'),
-										lux=reading.get('lux'),
-										irradiance=irradiance,
-										timestamp=timestamp,
-										sensor_id=reading.get('id', 'unknown')
-								)
-								_last_db_insertion_time = now
-								if DEBUG:
-										print(f"✅ Saved to DB: {timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
+								queued = _db_writer.submit((
+										timestamp,
+										sensor_id,
+										reading.get('temp'),
+										reading.get('rh'),
+										reading.get('lux'),
+										irradiance,
+								))
+								if queued:
+										_last_db_insertion_by_sensor[sensor_id] = now
+										if DEBUG and DB_STORAGE_MODE != 'full':
+												print(f"✅ Queued for DB: {timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
+								elif DEBUG:
+										# Counted as "dropped" in /api/health db_writer stats
+										print("⚠️  DB write queue and spool full - reading not persisted")
 				except Exception as e:
-						print(f"⚠️  Failed to store reading in database: {e}")
+						print(f"⚠️  Failed to queue reading for database: {e}")
 		else:
 				if line.strip():  # avoid noise for empty splits
 						global invalid_messages, last_invalid_raw
@@ -287,23 +336,63 @@ def _ingest_line(line: str) -> None:
 
 @app.after_request
 def no_cache(resp):  # type: ignore
+		# Responses that chose their own caching policy (closed days) keep it
+		if "Cache-Control" in resp.headers:
+				return resp
 		resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
 		resp.headers["Pragma"] = "no-cache"
 		resp.headers["Expires"] = "0"
 		return resp
 
 
+@app.after_request
+def compress_json(resp):  # type: ignore
+		# Large JSON bodies go out gzipped to clients that accept it. Streamed
+		# responses are compressed chunk by chunk; closed days come precompressed.
+		if (resp.status_code != 200 or resp.mimetype != "application/json" or resp.direct_passthrough
+						or "Content-Encoding" in resp.headers
+						or "gzip" not in request.headers.get("Accept-Encoding", "")):
+				return resp
+		if resp.is_streamed:
+				resp.response = gzip_chunks(resp.response, GZIP_LEVEL)
+		else:
+				body = resp.get_data()
+				if len(body) < GZIP_MIN_BYTES:
+						return resp
+				resp.set_data(gzip_bytes(body, GZIP_LEVEL))
+		resp.headers["Content-Encoding"] = "gzip"
+		resp.vary.add("Accept-Encoding")
+		return resp
+
+
 # --- Background TCP server bootstrap (works under Gunicorn) -----------------
 # When running under Gunicorn, the __main__ block is not executed. To ensure the
 # TCP server is started in production, we start it at module import time in a
 # thread-safe, idempotent way. IMPORTANT: Run Gunicorn with a single worker
-# (e.g. -w 1 --threads 8). Multiple workers would create separate processes with
+# (e.g. -w 1 --threads 48). Multiple workers would create separate processes with
 # separate memory and cause either port conflicts or split state.
 
 _tcp_started = False
 _tcp_start_lock = threading.Lock()
 _tcp_last_activity = datetime.utcnow()  # Track last TCP activity
 _tcp_thread = None
+_ingest_server: IngestServer | None = None
+
+
+def db_maintenance() -> None:
+	"""Periodically create upcoming monthly partitions and apply the retention policy."""
+	import time
+	while True:
+		try:
+			db = get_db_manager()
+			created = db.ensure_partitions()
+			if created:
+				print(f"🗂️  Created partitions: {', '.join(created)}")
+			if DB_RETENTION_DAYS > 0:
+				db.cleanup_old_data(DB_RETENTION_DAYS)
+		except Exception as e:
+			print(f"⚠️ Database maintenance failed: {e}")
+		time.sleep(DB_MAINTENANCE_INTERVAL)
 
 
 def ensure_tcp_started() -> None:
@@ -315,12 +404,332 @@ def ensure_tcp_started() -> None:
 		if _tcp_started:
 			return
 		_tcp_last_activity = datetime.utcnow()
+		_db_writer.start()
 		_tcp_thread = threading.Thread(target=tcp_server, daemon=True, name="tcp-server")
 		_tcp_thread.start()
+		threading.Thread(target=db_maintenance, daemon=True, name="db-maintenance").start()
 		_tcp_started = True
 		print(f"🚀 TCP server thread started on port {TCP_PORT}")
 
 
+MAX_CHART_POINTS = 10000  # Upper bound on /api/data?points=
+
+
+def _prime(rows: Iterator[Any]) -> Iterator[Any]:
+	"""Start a lazy DB iterator now, so connection/query errors surface before the response starts."""
+	rows = iter(rows)
+	try:
+		first = next(rows)
+	except StopIteration:
+		return iter(())
+	return chain([first], rows)
+
+
+def _readings_response(columns: ReadingColumns, meta: Dict[str, Any], fmt: str = ROWS, time_suffix: str = '') -> Response:
+	"""Answer with readings in the requested format; every /api/data branch ends here or in _stream_readings_json."""
+	return Response(encode_readings(columns, meta, fmt, time_suffix), mimetype='application/json')
+
+
+def _with_cursor(meta: Dict[str, Any], columns: ReadingColumns) -> Dict[str, Any]:
+	"""meta plus the cursor after the newest of these readings (for /api/data?since=)"""
+	cursor = ReadingCursor.after(columns.time_ms)
+	return {**meta, 'cursor': cursor.encode()} if cursor else meta
+
+
+def _db_batches(start_dt: datetime, end_dt: datetime, sensor: str | None) -> Iterator[ReadingColumns]:
+	"""Raw readings of a range as column batches, decoded from a chunked binary COPY."""
+	return (ReadingColumns.from_db(arrays) for arrays in get_db_manager().iter_readings_arrays(start_dt, end_dt, sensor_id=sensor))
+
+
+def _stream_readings_json(batches: Iterator[ReadingColumns], meta: Dict[str, Any]) -> Response:
+	"""Stream {"readings": [...], "count": n, **meta} batch by batch, without building the list in memory.
+
+	The response's `complete` attribute turns True once the whole document has
+	been generated without error; a failure after the headers is only visible there.
+	"""
+	batches = _prime(batches)
+	
+	def generate():
+		count = 0
+		error = None
+		cursor = None
+		yield '{"readings":['
+		try:
+			for batch in batches:
+				if not len(batch):
+					continue
+				yield (',' if count else '') + rows_fragment(batch)
+				count += len(batch)
+				cursor = ReadingCursor.after(batch.time_ms) if cursor is None else cursor.advance(batch.time_ms)
+		except Exception as e:
+			# Headers are already sent, so report the failure inside the document
+			print(f"⚠️ Streaming readings failed after {count} rows: {e}")
+			error = str(e)
+		tail = {'count': count, **meta}
+		if cursor:
+			tail['cursor'] = cursor.encode()
+		if error:
+			tail['error'] = error
+		response.complete = error is None
+		yield '],' + json.dumps(tail)[1:]
+	
+	response = Response(stream_with_context(generate()), mimetype='application/json')
+	response.complete = False
+	return response
+
+
+def _db_range_response(
+	start_dt: datetime,
+	end_dt: datetime,
+	sensor: str | None,
+	meta: Dict[str, Any],
+	fmt: str = ROWS,
+	limit: int | None = None
+) -> Response:
+	"""Answer a raw database range: streamed rows, parallel arrays (columnar) or the newest `limit` rows."""
+	if limit:
+		# Keep only the newest `limit` rows while the batches stream past
+		columns = ReadingColumns.concat([])
+		for batch in _db_batches(start_dt, end_dt, sensor):
+			columns = ReadingColumns.concat([columns, batch]).slice(-limit)
+		return _readings_response(columns, _with_cursor(meta, columns), fmt)
+	if fmt == COLUMNAR:
+		# Parallel arrays need every row before the first byte: one binary COPY
+		columns = ReadingColumns.from_db(get_db_manager().get_readings_arrays(start_dt, end_dt, sensor_id=sensor))
+		return _readings_response(columns, _with_cursor(meta, columns), fmt)
+	# Constant memory however long the range is. Database times are sent as-is (GMT+8)
+	return _stream_readings_json(_db_batches(start_dt, end_dt, sensor), meta)
+
+
+def _downsampled_db_response(
+	start_dt: datetime,
+	end_dt: datetime,
+	sensor: str | None,
+	points: int,
+	method: str,
+	meta: Dict[str, Any],
+	fmt: str = ROWS
+) -> Response:
+	"""Answer a database range with about `points` rows per metric, bucketed in SQL."""
+	db = get_db_manager()
+	buckets = points * LTTB_OVERSAMPLING if method == 'lttb' else max(1, points // 2)
+	buckets_rows = db.get_bucketed_readings(start_dt, end_dt, buckets, sensor)
+	source_rows = sum(r['sample_count'] for r in buckets_rows)
+	if source_rows <= points:
+		# Small enough to send as-is
+		return _db_range_response(start_dt, end_dt, sensor, meta, fmt)
+	
+	columns = ReadingColumns.from_datetimes(downsample(expand_buckets(buckets_rows), points, method))
+	# Rows per timestamp are unknown here: resume at the newest one, repeating its rows
+	newest = max(r['last_time'] for r in buckets_rows)
+	return _readings_response(columns, {
+		**meta,
+		'cursor': ReadingCursor(row_epoch_ms(newest)).encode(),
+		'downsampled': {'method': method, 'points': points, 'source_rows': source_rows}
+	}, fmt)
+
+
+def _downsample_memory(cols: Dict[str, Any], points: int | None, method: str) -> tuple:
+	"""Downsample ring-buffer columns when `points` is set. Returns (cols, downsampled meta or None)."""
+	if not points or len(cols['ts']) <= points:
+		return cols, None
+	source_rows = len(cols['ts'])
+	return downsample(cols, points, method), {'method': method, 'points': points, 'source_rows': source_rows}
+
+
+def _memory_response(
+	cols: Dict[str, Any],
+	points: int | None,
+	method: str,
+	meta: Dict[str, Any],
+	time_suffix: str = '',
+	fmt: str = ROWS
+) -> Response:
+	"""Answer from ring-buffer columns, downsampled when `points` is set."""
+	extra = _with_cursor({**meta, 'source': 'memory'}, ReadingColumns.from_memory(cols))
+	cols, downsampled = _downsample_memory(cols, points, method)
+	if downsampled:
+		extra['downsampled'] = downsampled
+	return _readings_response(ReadingColumns.from_memory(cols), extra, fmt, time_suffix)
+
+
+def _rollup_response(
+	plan: QueryPlan,
+	start_dt: datetime,
+	end_dt: datetime,
+	sensor: str | None,
+	points: int | None,
+	method: str,
+	meta: Dict[str, Any],
+	fmt: str = ROWS
+) -> Response | None:
+	"""Answer from a rollup table: each bucket's minima and maxima, downsampled if needed. None if empty."""
+	rows = get_db_manager().get_rollups(plan.resolution, start_dt, end_dt, sensor)
+	if not rows:
+		return None
+	width = ROLLUPS[plan.resolution][2]
+	buckets = [{
+		**row,
+		'first_time': row['bucket'],
+		'last_time': row['bucket'] + width - timedelta(seconds=1),
+	} for row in rows]
+	cols = expand_buckets(buckets)
+	source_rows = sum(int(r['sample_count']) for r in rows)
+	if points:
+		cols = downsample(cols, points, method)
+	return _readings_response(ReadingColumns.from_datetimes(cols), {
+		**meta,
+		'downsampled': {'method': method, 'points': points, 'source_rows': source_rows},
+	}, fmt)
+
+
+def _day_is_closed(day: datetime) -> bool:
+	"""True once a day (GMT+8) is over by more than DAY_CACHE_GRACE_MINUTES."""
+	now = datetime.utcnow() + timedelta(hours=8)  # Database time is GMT+8
+	return day + timedelta(days=1, minutes=DAY_CACHE_GRACE_MINUTES) <= now
+
+
+def _cached_day_response(key: tuple, build) -> Response:
+	"""Serve a closed day's payload from the day cache, building and storing it on a miss."""
+	entry = day_cache.get(key)
+	if entry is None:
+		# Read before building: rows committed meanwhile make this body stale
+		generation = day_cache.generation(key[0])
+		response = build()
+		if isinstance(response, tuple) or response.status_code != 200:
+			return response
+		body = response.get_data()
+		if not getattr(response, 'complete', True):
+			# A streamed response failed part-way; do not keep it
+			return response
+		entry = day_cache.put(key, body, generation)
+	
+	if 'gzip' in request.headers.get('Accept-Encoding', ''):
+		response = Response(entry.gzip_body, mimetype='application/json')
+		response.headers['Content-Encoding'] = 'gzip'
+		response.set_etag(entry.etag + '-gz')
+	else:
+		response = Response(entry.body(), mimetype='application/json')
+		response.set_etag(entry.etag)
+	response.headers['Vary'] = 'Accept-Encoding'
+	# Late rows (spool replay, backfills) can still change a closed day, so
+	# clients revalidate by ETag instead of trusting their copy for long
+	if DAY_CACHE_MAX_AGE > 0:
+		response.headers['Cache-Control'] = f"public, max-age={DAY_CACHE_MAX_AGE}"
+	else:
+		response.headers['Cache-Control'] = 'public, no-cache'
+	return response.make_conditional(request)
+
+
+def _range_response(
+	start_dt: datetime,
+	end_dt: datetime,
+	sensor: str | None,
+	points: int | None,
+	method: str,
+	resolution: str | None,
+	limit: int,
+	window_minutes: int | None,
+	meta: Dict[str, Any],
+	fmt: str = ROWS
+):
+	"""Plan a time-range query with the query router and run it."""
+	plan = query_router.plan(start_dt, end_dt, sensor, points, resolution)
+	meta['query'] = plan.to_dict()
+	
+	if plan.tier == TIER_MEMORY:
+		cols = weather_data.window(wall_clock_epoch(start_dt), wall_clock_epoch(end_dt), sensor=sensor)
+		if window_minutes and not points:
+			cols = {name: col[-limit:] for name, col in cols.items()}
+		return _memory_response(cols, points, method, meta, fmt=fmt)
+	
+	try:
+		if plan.tier == TIER_ROLLUP:
+			response = _rollup_response(plan, start_dt, end_dt, sensor, points, method, meta, fmt)
+			if response is not None:
+				return response
+			# Rollups not built for this range yet
+			plan = QueryPlan(TIER_RAW, "rollup empty")
+			query_router.record(plan)
+			meta['query'] = plan.to_dict()
+		
+		if points:
+			return _downsampled_db_response(start_dt, end_dt, sensor, points, method, meta, fmt)
+		
+		# Window mode keeps only the newest `limit` rows
+		return _db_range_response(start_dt, end_dt, sensor, meta, fmt, limit if window_minutes else None)
+	except Exception as e:
+		if not window_minutes:
+			return jsonify({'error': str(e)}), 500
+		print(f"⚠️ Database query failed: {e}")
+		# Fall back to memory: binary-search the window, then apply limit
+		cols = weather_data.last_minutes(window_minutes, sensor=sensor)
+		if not points:
+			cols = {name: col[-limit:] for name, col in cols.items()}
+		return _memory_response(cols, points, method, {'query': meta['query']}, fmt=fmt)
+
+
+def _delta_response(cursor: ReadingCursor, sensor: str | None, limit: int, fmt: str = ROWS):
+	"""Answer /api/data?since=: up to `limit` readings after the cursor, oldest first, and the next cursor."""
+	# Only memory or raw rows can say exactly which readings follow the cursor
+	plan = query_router.plan(cursor.start, datetime.utcnow() + timedelta(hours=8), sensor)
+	
+	columns = None
+	if plan.tier != TIER_MEMORY:
+		# Index range scan; fetch the rows to skip and one extra to detect 'more'
+		try:
+			columns = ReadingColumns.from_db(get_db_manager().get_readings_since(cursor.start, cursor.seq + limit + 1, sensor))
+			source = 'database'
+		except Exception as e:
+			# Same fallback as live windows: memory still holds the newest readings
+			print(f"⚠️ Database query failed: {e}")
+	
+	if columns is None:
+		# Binary search for timestamp >= cursor in the ring buffers
+		columns = ReadingColumns.from_memory(weather_data.window(cursor.start_epoch, sensor=sensor)).sorted()
+		source = 'memory'
+	
+	skip = cursor.skip(columns.time_ms)
+	more = len(columns) > skip + limit
+	columns = columns.slice(skip, skip + limit)
+	return _readings_response(columns, {
+		'since': cursor.encode(),
+		'cursor': cursor.advance(columns.time_ms).encode(),
+		'more': more,
+		'source': source,
+		'query': plan.to_dict(),
+	}, fmt)
+
+
+def _page_response(
+	start_dt: datetime,
+	end_dt: datetime,
+	sensor: str | None,
+	page_size: int,
+	after: PageKey | None,
+	meta: Dict[str, Any],
+	fmt: str = ROWS
+) -> Response:
+	"""Answer /api/data?page_size=/after=: one keyset page of raw database rows and the key of the next one."""
+	plan = QueryPlan(TIER_RAW, "keyset page")
+	query_router.record(plan)
+	# One extra row tells whether another page follows
+	arrays = get_db_manager().get_readings_page(
+		start_dt, end_dt, page_size + 1, after.to_db() if after else None, sensor_id=sensor
+	)
+	more = len(arrays['id']) > page_size
+	if more:
+		arrays = {name: col[:page_size] for name, col in arrays.items()}
+	next_key = PageKey.last(arrays) if more else None
+	return _readings_response(ReadingColumns.from_db(arrays), {
+		**meta,
+		'after': after.encode() if after else None,
+		'next': next_key.encode() if next_key else None,
+		'page_size': page_size,
+		'query': plan.to_dict(),
+	}, fmt)
+
+
 @app.route("/api/data")
 def api_data():
 	"""Return sensor readings as JSON.
@@ -331,178 +740,138 @@ def api_data():
 		start_date: Start date in YYYY-MM-DD format (requires end_date)
 		end_date: End date in YYYY-MM-DD format (requires start_date)
 		limit: Max number of readings (default 1000)
+		sensor: Only return readings from this sensor_id (all sensors if omitted)
+		points: Downsample to about this many points per metric (e.g. the chart
+			width in pixels); the response then includes a 'downsampled' object
+		downsample: 'lttb' (default, shape-preserving) or 'minmax' (per-bucket extremes)
+		resolution: Read this rollup ('1m', '30m', '1h', '1d') instead of raw rows
+		since: Cursor from an earlier response; returns only the readings after
+			it (oldest first, at most `limit`), the next 'cursor' and 'more' if
+			readings were left out. Range, points and resolution are ignored
+		format: 'rows' (default, a list of reading objects) or 'columnar'
+			(parallel arrays: 't0' epoch ms, 'dt' ms deltas, one array per
+			metric rounded to 'precision' decimals)
+		page_size: Page through the range's raw database rows, this many
+			(at most MAX_PAGE_SIZE) per response; 'next' is the key of the
+			following page, null on the last one. Needs a range; points and
+			resolution are ignored
+		after: 'next' of the previous page (page_size defaults to `limit`)
+
+	Time-range responses include a 'cursor' after their newest reading
+	(not rollup answers), so a client can poll for deltas with `since`.
+	The query router picks the cheapest tier that can answer the range (ring
+	buffers, a rollup table or raw rows); its choice is returned as 'query'.
+	Closed days (`date=`) are served from the day cache with a strong ETag
+	and revalidated by clients (`Cache-Control: no-cache`). Responses of GZIP_MIN_BYTES or more are
+	gzipped for clients that send `Accept-Encoding: gzip`.
 	"""
 	ensure_tcp_started()
 	
-	# Check for date range parameters
-	start_date_param = request.args.get('start_date')
-	end_date_param = request.args.get('end_date')
+	sensor = request.args.get('sensor') or None
+	
+	points = request.args.get('points', type=int)
+	if points:
+		points = max(10, min(points, MAX_CHART_POINTS))
+	method = request.args.get('downsample', DEFAULT_METHOD)
+	if method not in METHODS:
+		return jsonify({'error': f"downsample must be one of {list(METHODS)}"}), 400
+	resolution = request.args.get('resolution') or None
+	if resolution and resolution not in ROLLUPS:
+		return jsonify({'error': f"resolution must be one of {list(ROLLUPS)}"}), 400
+	
+	limit = request.args.get('limit', default=1000, type=int)
+	limit = max(1, min(limit, 10000))
+	fmt = request.args.get('format', ROWS)
+	if fmt not in FORMATS:
+		return jsonify({'error': f"format must be one of {list(FORMATS)}"}), 400
 	
-	if start_date_param and end_date_param:
-		# Return date range from database
+	page_size = request.args.get('page_size', type=int)
+	after = request.args.get('after')
+	paged = bool(page_size or after)
+	if paged:
+		page_size = max(1, min(page_size or limit, MAX_PAGE_SIZE))
 		try:
-			db = get_db_manager()
-			start_dt = datetime.strptime(start_date_param, '%Y-%m-%d')
-			end_dt = datetime.strptime(end_date_param, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
-			
-			readings = db.get_readings_by_time_range(start_dt, end_dt)
-			
-			# Format readings
-			formatted = []
-			for r in readings:
-				# Return database timestamp as-is (GMT+8)
-				ts = r.get('timestamp')
-				if isinstance(ts, datetime):
-					time_str = ts.isoformat()
-				else:
-					time_str = str(ts)
-
-				formatted.append({
-					'time': time_str,
-					'temp': float(r.get('temperature')) if r.get('temperature') is not None else None,
-					'rh': float(r.get('humidity')) if r.get('humidity') is not None else None,
-					'lux': float(r.get('lux')) if r.get('lux') is not None else None,
-					'irradiance': float(r.get('irradiance')) if r.get('irradiance') is not None else None,
-				})
-			
-			return jsonify({
-				'readings': formatted,
-				'count': len(formatted),
-				'source': 'database',
-				'start_date': start_date_param,
-				'end_date': end_date_param
-			})
-		except Exception as e:
-			return jsonify({'error': str(e)}), 500
+			after = PageKey.decode(after) if after else None
+		except ValueError as e:
+			return jsonify({'error': str(e)}), 400
 	
-	# Check for single date parameter
-	date_param = request.args.get('date')
-	if date_param:
-		# Return full day from database
+	since = request.args.get('since')
+	if since:
 		try:
-			db = get_db_manager()
-			readings = db.get_readings_by_date(date_param)
-			# Normalize/format to match other endpoints
-			formatted = []
-			for r in readings:
-				# Support either DB-shaped or API-shaped rows
-				# Database stores GMT+8 (China time), convert to Qatar GMT+3
-				ts = r.get('timestamp', r.get('time'))
-				if isinstance(ts, datetime):
-					ts_qatar = ts - timedelta(hours=5)
-					time_str = ts_qatar.isoformat()
-				else:
-					time_str = str(ts)
-
-				# Choose value keys depending on shape
-				temp_val = r.get('temperature', r.get('temp'))
-				rh_val = r.get('humidity', r.get('rh'))
-				lux_val = r.get('lux')
-				irr_val = r.get('irradiance')
-
-				formatted.append({
-					'time': time_str,
-					'temp': float(temp_val) if temp_val is not None else None,
-					'rh': float(rh_val) if rh_val is not None else None,
-					'lux': float(lux_val) if lux_val is not None else None,
-					'irradiance': float(irr_val) if irr_val is not None else None,
-				})
-
-			return jsonify({
-				'readings': formatted,
-				'count': len(formatted),
-				'source': 'database',
-				'date': date_param
-			})
-		except Exception as e:
-			return jsonify({'error': str(e)}), 500
+			cursor = ReadingCursor.decode(since)
+		except ValueError as e:
+			return jsonify({'error': str(e)}), 400
+		return _delta_response(cursor, sensor, limit, fmt)
 	
-	# Check for time window parameter
+	# Resolve the requested time range (database time is GMT+8)
+	start_date_param = request.args.get('start_date')
+	end_date_param = request.args.get('end_date')
+	date_param = request.args.get('date')
 	window_minutes = request.args.get('window', type=int)
-	limit = request.args.get('limit', default=1000, type=int)
-	limit = max(1, min(limit, 10000))
+	try:
+		if start_date_param and end_date_param:
+			start_dt = datetime.strptime(start_date_param, '%Y-%m-%d')
+			end_dt = datetime.strptime(end_date_param, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
+			meta = {'source': 'database', 'start_date': start_date_param, 'end_date': end_date_param}
+		elif date_param:
+			start_dt = datetime.strptime(date_param, '%Y-%m-%d')
+			end_dt = start_dt.replace(hour=23, minute=59, second=59, microsecond=999999)
+			meta = {'source': 'database', 'date': date_param}
+		elif window_minutes:
+			end_dt = datetime.utcnow() + timedelta(hours=8)
+			start_dt = end_dt - timedelta(minutes=window_minutes)
+			meta = {'source': 'database', 'window_minutes': window_minutes}
+		elif paged:
+			return jsonify({'error': 'page_size and after need date, start_date/end_date or window'}), 400
+		else:
+			# Default: the newest rows of the in-memory buffer
+			# Sensor wall-clock times are emitted with a 'Z' suffix, as before
+			plan = QueryPlan(TIER_MEMORY, "latest readings")
+			query_router.record(plan)
+			return _memory_response(
+				weather_data.tail(limit, sensor=sensor), points, method, {'query': plan.to_dict()}, time_suffix='Z', fmt=fmt
+			)
+	except ValueError as e:
+		return jsonify({'error': str(e)}), 400
 	
-	if window_minutes:
-		# Query from database for specific time window
+	if paged:
+		# Keyset pages: an index range scan per page, never more than page_size rows held
 		try:
-			db = get_db_manager()
-			readings = db.get_readings_by_window(window_minutes)
-			
-			# Format readings
-			formatted = []
-			for r in readings:
-				# Return database timestamp as-is (GMT+8)
-				ts = r.get('timestamp')
-				if isinstance(ts, datetime):
-					time_str = ts.isoformat()
-				else:
-					time_str = str(ts)
-
-				formatted.append({
-					'time': time_str,
-					'temp': float(r.get('temperature')) if r.get('temperature') is not None else None,
-					'rh': float(r.get('humidity')) if r.get('humidity') is not None else None,
-					'lux': float(r.get('lux')) if r.get('lux') is not None else None,
-					'irradiance': float(r.get('irradiance')) if r.get('irradiance') is not None else None,
-				})
-			
-			# Apply limit
-			if len(formatted) > limit:
-				formatted = formatted[-limit:]
-			
-			return jsonify({
-				'readings': formatted,
-				'count': len(formatted),
-				'source': 'database',
-				'window_minutes': window_minutes
-			})
+			return _page_response(start_dt, end_dt, sensor, page_size, after, meta, fmt)
 		except Exception as e:
-			print(f"⚠️ Database query failed: {e}")
-			# Fall back to memory
-			with _data_lock:
-				data = list(weather_data)[-limit:]
-			formatted = [{
-				'time': r.get('time_iso', r.get('time')),
-				'temp': r.get('temp'),
-				'rh': r.get('rh'),
-				'lux': r.get('lux'),
-				'irradiance': r.get('irradiance', r.get('lux', 0) / 127.0 if r.get('lux') else 0)
-			} for r in data]
-			return jsonify({
-				'readings': formatted,
-				'count': len(formatted),
-				'source': 'memory'
-			})
-	
-	# Default: return in-memory buffer
-	with _data_lock:
-		data = list(weather_data)[-limit:]
-	
-	formatted = []
-	for r in data:
-		# Emit UTC ISO string if possible
-		ts_str = r.get('time_iso', r.get('time'))
-		# If the sensor time is naive ISO without tz, append Z to indicate UTC
-		if isinstance(ts_str, str) and 'Z' not in ts_str and '+' not in ts_str:
-			try:
-				# Validate parse; if parseable, mark as UTC
-				datetime.fromisoformat(ts_str)
-				ts_str = ts_str + 'Z'
-			except Exception:
-				pass
-		formatted.append({
-			'time': ts_str,
-			'temp': r.get('temp'),
-			'rh': r.get('rh'),
-			'lux': r.get('lux'),
-			'irradiance': r.get('irradiance', (r.get('lux') / 127.0) if (r.get('lux') is not None) else 0)
-		})
+			return jsonify({'error': str(e)}), 500
 	
-	return jsonify({
-		'readings': formatted,
-		'count': len(formatted),
-		'source': 'memory'
-	})
+	if date_param and not (start_date_param and end_date_param) and _day_is_closed(start_dt):
+		# Past days do not change: serve them from the day cache with a strong ETag
+		return _cached_day_response(
+			(date_param, sensor, points, method, resolution, fmt),
+			lambda: _range_response(start_dt, end_dt, sensor, points, method, resolution, limit, window_minutes, meta, fmt)
+		)
+	return _range_response(start_dt, end_dt, sensor, points, method, resolution, limit, window_minutes, meta, fmt)
+
+
+@app.route("/api/stream")
+def api_stream():
+	"""Server-Sent Events stream of live readings.
+
+	Query params:
+		sensor: Only stream readings from this sensor_id (all sensors if omitted)
+
+	Each reading arrives as an `event: reading` whose data is one /api/data
+	row plus the sensor `id`. Idle streams get a keepalive comment every
+	LIVE_STREAM_HEARTBEAT_SECONDS. A client that falls LIVE_STREAM_QUEUE
+	readings behind is disconnected; EventSource then reconnects and the
+	dashboard reloads its window. Returns 503 once LIVE_STREAM_MAX_CLIENTS
+	streams are open, so the dashboard falls back to polling.
+	"""
+	ensure_tcp_started()
+	subscriber = live_stream.subscribe(request.args.get('sensor') or None)
+	if subscriber is None:
+		return jsonify({'error': 'too many live streams, poll /api/data instead'}), 503
+	response = Response(stream_with_context(live_stream.events(subscriber)), mimetype='text/event-stream')
+	response.headers['Cache-Control'] = 'no-cache'
+	response.headers['X-Accel-Buffering'] = 'no'  # Tell nginx not to buffer the stream
+	return response
 
 
 @app.route("/api/dates")
@@ -516,13 +885,12 @@ def api_dates():
 		}
 	"""
 	try:
-		db = get_db_manager()
-		date_range = db.get_date_range()
-		stats = db.get_statistics()
+		stats = db_stats_snapshot.get()
 		
 		return jsonify({
-			'date_range': date_range,
-			'total_readings': stats.get('total_readings', 0)
+			'date_range': stats['date_range'],
+			'total_readings': stats['total_readings'],
+			'stats_age_seconds': stats['age_seconds']
 		})
 	except Exception as e:
 		return jsonify({'error': str(e)}), 500
@@ -536,83 +904,70 @@ def export_csv():
 		start_date: Start date (YYYY-MM-DD) - optional
 		end_date: End date (YYYY-MM-DD) - optional
 		all: Set to 'true' to export all data - optional
+		sensor: Only export readings from this sensor_id - optional
+		gzip: Set to 'true' to download a gzip-compressed .csv.gz - optional
 		
-	If no params provided, exports last 24 hours
+	If no params provided, exports last 24 hours.
+	The CSV is produced by PostgreSQL (COPY ... TO STDOUT, Qatar time and
+	rounding done in SQL) and streamed in chunks, so memory use stays
+	bounded however large the export is.
 	"""
 	try:
 		db = get_db_manager()
 		export_all = request.args.get('all', '').lower() == 'true'
 		start_date = request.args.get('start_date')
 		end_date = request.args.get('end_date')
+		sensor = request.args.get('sensor') or None
+		use_gzip = request.args.get('gzip', '').lower() == 'true'
 		
 		# Determine what data to export
 		if export_all:
 			# Export all data
-			conn = db.get_connection()
-			cursor = conn.cursor()
-			cursor.execute("""
-				SELECT timestamp, temperature, humidity, lux, irradiance
-				FROM sensor_readings
-				ORDER BY timestamp ASC;
-			""")
-			rows = cursor.fetchall()
-			cursor.close()
-			db.return_connection(conn)
+			start_dt, end_dt = None, None
 			filename = "sensor_data_all.csv"
 			
 		elif start_date and end_date:
 			# Export date range
 			start_dt = datetime.strptime(start_date, '%Y-%m-%d')
 			end_dt = datetime.strptime(end_date, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
-			
-			readings = db.get_readings_by_time_range(start_dt, end_dt)
-			rows = [(r['timestamp'], r.get('temperature'), r.get('humidity'), 
-					 r.get('lux'), r.get('irradiance')) for r in readings]
 			filename = f"sensor_data_{start_date}_to_{end_date}.csv"
 			
 		elif start_date:
 			# Export single date
-			readings = db.get_readings_by_date(start_date)
-			rows = [(datetime.fromisoformat(r['time']), r.get('temp'), r.get('rh'),
-					 r.get('lux'), r.get('irradiance')) for r in readings]
+			start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+			end_dt = start_dt.replace(hour=23, minute=59, second=59, microsecond=999999)
 			filename = f"sensor_data_{start_date}.csv"
 			
 		else:
-			# Default: last 24 hours
-			readings = db.get_readings_by_window(1440)  # 24 hours
-			rows = [(r['timestamp'], r.get('temperature'), r.get('humidity'),
-					 r.get('lux'), r.get('irradiance')) for r in readings]
+			# Default: last 24 hours (database time is GMT+8)
+			end_dt = datetime.utcnow() + timedelta(hours=8)
+			start_dt = end_dt - timedelta(hours=24)
 			filename = "sensor_data_last_24h.csv"
 		
-		# Create CSV in memory
-		output = StringIO()
-		writer = csv.writer(output)
-		
-		# Write header
-		writer.writerow(['Timestamp', 'Temperature (°C)', 'Humidity (%)', 'Lux', 'Irradiance (W/m²)'])
+		# Database stores GMT+8 (China time); the CSV is in Qatar time (GMT+3)
+		chunks = _prime(db.iter_readings_csv(start_dt, end_dt, sensor, shift_hours=-5))
 		
-		# Write data rows
-		for row in rows:
-			timestamp, temp, humidity, lux, irradiance = row
-			# Format timestamp and convert to Qatar time
-			if isinstance(timestamp, datetime):
-				# Convert China (GMT+8) to Qatar (GMT+3)
-				ts_qatar = timestamp - timedelta(hours=5)
-				ts_str = ts_qatar.strftime('%Y-%m-%d %H:%M:%S')
-			else:
-				ts_str = str(timestamp)
-			
-			writer.writerow([
-				ts_str,
-				f"{temp:.2f}" if temp is not None else '',
-				f"{humidity:.2f}" if humidity is not None else '',
-				f"{lux:.2f}" if lux is not None else '',
-				f"{irradiance:.3f}" if irradiance is not None else ''
-			])
+		def generate():
+			compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if use_gzip else None  # wbits 31 = gzip container
+			try:
+				for chunk in chunks:
+					if compressor:
+						chunk = compressor.compress(chunk)
+						if not chunk:
+							continue
+					yield chunk
+			except Exception as e:
+				# Headers are already sent; the file simply ends early
+				print(f"⚠️ CSV export stream failed: {e}")
+			if compressor:
+				yield compressor.flush()
 		
 		# Create response
-		output.seek(0)
-		response = Response(output.getvalue(), mimetype='text/csv')
+		if use_gzip:
+			response = Response(stream_with_context(generate()), mimetype='application/gzip')
+			filename += '.gz'
+		else:
+			response = Response(stream_with_context(generate()), mimetype='text/csv')
 		response.headers['Content-Disposition'] = f'attachment; filename={filename}'
 		
 		return response
@@ -663,10 +1018,11 @@ def api_kpi():  # type: ignore
 		
 		This endpoint uses the DataProvider and KPICalculator to compute
 		all available KPIs from configured data sources.
+		Pass ?sensor=<sensor_id> to compute sensor-based KPIs from one sensor.
 		"""
 		try:
 				# Create data provider with access to sensor data
-				data_provider = create_data_provider(weather_data)
+				data_provider = create_data_provider(weather_data, request.args.get('sensor') or None)
 				
 				# Create KPI calculator
 				calculator = create_kpi_calculator(data_provider)
@@ -697,9 +1053,11 @@ def api_kpi_single(kpi_name: str):  # type: ignore
 		- daily_carbon_offset
 		- temperature
 		- humidity
+		
+		Pass ?sensor=<sensor_id> to use one sensor's readings.
 		"""
 		try:
-				data_provider = create_data_provider(weather_data)
+				data_provider = create_data_provider(weather_data, request.args.get('sensor') or None)
 				calculator = create_kpi_calculator(data_provider)
 				
 				# Map KPI names to calculator methods
@@ -758,19 +1116,21 @@ def api_health():  # type: ignore
 		# Get database statistics
 		db_stats = {"total_readings": 0, "date_range": None}
 		db_connected = False
+		sensor_dictionary = None
 		try:
-				db = get_db_manager()
-				db_connected = db is not None
-				if db_connected:
-						db_stats = db.get_statistics()
-						date_range = db.get_date_range()
-						db_stats['date_range'] = date_range
+				db_stats = db_stats_snapshot.get()
+				db_connected = db_stats_snapshot.last_error is None
+				# Only an already connected manager: health polls must not retry the database
+				db = current_db_manager()
+				sensor_dictionary = db.sensors.stats() if db is not None else None
 		except Exception as e:
 				print(f"⚠️ Error getting DB stats: {e}")
 		
 		# Get memory count
-		with _data_lock:
-				memory_count = len(weather_data)
+		memory_count = len(weather_data)
+		
+		# Gateway connection counters from the ingest server
+		conn_stats = _ingest_server.stats() if _ingest_server else {}
 		
 		health = {
 				"status": "ok",
@@ -782,18 +1142,39 @@ def api_health():  # type: ignore
 						"heartbeat_age": seconds_since_last_data if seconds_since_last_data else 0,
 						"last_connection_time": _tcp_last_activity.isoformat() if _tcp_last_activity else None,
 						"seconds_since_last_data": seconds_since_last_data,
-						"connections_received": 1 if messages_parsed > 0 else 0,  # Simplified tracking
+						"connections_received": conn_stats.get("total_accepted", 0),
+						"active_connections": conn_stats.get("active_connections", 0),
+						"peak_connections": conn_stats.get("peak_connections", 0),
+						"idle_timeouts": conn_stats.get("idle_timeouts", 0),
+						"refused_connections": conn_stats.get("refused", 0),
+						"idle_timeout_seconds": TCP_IDLE_TIMEOUT,
+						"gateways": conn_stats.get("gateways", []),
 						"messages_parsed": messages_parsed,
 						"invalid_messages": invalid_messages,
 				},
 				"memory": {
 						"count": memory_count,
 						"max_size": MAX_SAMPLES,
+						"bytes": weather_data.nbytes,
+						"total_appended": weather_data.total_appended,
+						**weather_data.stats(),
 				},
+				"db_writer": {
+						**_db_writer.stats(),
+						"storage_mode": DB_STORAGE_MODE,
+						"throttle_seconds": DB_THROTTLE_SECONDS if DB_STORAGE_MODE != 'full' else None,
+						"sensors_tracked": len(_last_db_insertion_by_sensor),
+				},
+				"query_router": query_router.stats(),
+				"live_stream": live_stream.stats(),
+				"day_cache": day_cache.stats(),
 				"database": {
 						"connected": db_connected,
 						"total_readings": db_stats.get('total_readings', 0),
 						"date_range": db_stats.get('date_range'),
+						"stats_refreshed_at": db_stats.get('refreshed_at'),
+						"stats_age_seconds": db_stats.get('age_seconds'),
+						"sensor_dictionary": sensor_dictionary,
 				},
 				"timestamp": now.isoformat(),
 		}
@@ -808,17 +1189,31 @@ def api_health():  # type: ignore
 				health["status"] = "error"
 				health["errors"] = ["TCP server thread is not running"]
 		
+		# Readings waiting on disk for the database to come back
+		spool_stats = health["db_writer"].get("spool") or {}
+		if spool_stats.get("pending_bytes"):
+				if health["status"] == "ok":
+						health["status"] = "warning"
+				health.setdefault("warnings", []).append(
+						f"{spool_stats['pending_bytes']} bytes of readings spooled, awaiting database replay"
+				)
+		
+		# Readings are only persisted while the writer thread is alive
+		if _tcp_started and not _db_writer.running:
+				health["status"] = "error"
+				health.setdefault("errors", []).append("Database writer thread is not running")
+		
 		status_code = 200 if health["status"] == "ok" else 503
 		return make_response(jsonify(health), status_code)
 
 
 @app.route("/api/parameters")
 def api_parameters():  # type: ignore
-		"""Return all configured parameters and their current values."""
+		"""Return all configured parameters and their current values (optionally ?sensor=<sensor_id>)."""
 		try:
 				from config import ALL_PARAMETERS
 				
-				data_provider = create_data_provider(weather_data)
+				data_provider = create_data_provider(weather_data, request.args.get('sensor') or None)
 				
 				parameters = {}
 				for name, param in ALL_PARAMETERS.items():
@@ -852,14 +1247,13 @@ def api_parameters():  # type: ignore
 @app.route("/api/status")
 def status():  # type: ignore
 		"""Return system status including database statistics."""
-		with _data_lock:
-				count = len(weather_data)
-				latest = weather_data[-1] if count else None
+		count = len(weather_data)
+		latest = weather_data.latest()
+		latest_by_sensor = weather_data.latest_per_sensor()
 		
 		# Get database statistics
 		try:
-				db = get_db_manager()
-				db_stats = db.get_statistics()
+				db_stats = db_stats_snapshot.get()
 		except Exception as e:
 				db_stats = {"error": str(e)}
 		
@@ -867,6 +1261,7 @@ def status():  # type: ignore
 				{
 						"samples_in_memory": count,
 						"latest": latest,
+						"latest_by_sensor": latest_by_sensor,
 						"database_stats": db_stats,
 						"tcp_port": TCP_PORT,
 						"http_port": HTTP_PORT,
@@ -1025,6 +1420,41 @@ def api_analyzer_upload():
 				return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route("/api/analyzer/load-database", methods=["POST"])
+def api_analyzer_load_database():
+		"""Load lux data for analysis from the database instead of an uploaded CSV"""
+		from solar_cleaning_analyzer import load_lux_from_database
+		
+		try:
+				data = request.get_json() or {}
+				start_date = data.get('start_date')
+				end_date = data.get('end_date')
+				if not start_date or not end_date:
+						return jsonify({"success": False, "error": "start_date and end_date (YYYY-MM-DD) are required"}), 400
+				
+				start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+				end_dt = datetime.strptime(end_date, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
+				df = load_lux_from_database(start_dt, end_dt, data.get('sensor') or None)
+				if df.empty:
+						return jsonify({"success": False, "error": "No readings in the selected range"}), 404
+				
+				_analyzer_data['lux_df'] = df
+				return jsonify({
+						"success": True,
+						"type": "lux",
+						"rows": len(df),
+						"date_range": {
+								"start": df['timestamp'].min().isoformat(),
+								"end": df['timestamp'].max().isoformat()
+						},
+						"preview": df.head(5).to_dict(orient='records')
+				})
+		except ValueError as e:
+				return jsonify({"success": False, "error": str(e)}), 400
+		except Exception as e:
+				return jsonify({"success": False, "error": str(e)}), 500
+
+
 @app.route("/api/analyzer/cleaning-dates", methods=["POST"])
 def api_analyzer_cleaning_dates():
 		"""Add or update cleaning dates for analysis"""
@@ -0,0 +1,437 @@
+"""Columnar, array-backed ring buffer for live sensor readings.
+
+Replaces the ``deque`` of per-reading dicts. Each field lives in its own
+preallocated NumPy column:
+
+    ts          float64  epoch seconds (sensor wall clock, see ``reading_epoch``)
+    idx         float64  running max of ts - a monotonic index for binary search
+    temp        float32  °C
+    rh          float32  %
+    lux         float32  lux
+    irradiance  float32  W/m² (lux / 127 when the sensor does not send it)
+
+Appends are O(1) and never allocate. Every column is stored twice back to
+back (the "mirrored" layout): row ``i`` is written at ``i`` and at
+``i + capacity``, so any run of up to ``capacity`` most-recent rows is one
+contiguous slice and can be returned as a zero-copy view even when it wraps
+around the end of the ring.
+
+Time-window queries binary-search the ``idx`` column with ``searchsorted``
+(O(log n)) instead of parsing or scanning every row. ``idx`` stays sorted
+even if a sensor clock steps backwards or readings arrive slightly out of
+order; the final ts filter is applied only to the rows inside the bounds.
+
+Each row costs ``ROW_BYTES`` (64 B, mirrored), so 24 hours of per-second
+data (86,400 rows) takes about 5.5 MB *per sensor*.
+
+``SensorBufferRegistry`` keeps one ring per sensor_id so that capacity,
+eviction and "latest reading" are per sensor. Rings are allocated in full
+for every new id, so the registry refuses new rings beyond ``max_sensors``
+or once their total size would exceed ``max_bytes``.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+
+COLUMNS = ("ts", "temp", "rh", "lux", "irradiance")
+VALUE_COLUMNS = ("temp", "rh", "lux", "irradiance")
+LUX_TO_IRRADIANCE = 127.0
+ROW_BYTES = 2 * (8 + 8 + 4 * len(VALUE_COLUMNS))  # ts, idx, float32 values; stored twice (mirrored)
+MAX_UNBUFFERED_IDS = 1000  # Refused sensor ids remembered for /api/health
+SENSOR_UTC_OFFSET_HOURS = 8  # Sensors (and the database) use GMT+8 wall-clock time
+
+
+def reading_epoch(time_iso: str) -> float:
+    """
+    Convert a reading's ``time_iso`` to epoch seconds.
+
+    Naive timestamps are the sensor's wall clock (GMT+8, stored as-is in the
+    database); they are encoded as if they were UTC so that formatting the
+    epoch back gives the same wall-clock string.
+    """
+    dt = datetime.fromisoformat(time_iso)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def sensor_now_epoch() -> float:
+    """Current time on the sensor wall clock, in the same encoding as ``reading_epoch``"""
+    return time.time() + SENSOR_UTC_OFFSET_HOURS * 3600
+
+
+def format_epochs(ts: np.ndarray) -> np.ndarray:
+    """Vectorized epoch -> 'YYYY-MM-DDTHH:MM:SS' strings (wall clock, no offset)"""
+    return np.datetime_as_string((ts * 1000).astype("datetime64[ms]"), unit="s")
+
+
+class ReadingRingBuffer:
+    """
+    Fixed-capacity columnar ring buffer.
+
+    Usage:
+        buf = ReadingRingBuffer(capacity=86400)
+        buf.append(reading)                  # dict from parse_reading()
+        with buf.lock:
+            cols = buf.tail(1000)            # zero-copy column views
+        cols = buf.tail(1000, copy=True)     # safe to use outside the lock
+
+    Views returned without ``copy=True`` alias the ring storage and will be
+    overwritten by later appends; only use them while holding ``buf.lock``.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.lock = threading.RLock()
+        self._cols: Dict[str, np.ndarray] = {
+            "ts": np.zeros(2 * capacity, dtype=np.float64),
+            "idx": np.zeros(2 * capacity, dtype=np.float64),
+        }
+        for name in VALUE_COLUMNS:
+            self._cols[name] = np.full(2 * capacity, np.nan, dtype=np.float32)
+        self._head = 0       # Next slot to write (0 <= head < capacity)
+        self._size = 0
+        self._appended = 0   # Total rows ever appended
+        self._latest: Optional[Dict[str, Any]] = None
+        self._max_ts = -np.inf
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, reading: Dict[str, Any]) -> None:
+        """Append one parsed reading (needs 'time_iso' and numeric fields)"""
+        ts = reading.get("epoch")
+        if ts is None:
+            ts = reading_epoch(reading["time_iso"])
+        lux = reading.get("lux")
+        irradiance = reading.get("irradiance")
+        if irradiance is None and lux is not None:
+            irradiance = lux / LUX_TO_IRRADIANCE
+        values = (
+            ts,
+            _nan_if_none(reading.get("temp")),
+            _nan_if_none(reading.get("rh")),
+            _nan_if_none(lux),
+            _nan_if_none(irradiance),
+        )
+
+        with self.lock:
+            i = self._head
+            j = i + self.capacity
+            for name, value in zip(COLUMNS, values):
+                col = self._cols[name]
+                col[i] = value
+                col[j] = value
+            if ts > self._max_ts:
+                self._max_ts = ts
+            idx = self._cols["idx"]
+            idx[i] = self._max_ts
+            idx[j] = self._max_ts
+            self._head = (i + 1) % self.capacity
+            if self._size < self.capacity:
+                self._size += 1
+            self._appended += 1
+            self._latest = reading
+
+    def clear(self) -> None:
+        with self.lock:
+            self._head = 0
+            self._size = 0
+            self._latest = None
+            self._max_ts = -np.inf
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    @property
+    def total_appended(self) -> int:
+        return self._appended
+
+    @property
+    def nbytes(self) -> int:
+        return sum(col.nbytes for col in self._cols.values())
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """The most recent reading dict as received (O(1))"""
+        return self._latest
+
+    def oldest_ts(self) -> Optional[float]:
+        """Timestamp of the oldest row still held, or None if nothing was ever evicted"""
+        with self.lock:
+            if self._appended <= self._size:
+                return None
+            start, _ = self._bounds(self._size)
+            return float(self._cols["idx"][start])
+
+    def _bounds(self, n: int):
+        """Start/stop into the mirrored storage for the newest ``n`` rows"""
+        # The newest row sits at head - 1; its mirror copy at head - 1 + capacity.
+        # Ending the slice at the mirror keeps it contiguous whether or not
+        # the ring has wrapped.
+        n = max(0, min(n, self._size))
+        stop = self._head + self.capacity
+        return stop - n, stop
+
+    def tail(self, n: Optional[int] = None, copy: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Column arrays for the newest ``n`` rows (all rows if None), oldest first.
+
+        Zero-copy views unless ``copy=True``.
+        """
+        with self.lock:
+            start, stop = self._bounds(self._size if n is None else n)
+            return {
+                name: (col[start:stop].copy() if copy else col[start:stop])
+                for name, col in self._cols.items()
+            }
+
+    def window(
+        self,
+        start_ts: float,
+        end_ts: Optional[float] = None,
+        copy: bool = True,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Rows with start_ts <= ts <= end_ts, oldest first.
+
+        Bounds are found by binary search on the monotonic ``idx`` column,
+        so the cost is O(log n) plus the size of the result. Copies unless
+        ``copy=False`` (views are only valid while holding ``self.lock``).
+        """
+        with self.lock:
+            start, stop = self._bounds(self._size)
+            idx = self._cols["idx"][start:stop]
+            lo = int(np.searchsorted(idx, start_ts, side="left"))
+            hi = len(idx) if end_ts is None else int(np.searchsorted(idx, end_ts, side="right"))
+            cols = {name: col[start + lo:start + hi] for name, col in self._cols.items()}
+
+            # Out-of-order rows inside the bounds may still fall outside the range
+            ts = cols["ts"]
+            if len(ts) and (ts.min() < start_ts or (end_ts is not None and ts.max() > end_ts)):
+                mask = ts >= start_ts
+                if end_ts is not None:
+                    mask &= ts <= end_ts
+                return {name: col[mask] for name, col in cols.items()}
+            if copy:
+                return {name: col.copy() for name, col in cols.items()}
+            return cols
+
+    def last_minutes(self, minutes: float, copy: bool = True) -> Dict[str, np.ndarray]:
+        """Rows from the last ``minutes`` on the sensor wall clock"""
+        return self.window(sensor_now_epoch() - minutes * 60, copy=copy)
+
+
+def _nan_if_none(value: Optional[float]) -> float:
+    return np.nan if value is None else value
+
+
+class SensorBufferRegistry:
+    """
+    One ReadingRingBuffer per sensor_id, so a chatty sensor cannot evict the
+    history of the others and "latest reading" is always per sensor.
+
+    Queries take an optional ``sensor``; without it, the per-sensor results
+    are merged in timestamp order.
+
+    Usage:
+        registry = SensorBufferRegistry(default_capacity=86400,
+                                        capacities={"site-a-pyrano": 3600})
+        registry.append(reading)                       # routed by reading["id"]
+        registry.latest("e4643048d7292c2e")            # O(1)
+        registry.last_minutes(60, sensor="e4643048d7292c2e")
+    """
+
+    def __init__(
+        self,
+        default_capacity: int,
+        capacities: Optional[Dict[str, int]] = None,
+        max_sensors: int = 256,
+        max_bytes: Optional[int] = None,
+    ):
+        """
+        Args:
+            default_capacity: Ring size for sensors without an explicit capacity
+            capacities: Per-sensor ring sizes keyed by sensor_id
+            max_sensors: New sensor ids beyond this are not buffered in memory
+            max_bytes: Total size of all rings (ROW_BYTES per row); a new id
+                whose ring would not fit is not buffered (None = no limit)
+        """
+        self.default_capacity = default_capacity
+        self.capacities = dict(capacities or {})
+        self.max_sensors = max_sensors
+        self.max_bytes = max_bytes
+        self._allocated = 0  # Bytes of all rings
+        self._buffers: Dict[str, ReadingRingBuffer] = {}
+        self._lock = threading.Lock()
+        self._latest: Optional[Dict[str, Any]] = None
+        self.unbuffered_readings = 0  # Readings from sensors beyond max_sensors
+        self.unbuffered_sensors: Set[str] = set()  # Their ids (at most MAX_UNBUFFERED_IDS)
+        self.started_ts = sensor_now_epoch()  # Nothing older was ever buffered
+
+    # ------------------------------------------------------------------
+
+    def buffer_for(self, sensor_id: str, create: bool = False) -> Optional[ReadingRingBuffer]:
+        buf = self._buffers.get(sensor_id)
+        if buf is not None or not create:
+            return buf
+        with self._lock:
+            buf = self._buffers.get(sensor_id)
+            if buf is None:
+                capacity = self.capacities.get(sensor_id, self.default_capacity)
+                over_budget = self.max_bytes is not None and self._allocated + capacity * ROW_BYTES > self.max_bytes
+                if len(self._buffers) >= self.max_sensors or over_budget:
+                    self.unbuffered_readings += 1
+                    if len(self.unbuffered_sensors) < MAX_UNBUFFERED_IDS:
+                        self.unbuffered_sensors.add(sensor_id)
+                    return None
+                buf = ReadingRingBuffer(capacity)
+                self._buffers[sensor_id] = buf
+                self._allocated += buf.nbytes
+            return buf
+
+    def append(self, reading: Dict[str, Any]) -> bool:
+        """Route a parsed reading to its sensor's buffer. False if not buffered."""
+        buf = self.buffer_for(str(reading.get("id", "unknown")), create=True)
+        if buf is None:
+            return False
+        buf.append(reading)
+        self._latest = reading
+        return True
+
+    def sensors(self) -> List[str]:
+        return list(self._buffers.keys())
+
+    def __len__(self) -> int:
+        return sum(len(buf) for buf in list(self._buffers.values()))
+
+    def __bool__(self) -> bool:
+        return self._latest is not None
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buf.nbytes for buf in list(self._buffers.values()))
+
+    @property
+    def total_appended(self) -> int:
+        return sum(buf.total_appended for buf in list(self._buffers.values()))
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def latest(self, sensor: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Latest reading of one sensor, or the latest of any sensor (O(1))"""
+        if sensor is None:
+            return self._latest
+        buf = self._buffers.get(sensor)
+        return buf.latest() if buf is not None else None
+
+    def latest_per_sensor(self) -> Dict[str, Optional[Dict[str, Any]]]:
+        return {sensor_id: buf.latest() for sensor_id, buf in list(self._buffers.items())}
+
+    def tail(self, n: Optional[int] = None, sensor: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """Newest ``n`` rows (copies), oldest first"""
+        if sensor is not None:
+            buf = self._buffers.get(sensor)
+            return buf.tail(n, copy=True) if buf is not None else _empty_columns()
+        merged = _merge([buf.tail(n, copy=True) for buf in list(self._buffers.values())])
+        if n is not None:
+            merged = {name: col[-n:] if n > 0 else col[:0] for name, col in merged.items()}
+        return merged
+
+    def window(
+        self,
+        start_ts: float,
+        end_ts: Optional[float] = None,
+        sensor: Optional[str] = None,
+        copy: bool = True,
+    ) -> Dict[str, np.ndarray]:
+        """Rows in [start_ts, end_ts] for one sensor or all sensors merged"""
+        if sensor is not None:
+            buf = self._buffers.get(sensor)
+            return buf.window(start_ts, end_ts, copy=copy) if buf is not None else _empty_columns()
+        return _merge([buf.window(start_ts, end_ts) for buf in list(self._buffers.values())])
+
+    def last_minutes(
+        self,
+        minutes: float,
+        sensor: Optional[str] = None,
+        copy: bool = True,
+    ) -> Dict[str, np.ndarray]:
+        return self.window(sensor_now_epoch() - minutes * 60, sensor=sensor, copy=copy)
+
+    def coverage_start(self, sensor: Optional[str] = None) -> float:
+        """
+        Earliest timestamp from which memory holds every reading received.
+
+        That is the registry's start time, moved forward past whatever the
+        ring(s) of ``sensor`` (or of any sensor) have evicted. Infinite (never
+        covered) for a sensor without a ring, which was refused beyond
+        ``max_sensors`` or has not reported since startup, and for all sensors
+        once any reading was refused.
+        """
+        if sensor is not None:
+            if sensor not in self._buffers:
+                return math.inf
+            buffers = [self._buffers[sensor]]
+        else:
+            if self.unbuffered_readings:
+                return math.inf
+            buffers = list(self._buffers.values())
+        start = self.started_ts
+        for buf in buffers:
+            oldest = buf.oldest_ts()
+            if oldest is not None and oldest > start:
+                start = oldest
+        return start
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sensors": len(self._buffers),
+            "max_sensors": self.max_sensors,
+            "bytes": self._allocated,
+            "max_bytes": self.max_bytes,
+            "unbuffered_readings": self.unbuffered_readings,
+            "unbuffered_sensors": len(self.unbuffered_sensors),
+            "per_sensor": {
+                sensor_id: {"count": len(buf), "capacity": buf.capacity}
+                for sensor_id, buf in list(self._buffers.items())
+            },
+        }
+
+
+def _empty_columns() -> Dict[str, np.ndarray]:
+    cols = {"ts": np.empty(0, dtype=np.float64), "idx": np.empty(0, dtype=np.float64)}
+    for name in VALUE_COLUMNS:
+        cols[name] = np.empty(0, dtype=np.float32)
+    return cols
+
+
+def _merge(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Concatenate per-sensor column sets and order the rows by timestamp"""
+    parts = [p for p in parts if len(p["ts"])]
+    if not parts:
+        return _empty_columns()
+    if len(parts) == 1:
+        return parts[0]
+    merged = {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+    order = np.argsort(merged["ts"], kind="stable")
+    return {name: col[order] for name, col in merged.items()}
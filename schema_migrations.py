@@ -0,0 +1,349 @@
+"""
+Schema versioning for the ZDEnergy database
+Ordered migrations recorded in a schema_version table, applied once at startup
+(or from the command line) instead of re-running every CREATE ... IF NOT EXISTS
+on each cold start
+
+Every migration is idempotent DDL, so databases created before versioning
+existed start at version 0 and simply run them all: whatever already exists is
+left alone and only the missing pieces are added.
+
+Long-running online conversions keep their own scripts and are detected as
+capabilities (see DatabaseManager.detect_capabilities) rather than run here:
+  - migrate_add_unique_reading_key.py   (dedupe + CREATE INDEX CONCURRENTLY)
+  - migrate_partition_sensor_readings.py (batched copy into a partitioned table)
+  - migrate_build_rollups.py             (backfill of the rollup tables)
+  - migrate_sensor_dictionary.py         (copy into a table keyed by sensors.id)
+
+Usage:
+    python schema_migrations.py      # show the version and apply pending migrations
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, List
+
+from db_manager import (
+    DEFAULT_PARTITION,
+    NAMED_READINGS_VIEW,
+    READING_KEY_CONSTRAINT,
+    ROLLUPS,
+    ROLLUP_METRICS,
+    SENSORS_TABLE,
+    UNKNOWN_SENSOR_ID,
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION_TABLE = "schema_version"
+MIGRATION_LOCK_KEY = 0x5A44_5343  # pg_advisory_xact_lock key, one migrator at a time
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Any, Any], None]  # (DatabaseManager, cursor) -> None, no commit
+
+
+def _base_schema(db, cursor) -> None:
+    """sensor_readings (monthly partitions), kpi_snapshots and system_config"""
+    # Range-partitioned by month so that retention drops whole partitions
+    # instead of DELETEing rows. The partition key must be part of every
+    # unique constraint.
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS sensor_readings (
+            id SERIAL,
+            timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            sensor_id VARCHAR(100) NOT NULL DEFAULT '{UNKNOWN_SENSOR_ID}',
+            temperature REAL,
+            humidity REAL,
+            lux REAL,
+            irradiance REAL,
+            created_at TIMESTAMPTZ DEFAULT NOW(),
+            CONSTRAINT sensor_readings_pkey PRIMARY KEY (id, timestamp),
+            CONSTRAINT {READING_KEY_CONSTRAINT} UNIQUE (sensor_id, timestamp)
+        ) PARTITION BY RANGE (timestamp);
+    """)
+
+    # Tables created before partitioning stay as they are until
+    # migrate_partition_sensor_readings.py converts them
+    cursor.execute("""
+        SELECT 1 FROM pg_partitioned_table
+        WHERE partrelid = 'sensor_readings'::regclass;
+    """)
+    if cursor.fetchone():
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION}
+            PARTITION OF sensor_readings DEFAULT;
+        """)
+        db._ensure_partitions(cursor)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sensor_readings_timestamp
+        ON sensor_readings (timestamp DESC);
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS kpi_snapshots (
+            id SERIAL PRIMARY KEY,
+            timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            kpi_name VARCHAR(100) NOT NULL,
+            value REAL NOT NULL,
+            unit VARCHAR(50),
+            metadata JSONB,
+            created_at TIMESTAMPTZ DEFAULT NOW()
+        );
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_kpi_snapshots_timestamp
+        ON kpi_snapshots (timestamp DESC, kpi_name);
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS system_config (
+            id SERIAL PRIMARY KEY,
+            config_key VARCHAR(100) UNIQUE NOT NULL,
+            config_value TEXT NOT NULL,
+            description TEXT,
+            updated_at TIMESTAMPTZ DEFAULT NOW()
+        );
+    """)
+
+
+def _add_sensor_id(db, cursor) -> None:
+    """sensor_id column on tables created before multi-sensor support (was migrate_add_sensor_id.py)"""
+    cursor.execute("""
+        ALTER TABLE sensor_readings
+        ADD COLUMN IF NOT EXISTS sensor_id VARCHAR(100);
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sensor_readings_sensor_id
+        ON sensor_readings (sensor_id);
+    """)
+
+
+def _spool_checkpoints(db, cursor) -> None:
+    """Replay progress of the on-disk reading spool (see reading_spool.py)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS spool_checkpoints (
+            spool_id VARCHAR(64) PRIMARY KEY,
+            byte_offset BIGINT NOT NULL,
+            updated_at TIMESTAMPTZ DEFAULT NOW()
+        );
+    """)
+
+
+def _rollup_tables(db, cursor) -> None:
+    """Rollup tables, maintained incrementally by DatabaseManager._write_readings"""
+    metric_columns = "".join(
+        f"""
+            {prefix}_count INTEGER NOT NULL DEFAULT 0,
+            {prefix}_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            {prefix}_min REAL,
+            {prefix}_max REAL,"""
+        for prefix in ROLLUP_METRICS
+    )
+    for table, _, _ in ROLLUPS.values():
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TIMESTAMPTZ NOT NULL,
+                sensor_id VARCHAR(100) NOT NULL,
+                sample_count INTEGER NOT NULL,{metric_columns}
+                updated_at TIMESTAMPTZ DEFAULT NOW(),
+                PRIMARY KEY (sensor_id, bucket)
+            );
+        """)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_bucket ON {table} (bucket);")
+
+
+def create_named_readings_view(cursor) -> None:
+    """View of sensor_readings with the external sensor_id joined back from sensors"""
+    cursor.execute(f"""
+        CREATE OR REPLACE VIEW {NAMED_READINGS_VIEW} AS
+        SELECT r.id, r.timestamp, s.external_id AS sensor_id, r.sensor_key,
+               r.temperature, r.humidity, r.lux, r.irradiance, r.created_at
+        FROM sensor_readings r
+        JOIN {SENSORS_TABLE} s ON s.id = r.sensor_key;
+    """)
+
+
+def _sensor_dictionary(db, cursor) -> None:
+    """sensors dimension table; an empty sensor_readings switches to sensor_key right away"""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SENSORS_TABLE} (
+            id SMALLSERIAL PRIMARY KEY,
+            external_id VARCHAR(100) UNIQUE NOT NULL,
+            site VARCHAR(100),
+            calibration JSONB,
+            created_at TIMESTAMPTZ DEFAULT NOW()
+        );
+    """)
+
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = 'sensor_readings' AND column_name IN ('sensor_id', 'sensor_key');
+    """)
+    columns = {row[0] for row in cursor.fetchall()}
+    if "sensor_id" not in columns:
+        return
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM sensor_readings);")
+    if cursor.fetchone()[0]:
+        # Rewriting existing rows is an online job
+        logger.info("   sensor_readings has data - run migrate_sensor_dictionary.py to convert it")
+        return
+
+    # No rows yet: swap the text column for the key in place. The unique key
+    # leads with sensor_key, so it also serves per-sensor scans.
+    cursor.execute(f"ALTER TABLE sensor_readings DROP CONSTRAINT IF EXISTS {READING_KEY_CONSTRAINT};")
+    cursor.execute("DROP INDEX IF EXISTS idx_sensor_readings_sensor_id;")
+    cursor.execute("ALTER TABLE sensor_readings DROP COLUMN sensor_id;")
+    cursor.execute("ALTER TABLE sensor_readings ADD COLUMN sensor_key SMALLINT NOT NULL;")
+    cursor.execute(
+        f"ALTER TABLE sensor_readings ADD CONSTRAINT {READING_KEY_CONSTRAINT} UNIQUE (sensor_key, timestamp);"
+    )
+    create_named_readings_view(cursor)
+
+
+# Append only: never renumber or edit a migration that has shipped
+MIGRATIONS: List[Migration] = [
+    Migration(1, "base schema", _base_schema),
+    Migration(2, "sensor_id column", _add_sensor_id),
+    Migration(3, "spool checkpoints", _spool_checkpoints),
+    Migration(4, "rollup tables", _rollup_tables),
+    Migration(5, "sensor dictionary", _sensor_dictionary),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(cursor) -> int:
+    """Highest applied migration (0 if the database predates versioning)"""
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (SCHEMA_VERSION_TABLE,))
+    if not cursor.fetchone()[0]:
+        return 0
+    cursor.execute(f"SELECT COALESCE(MAX(version), 0) FROM {SCHEMA_VERSION_TABLE};")
+    return cursor.fetchone()[0]
+
+
+def run_migrations(db, apply: bool = True) -> List[int]:
+    """
+    Apply pending migrations in order, each in its own transaction.
+
+    Costs a single catalog query when the schema is current. Concurrent
+    processes serialize on an advisory lock, and whoever comes second sees
+    the migrations already recorded.
+
+    Args:
+        db: DatabaseManager
+        apply: False to only report pending migrations (DB_AUTO_MIGRATE=false)
+
+    Returns:
+        Versions applied
+    """
+    conn = None
+    applied: List[int] = []
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        version = current_version(cursor)
+        conn.rollback()
+        pending = [m for m in MIGRATIONS if m.version > version]
+        if not pending:
+            return applied
+        if not apply:
+            logger.warning(
+                f"⚠️  Database schema is at version {version}, {LATEST_VERSION} expected - "
+                f"run python schema_migrations.py"
+            )
+            return applied
+
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(200) NOT NULL,
+                applied_at TIMESTAMPTZ DEFAULT NOW()
+            );
+        """)
+        conn.commit()
+
+        for migration in pending:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_KEY,))
+            if current_version(cursor) >= migration.version:
+                conn.rollback()
+                continue
+            logger.info(f"🔧 Applying schema migration {migration.version}: {migration.name}")
+            migration.apply(db, cursor)
+            cursor.execute(
+                f"INSERT INTO {SCHEMA_VERSION_TABLE} (version, name) VALUES (%s, %s);",
+                (migration.version, migration.name)
+            )
+            conn.commit()
+            applied.append(migration.version)
+
+        logger.info(f"✅ Database schema at version {LATEST_VERSION}")
+        return applied
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.error(f"❌ Schema migration failed: {e}")
+        raise
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+
+def show_versions(db):
+    """Display applied and pending migrations"""
+    conn = None
+
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        version = current_version(cursor)
+
+        print("\n" + "="*60)
+        print(f"📋 Schema version: {version} (latest {LATEST_VERSION})")
+        print("="*60)
+        for migration in MIGRATIONS:
+            mark = "✅" if migration.version <= version else "⏳"
+            print(f"  {mark} {migration.version:3}  {migration.name}")
+        print("="*60 + "\n")
+
+    except Exception as e:
+        logger.error(f"❌ Failed to read schema version: {e}")
+    finally:
+        if conn:
+            cursor.close()
+            db.return_connection(conn)
+
+
+if __name__ == "__main__":
+    from db_manager import DatabaseManager
+
+    logging.basicConfig(level=logging.INFO)
+    print("\n" + "="*60)
+    print("🔄 Database Migration Tool")
+    print("="*60)
+    print("Task: Apply pending schema migrations")
+    print("="*60 + "\n")
+
+    db = DatabaseManager()
+    show_versions(db)
+
+    # Ask for confirmation
+    response = input("Do you want to apply pending migrations? (yes/no): ")
+
+    if response.lower() in ['yes', 'y']:
+        print()
+        run_migrations(db)
+        db.detect_capabilities()
+        print()
+        show_versions(db)
+    else:
+        print("\n❌ Migration cancelled by user\n")
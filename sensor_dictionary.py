@@ -0,0 +1,131 @@
+"""In-process cache of the ``sensors`` dimension table.
+
+``sensor_readings`` used to repeat ``sensor_id VARCHAR(100)`` in every row
+and in every entry of its sensor indexes. Now each sensor is stored once in
+``sensors`` (``id SMALLINT``, ``external_id``, ``site``, ``calibration``),
+and readings carry only the 2-byte ``sensor_key``.
+
+Ingest resolves external ids to keys through this cache. A database round
+trip is needed only the first time a sensor is seen, and then the new row
+in ``sensors`` is committed on its own connection before any reading refers
+to it. Readers resolve a ``?sensor=`` filter the same way and compare keys,
+and the ``sensor_readings_named`` view joins the external id back for the
+queries that return it.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SensorDictionary:
+    """
+    external_id <-> sensor_key mapping, loaded once and extended on demand.
+
+    Usage:
+        sensors = SensorDictionary(db)
+        sensors.load()
+        keys = sensors.keys({"gw1-s1", "gw1-s2"})        # registers new sensors
+        key = sensors.key("gw1-s1", create=False)       # None if unknown
+    """
+
+    def __init__(self, db: Any):
+        """
+        Args:
+            db: DatabaseManager used for lookups and registrations
+        """
+        self.db = db
+        self._keys: Dict[str, int] = {}
+        self._names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+        # Counters exposed through stats()
+        self.hits = 0
+        self.misses = 0
+        self.registered = 0
+
+    def _remember(self, rows: Iterable) -> None:
+        with self._lock:
+            for key, external_id in rows:
+                self._keys[external_id] = key
+                self._names[key] = external_id
+
+    def load(self) -> int:
+        """Read the whole sensors table into memory. Returns the number of sensors."""
+        self._remember(self._query(None, create=False))
+        return len(self._keys)
+
+    def _query(self, external_ids: Optional[List[str]], create: bool) -> List:
+        conn = None
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            if create:
+                cursor.execute("""
+                    INSERT INTO sensors (external_id)
+                    SELECT unnest(%s::varchar[])
+                    ON CONFLICT (external_id) DO NOTHING;
+                """, (external_ids,))
+                self.registered += cursor.rowcount
+            if external_ids is None:
+                cursor.execute("SELECT id, external_id FROM sensors;")
+            else:
+                cursor.execute(
+                    "SELECT id, external_id FROM sensors WHERE external_id = ANY(%s);",
+                    (external_ids,)
+                )
+            rows = cursor.fetchall()
+            conn.commit()
+            return rows
+
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"❌ Failed to resolve sensor ids: {e}")
+            raise
+        finally:
+            if conn:
+                cursor.close()
+                self.db.return_connection(conn)
+
+    def keys(self, external_ids: Iterable[str], create: bool = True) -> Dict[str, int]:
+        """
+        Keys of the given external ids.
+
+        Args:
+            external_ids: Sensor ids as sent by the gateways
+            create: Register unknown ids (ingest); False leaves them out (readers)
+        """
+        wanted = set(external_ids)
+        with self._lock:
+            found = {name: self._keys[name] for name in wanted if name in self._keys}
+            self.hits += len(found)
+            self.misses += len(wanted) - len(found)
+        missing = sorted(wanted - found.keys())
+        if missing:
+            rows = self._query(missing, create)
+            self._remember(rows)
+            found.update({external_id: key for key, external_id in rows})
+        return found
+
+    def key(self, external_id: str, create: bool = False) -> Optional[int]:
+        """Key of one external id (None if unknown and create is False)"""
+        return self.keys([external_id], create).get(external_id)
+
+    def name(self, key: int) -> Optional[str]:
+        """External id of a key already seen by this process"""
+        with self._lock:
+            return self._names.get(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sensors": len(self._keys),
+                "hits": self.hits,
+                "misses": self.misses,
+                "registered": self.registered,
+            }
@@ -153,6 +153,30 @@ def parse_lux_csv(filepath: str) -> pd.DataFrame:
     return result
 
 
+def load_lux_from_database(
+    start: datetime,
+    end: datetime,
+    sensor_id: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Load lux/temperature readings straight from PostgreSQL instead of a CSV export
+    
+    Uses the binary columnar fetch (DatabaseManager.get_readings_arrays), so
+    months of per-second data arrive as NumPy arrays. start/end are database
+    time (GMT+8); timestamps are returned in Qatar time like the CSV export.
+    
+    Returns DataFrame with columns: timestamp, temperature, humidity, lux, irradiance
+    """
+    from db_manager import get_db_manager
+    
+    arrays = get_db_manager().get_readings_arrays(
+        start, end, ('temperature', 'humidity', 'lux'), sensor_id, shift_hours=-5
+    )
+    df = pd.DataFrame(arrays)
+    df['irradiance'] = (df['lux'] / SYSTEM_CONFIG.lux_to_irradiance).clip(upper=SYSTEM_CONFIG.max_irradiance)
+    return df[['timestamp', 'temperature', 'humidity', 'lux', 'irradiance']]
+
+
 def parse_inverter_csv(filepath: str) -> pd.DataFrame:
     """
     Parse inverter generation CSV file (per 30-min data)
@@ -5,16 +5,29 @@ let selectedDate = null;
 let selectedStartDate = null;
 let selectedEndDate = null;
 let refreshInterval = null;
+let liveSource = null; // EventSource on /api/stream while in live mode
+let liveRaw = null; // Readings shown in live mode, extended by the stream
+let liveCursor = null; // /api/data cursor after liveRaw, for delta polling
+let liveRenderTimer = null;
+const LIVE_RENDER_MS = 1000; // redraw at most once a second however fast readings arrive
+const LIVE_RELOAD_FACTOR = 2; // reload (and re-downsample) once streamed rows double the series
 const GAP_MS = 2 * 60 * 1000; // break line if gap > 2 minutes
 
+function chartPoints() {
+	// One point per horizontal pixel is all a chart can draw
+	const canvas = document.getElementById('chart-temp');
+	return Math.max(200, Math.round((canvas && canvas.clientWidth) || 1000));
+}
+
 async function fetchData() {
 	let url;
+	const points = chartPoints();
 	if (currentMode === 'range' && selectedStartDate && selectedEndDate) {
-		url = `/api/data?start_date=${selectedStartDate}&end_date=${selectedEndDate}`;
+		url = `/api/data?start_date=${selectedStartDate}&end_date=${selectedEndDate}&points=${points}`;
 	} else if (currentMode === 'historical' && selectedDate) {
-		url = `/api/data?date=${selectedDate}`;
+		url = `/api/data?date=${selectedDate}&points=${points}`;
 	} else {
-		url = `/api/data?window=${currentWindow}`;
+		url = `/api/data?window=${currentWindow}&points=${points}`;
 	}
 	
 	const resp = await fetch(url);
@@ -30,9 +43,23 @@ async function fetchData() {
 		}
 	});
 	
+	// Position after the newest reading, for /api/data?since= deltas
+	raw.cursor = json.cursor || null;
 	return raw;
 }
 
+// Polling in live mode: fetch only the readings after liveCursor.
+// Returns false when the window has to be reloaded instead.
+async function refreshDelta() {
+	const resp = await fetch(`/api/data?since=${encodeURIComponent(liveCursor)}`);
+	if (!resp.ok) return false;
+	const json = await resp.json();
+	if (json.more) return false; // too far behind for one delta
+	liveCursor = json.cursor || liveCursor;
+	json.readings.forEach(appendLiveReading);
+	return true;
+}
+
 function buildSeries(raw, field) {
 	const series = [];
 	let prevTimeStr = null;
@@ -135,44 +162,79 @@ function makeChart(ctx, label, color, yTitle, isFullscreen = false) {
 
 async function refresh() {
 	try {
+		if (currentMode === 'live' && liveRaw && liveCursor && await refreshDelta()) return;
 		const raw = await fetchData();
-		if (!charts.temp) {
-			charts.temp = makeChart(document.getElementById('chart-temp'), 'Temp', '#ff7369', '°C');
-			charts.rh = makeChart(document.getElementById('chart-rh'), 'RH', '#4ecdc4', '%');
-			charts.lux = makeChart(document.getElementById('chart-lux'), 'Lux', '#ffd166', 'lux');
-			charts.irradiance = makeChart(document.getElementById('chart-irradiance'), 'Irradiance', '#a78bfa', 'W/m²');
-		}
-		const tempData = buildSeries(raw, 'temp');
-		const rhData = buildSeries(raw, 'rh');
-		const luxData = buildSeries(raw, 'lux');
-		const irradianceData = buildSeries(raw, 'irradiance');
-		
-		// Update chart data
-		charts.temp.data.datasets[0].data = tempData;
-		charts.rh.data.datasets[0].data = rhData;
-		charts.lux.data.datasets[0].data = luxData;
-		charts.irradiance.data.datasets[0].data = irradianceData;
-		
-		// Auto-scale Y axis with padding
-		updateYScale(charts.temp, tempData);
-		updateYScale(charts.rh, rhData);
-		updateYScale(charts.lux, luxData);
-		updateYScale(charts.irradiance, irradianceData);
-		
-		charts.temp.update();
-		charts.rh.update();
-		charts.lux.update();
-		charts.irradiance.update();
-		updateMeta(raw);
-		updateTable(raw);
-		
-		// Update fullscreen chart if open
-		updateFullscreenChart();
+		liveRaw = currentMode === 'live' ? raw : null;
+		liveCursor = liveRaw ? raw.cursor : null;
+		render(raw);
 	} catch (e) {
 		console.error(e);
 	}
 }
 
+function render(raw) {
+	if (!charts.temp) {
+		charts.temp = makeChart(document.getElementById('chart-temp'), 'Temp', '#ff7369', '°C');
+		charts.rh = makeChart(document.getElementById('chart-rh'), 'RH', '#4ecdc4', '%');
+		charts.lux = makeChart(document.getElementById('chart-lux'), 'Lux', '#ffd166', 'lux');
+		charts.irradiance = makeChart(document.getElementById('chart-irradiance'), 'Irradiance', '#a78bfa', 'W/m²');
+	}
+	const tempData = buildSeries(raw, 'temp');
+	const rhData = buildSeries(raw, 'rh');
+	const luxData = buildSeries(raw, 'lux');
+	const irradianceData = buildSeries(raw, 'irradiance');
+	
+	// Update chart data
+	charts.temp.data.datasets[0].data = tempData;
+	charts.rh.data.datasets[0].data = rhData;
+	charts.lux.data.datasets[0].data = luxData;
+	charts.irradiance.data.datasets[0].data = irradianceData;
+	
+	// Auto-scale Y axis with padding
+	updateYScale(charts.temp, tempData);
+	updateYScale(charts.rh, rhData);
+	updateYScale(charts.lux, luxData);
+	updateYScale(charts.irradiance, irradianceData);
+	
+	charts.temp.update();
+	charts.rh.update();
+	charts.lux.update();
+	charts.irradiance.update();
+	updateMeta(raw);
+	updateTable(raw);
+	
+	// Update fullscreen chart if open
+	updateFullscreenChart(raw);
+}
+
+function wallClockMs(time) {
+	// Compare database and sensor times as-is (no timezone conversion)
+	return new Date(time.replace(/\.\d+/, '').split('+')[0].split('Z')[0]).getTime();
+}
+
+function appendLiveReading(r) {
+	if (currentMode !== 'live' || !liveRaw) return;
+	liveRaw.push(r);
+	// Keep only the selected window
+	const cutoff = wallClockMs(r.time) - currentWindow * 60 * 1000;
+	let drop = 0;
+	while (drop < liveRaw.length && wallClockMs(liveRaw[drop].time) < cutoff) drop++;
+	if (drop) liveRaw.splice(0, drop);
+	
+	if (liveRaw.length > LIVE_RELOAD_FACTOR * chartPoints()) {
+		// More points than the chart can show: fetch a fresh downsampled window
+		liveRaw = null;
+		refresh();
+		return;
+	}
+	if (!liveRenderTimer) {
+		liveRenderTimer = setTimeout(() => {
+			liveRenderTimer = null;
+			if (liveRaw) render(liveRaw);
+		}, LIVE_RENDER_MS);
+	}
+}
+
 function updateYScale(chart, data) {
 	const values = data.filter(p => p.y !== null).map(p => p.y);
 	if (values.length === 0) return;
@@ -219,7 +281,7 @@ function updateMeta(raw) {
 		refreshStatus.textContent = 'Paused';
 	} else {
 		modeDisplay.textContent = 'Live';
-		refreshStatus.textContent = '5s';
+		refreshStatus.textContent = (liveSource && liveSource.readyState === EventSource.OPEN) ? 'Push' : '5s';
 	}
 }
 
@@ -279,8 +341,8 @@ function setupEventListeners() {
 			currentWindow = parseInt(e.target.dataset.minutes, 10);
 			selectedDate = null;
 			
-			// Restart auto-refresh
-			startAutoRefresh();
+			// Restart live updates
+			startLive();
 			refresh();
 		});
 	});
@@ -299,8 +361,8 @@ function setupEventListeners() {
 		selectedStartDate = null;
 		selectedEndDate = null;
 		
-		// Stop auto-refresh for historical data
-		stopAutoRefresh();
+		// Stop live updates for historical data
+		stopLive();
 		refresh();
 	});
 	
@@ -325,8 +387,8 @@ function setupEventListeners() {
 		selectedEndDate = endPicker.value;
 		selectedDate = null;
 		
-		// Stop auto-refresh for historical data
-		stopAutoRefresh();
+		// Stop live updates for historical data
+		stopLive();
 		refresh();
 	});
 	
@@ -343,8 +405,8 @@ function setupEventListeners() {
 		document.getElementById('start-date-picker').value = '';
 		document.getElementById('end-date-picker').value = '';
 		
-		// Restart auto-refresh
-		startAutoRefresh();
+		// Restart live updates
+		startLive();
 		refresh();
 	});
 	
@@ -409,8 +471,6 @@ function setupEventListeners() {
 function startAutoRefresh() {
 	stopAutoRefresh();
 	refreshInterval = setInterval(refresh, 5000);
-	// Also check system health every 10 seconds
-	setInterval(updateSystemStatus, 10000);
 }
 
 function stopAutoRefresh() {
@@ -420,6 +480,41 @@ function stopAutoRefresh() {
 	}
 }
 
+// Live mode: readings are pushed over Server-Sent Events; polling is only the fallback
+function startLive() {
+	stopLive();
+	if (!window.EventSource) {
+		startAutoRefresh();
+		return;
+	}
+	const source = new EventSource('/api/stream');
+	liveSource = source;
+	source.addEventListener('open', () => {
+		// (Re)connected: reload the window once, the stream keeps it current
+		stopAutoRefresh();
+		refresh();
+	});
+	source.addEventListener('reading', (e) => appendLiveReading(JSON.parse(e.data)));
+	source.addEventListener('error', () => {
+		// Poll while the browser reconnects; if the server refused the stream
+		// (too many clients) EventSource gives up and polling simply continues
+		if (liveSource === source && !refreshInterval) {
+			liveCursor = null; // streamed readings moved past it: reload once, then poll deltas
+			startAutoRefresh();
+		}
+	});
+}
+
+function stopLive() {
+	stopAutoRefresh();
+	if (liveSource) {
+		liveSource.close();
+		liveSource = null;
+	}
+	liveRaw = null;
+	liveCursor = null;
+}
+
 // System Status Functions
 async function updateSystemStatus() {
 	try {
@@ -611,11 +706,11 @@ function resetZoom() {
 	}
 }
 
-// Update fullscreen chart data (called from main refresh)
-async function updateFullscreenChart() {
+// Update fullscreen chart data (called from main render)
+async function updateFullscreenChart(raw) {
 	if (currentFullscreenType && fullscreenChart) {
 		try {
-			const raw = await fetchData();
+			raw = raw || await fetchData();
 			const config = chartConfigs[currentFullscreenType];
 			const data = buildSeries(raw, config.field);
 			fullscreenChart.data.datasets[0].data = data;
@@ -641,7 +736,8 @@ window.addEventListener('DOMContentLoaded', () => {
 	setupEventListeners();
 	loadAvailableDates();
 	updateSystemStatus(); // Initial status check
-	startAutoRefresh();
+	setInterval(updateSystemStatus, 10000); // Check system health every 10 seconds
+	startLive();
 	refresh();
 });
 
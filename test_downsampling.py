@@ -0,0 +1,94 @@
+"""
+Tests for chart downsampling (downsampling.py)
+Run with: python -m pytest test_downsampling.py
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from downsampling import downsample, expand_buckets, lttb_indices, minmax_indices
+from ring_buffer import VALUE_COLUMNS
+
+
+def columns(size):
+    ts = np.arange(size, dtype=np.float64)
+    cols = {"ts": ts}
+    for name in VALUE_COLUMNS:
+        cols[name] = np.sin(ts / 10).astype(np.float32)
+    return cols
+
+
+def test_lttb_keeps_endpoints_and_count():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.random.default_rng(0).normal(size=1000)
+    index = lttb_indices(x, y, 50)
+    assert len(index) == 50
+    assert index[0] == 0 and index[-1] == 999
+    assert np.all(np.diff(index) > 0)
+
+
+def test_lttb_keeps_a_spike():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.zeros(1000)
+    y[437] = 100.0
+    assert 437 in lttb_indices(x, y, 20)
+
+
+def test_lttb_small_inputs():
+    x = np.arange(5, dtype=np.float64)
+    assert lttb_indices(x, x, 10).tolist() == [0, 1, 2, 3, 4]
+    assert lttb_indices(x, x, 2).tolist() == [0, 4]
+    assert lttb_indices(x, x, 0).tolist() == []
+
+
+def test_minmax_keeps_extremes_of_each_bucket():
+    x = np.arange(10, dtype=np.float64)
+    y = np.array([1, 5, 3, 2, 0, 9, 4, 8, 7, 6], dtype=np.float64)
+    index = minmax_indices(x, y, 2)
+    # Buckets [0..4] and [5..9]: min/max at 4/1 and 9/5 (values 0, 5, 4, 9)
+    assert index.tolist() == [1, 4, 5, 6]
+
+
+def test_minmax_ignores_nan():
+    x = np.arange(6, dtype=np.float64)
+    y = np.array([np.nan, 2, 1, np.nan, np.nan, np.nan])
+    assert minmax_indices(x, y, 2).tolist() == [1, 2]
+    assert minmax_indices(x[:0], y[:0], 2).tolist() == []
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_downsample_reduces_every_column_together(method):
+    cols = columns(10000)
+    cols["time"] = cols["ts"].astype(object)  # Extra columns are carried along
+    cols["rh"][:] = np.nan
+    out = downsample(cols, 100, method)
+    size = len(out["ts"])
+    assert 2 <= size <= 3 * 100 + 2
+    assert all(len(col) == size for col in out.values())
+    assert out["ts"][0] == 0 and out["ts"][-1] == 9999
+    assert np.all(np.diff(out["ts"]) > 0)
+    assert out["time"].tolist() == out["ts"].tolist()
+
+
+def test_downsample_returns_small_input_unchanged():
+    cols = columns(10)
+    assert downsample(cols, 100) is cols
+    with pytest.raises(ValueError):
+        downsample(cols, 5, "average")
+
+
+def test_expand_buckets():
+    t0 = datetime(2025, 1, 1, 10)
+    row = {"first_time": t0, "last_time": t0 + timedelta(minutes=1), "sample_count": 60}
+    single = {"first_time": t0 + timedelta(minutes=5), "last_time": t0 + timedelta(minutes=5), "sample_count": 1}
+    for bucket, low in ((row, 1.0), (single, 7.0)):
+        for name in VALUE_COLUMNS:
+            bucket[f"{name}_min"] = low
+            bucket[f"{name}_max"] = None if name == "lux" else low + 1
+    cols = expand_buckets([row, single])
+    assert cols["time"].tolist() == [t0, t0 + timedelta(minutes=1), t0 + timedelta(minutes=5)]
+    assert cols["temp"].tolist() == [1.0, 2.0, 7.0]
+    assert np.isnan(cols["lux"][1])
+    assert len(expand_buckets([])["ts"]) == 0
@@ -0,0 +1,85 @@
+"""
+Tests for the gateway stream framer (json_framer.py)
+Run with: python -m pytest test_json_framer.py
+"""
+
+import json
+
+from json_framer import JsonFramer
+
+
+def feed_all(framer, chunks):
+    frames = []
+    for chunk in chunks:
+        frames.extend(framer.feed(chunk))
+    return frames
+
+
+def test_newline_delimited_frames():
+    framer = JsonFramer()
+    frames = framer.feed(b'{"id":"a","temp":1}\n{"id":"b","temp":2}\n')
+    assert [json.loads(f)["id"] for f in frames] == ["a", "b"]
+    assert framer.frames == 2
+    assert len(framer) == 0
+
+
+def test_frame_split_at_every_byte():
+    data = b'{"id":"a","note":"{brace} \\"quoted\\"","nested":{"x":1}}\n{"id":"b"}'
+    framer = JsonFramer()
+    frames = feed_all(framer, [data[i:i + 1] for i in range(len(data))])
+    assert [json.loads(f)["id"] for f in frames] == ["a", "b"]
+    assert json.loads(frames[0])["note"] == '{brace} "quoted"'
+
+
+def test_split_inside_escape_sequence():
+    framer = JsonFramer()
+    assert framer.feed(b'{"id":"a","s":"x\\') == []
+    frames = framer.feed(b'"y"}')
+    assert json.loads(frames[0])["s"] == 'x"y'
+
+
+def test_several_concatenated_frames_per_read():
+    framer = JsonFramer()
+    frames = framer.feed(b'{"id":"a"}{"id":"b"} {"id":"c","v":{"w":2}}\r\n')
+    assert [json.loads(f)["id"] for f in frames] == ["a", "b", "c"]
+    assert framer.frames == 3
+
+
+def test_garbage_line_is_returned_and_stream_resyncs():
+    framer = JsonFramer()
+    frames = framer.feed(b'garbage here\n{"id":"a"}\n')
+    assert frames == [b"garbage here", b'{"id":"a"}']
+
+
+def test_garbage_before_object_on_same_line():
+    framer = JsonFramer()
+    frames = framer.feed(b'xx{"id":"a"}\n')
+    assert frames == [b"xx", b'{"id":"a"}']
+
+
+def test_flush_returns_trailing_junk_and_discards_partial_object():
+    framer = JsonFramer()
+    assert framer.feed(b"junk") == []
+    assert framer.flush() == [b"junk"]
+
+    assert framer.feed(b'{"id":"a",') == []
+    assert framer.flush() == []
+    assert framer.discarded_bytes == len(b'{"id":"a",')
+    assert framer.feed(b'{"id":"b"}\n') == [b'{"id":"b"}']
+
+
+def test_oversized_frame_is_dropped():
+    framer = JsonFramer(max_frame_size=32)
+    big = b'{"id":"a","pad":"' + b"x" * 64 + b'"}'
+    frames = framer.feed(big + b'\n{"id":"b"}\n')
+    assert frames == [b'{"id":"b"}']
+    assert framer.oversized_frames == 1
+
+
+def test_oversized_partial_frame_resyncs_at_newline():
+    framer = JsonFramer(max_frame_size=32)
+    assert framer.feed(b'{"id":"a","pad":"' + b"x" * 64) == []
+    assert framer.oversized_frames == 1
+    # The rest of the oversized line is discarded, not parsed as new frames
+    assert framer.feed(b'x"}{"id":"c"}\n{"id":"b"}\n') == [b'{"id":"b"}']
+    assert len(framer) == 0
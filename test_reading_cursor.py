@@ -0,0 +1,64 @@
+"""
+Tests for the /api/data?since= cursor and ?after= page key (reading_cursor.py)
+Run with: python -m pytest test_reading_cursor.py
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from reading_cursor import PageKey, ReadingCursor, epoch_ms
+
+
+def test_cursor_round_trip():
+    cursor = ReadingCursor(1735725600123, 3)
+    assert cursor.encode() == "1735725600123-3"
+    assert ReadingCursor.decode(cursor.encode()) == cursor
+
+
+@pytest.mark.parametrize("token", ["", "123", "1-2-3", "a-1", "5--1", None])
+def test_cursor_rejects_malformed_tokens(token):
+    with pytest.raises(ValueError):
+        ReadingCursor.decode(token)
+
+
+def test_cursor_after_counts_readings_at_last_timestamp():
+    assert ReadingCursor.after([]) is None
+    assert ReadingCursor.after([1000, 2000, 2000]) == ReadingCursor(2000, 2)
+
+
+def test_cursor_start_is_wall_clock():
+    cursor = ReadingCursor.after(epoch_ms(np.array([1735725600.5])))
+    assert cursor.start == datetime(2025, 1, 1, 10, 0, 0, 500000)
+    assert cursor.start_epoch == 1735725600.5
+
+
+def test_cursor_skip_and_advance():
+    cursor = ReadingCursor(2000, 2)
+    # A "timestamp >= 2000" query returns the two delivered readings first
+    assert cursor.skip([2000, 2000, 2000, 3000]) == 2
+    assert cursor.skip([3000]) == 0
+    assert cursor.advance([2000]) == ReadingCursor(2000, 3)
+    assert cursor.advance([2000, 3000]) == ReadingCursor(3000, 1)
+    assert cursor.advance([]) is cursor
+
+
+def test_page_key_round_trip():
+    key = PageKey(1735725600000001, 42)
+    assert key.encode() == "1735725600000001,42"
+    assert PageKey.decode(key.encode()) == key
+    assert key.to_db() == (datetime(2025, 1, 1, 10, 0, 0, 1), 42)
+    with pytest.raises(ValueError):
+        PageKey.decode("1735725600000001")
+
+
+def test_page_key_of_last_row():
+    arrays = {
+        "timestamp": np.array(["2025-01-01T10:00:00", "2025-01-01T10:00:01.25"], dtype="datetime64[us]"),
+        "id": np.array([7, 9]),
+    }
+    key = PageKey.last(arrays)
+    assert key.to_db() == (datetime(2025, 1, 1, 10, 0, 1, 250000), 9)
+    assert PageKey.decode(key.encode()) == key
+    assert PageKey.last({"timestamp": arrays["timestamp"][:0], "id": arrays["id"][:0]}) is None
@@ -0,0 +1,125 @@
+"""
+Tests for the on-disk outage spool (reading_spool.py)
+Run with: python -m pytest test_reading_spool.py
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from reading_spool import HEADER_SIZE, ReadingSpool
+
+
+class FakeDB:
+    """Commits rows and their spool checkpoint together, like insert_spooled_readings_batch"""
+
+    def __init__(self, fail_after_batches=None):
+        self.rows = []
+        self.checkpoints = {}
+        self.fail_after_batches = fail_after_batches
+        self.batches = 0
+
+    def get_spool_checkpoint(self, spool_id):
+        return self.checkpoints.get(spool_id)
+
+    def insert_spooled_readings_batch(self, rows, spool_id, end_offset):
+        if self.fail_after_batches is not None and self.batches >= self.fail_after_batches:
+            raise ConnectionError("database went away")
+        for row in rows:
+            if row[2] is not None and row[2] > 1e30:
+                raise ValueError("real out of range")
+        self.batches += 1
+        self.rows.extend(rows)
+        self.checkpoints[spool_id] = end_offset
+        return len(rows)
+
+
+def make_rows(count, start=0):
+    t0 = datetime(2025, 1, 1, 10)
+    return [(t0 + timedelta(seconds=start + i), "s1", 20.0 + i, None, 500.0, 3.9) for i in range(count)]
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = ReadingSpool(str(tmp_path), fsync_interval_ms=0)
+    spool.open()
+    yield spool
+    spool.close()
+
+
+def test_append_and_replay_round_trip(spool):
+    rows = make_rows(25)
+    assert spool.append(rows) == 25
+    db = FakeDB()
+    assert spool.replay(db, batch_size=10) == 25
+    assert db.rows == rows
+    assert not spool.has_pending
+    assert spool.stats()["replayed"] == 25
+
+
+def test_fully_replayed_spool_starts_a_new_file(spool):
+    spool.append(make_rows(3))
+    old_id = spool.spool_id
+    spool.replay(FakeDB())
+    assert spool.spool_id != old_id
+    assert os.path.getsize(spool.path) == HEADER_SIZE
+
+
+def test_torn_tail_is_dropped_on_open(tmp_path):
+    spool = ReadingSpool(str(tmp_path))
+    spool.open()
+    spool.append(make_rows(5))
+    spool.close()
+    # A crash in the middle of a write leaves a partial record behind
+    with open(spool.path, "ab") as f:
+        f.write(b"\x40\x00\x00\x00\x12\x34")
+    size = os.path.getsize(spool.path)
+
+    reopened = ReadingSpool(str(tmp_path))
+    reopened.open()
+    assert os.path.getsize(reopened.path) == size - 6
+    assert reopened.spool_id == spool.spool_id
+    db = FakeDB()
+    assert reopened.replay(db) == 5
+    assert db.rows == make_rows(5)
+    reopened.close()
+
+
+def test_replay_resumes_from_checkpoint_after_restart(tmp_path):
+    spool = ReadingSpool(str(tmp_path))
+    spool.open()
+    spool.append(make_rows(30))
+    db = FakeDB(fail_after_batches=2)
+    with pytest.raises(ConnectionError):
+        spool.replay(db, batch_size=10)
+    assert len(db.rows) == 20
+    spool.close()
+
+    # A new process only knows the file and the checkpoint in the database
+    db.fail_after_batches = None
+    restarted = ReadingSpool(str(tmp_path))
+    restarted.open()
+    assert restarted.replay(db, batch_size=10) == 10
+    assert db.rows == make_rows(30)
+    restarted.close()
+
+
+def test_rejected_row_is_skipped(spool):
+    rows = make_rows(8)
+    rows[5] = (rows[5][0], "s1", 1e40, None, None, None)
+    spool.append(rows)
+    db = FakeDB()
+    assert spool.replay(db, batch_size=8) == 7
+    assert db.rows == rows[:5] + rows[6:]
+    assert spool.rejected == 1
+    assert not spool.has_pending
+
+
+def test_full_spool_drops_rows(tmp_path):
+    spool = ReadingSpool(str(tmp_path), max_bytes=HEADER_SIZE + 100)
+    spool.open()
+    assert spool.append(make_rows(1)) == 1
+    assert spool.append(make_rows(10)) == 0
+    assert spool.dropped == 10
+    spool.close()
@@ -0,0 +1,90 @@
+"""
+Tests for the columnar ring buffers (ring_buffer.py)
+Run with: python -m pytest test_ring_buffer.py
+"""
+
+import numpy as np
+import pytest
+
+from ring_buffer import ROW_BYTES, ReadingRingBuffer, SensorBufferRegistry
+
+
+def reading(ts, temp=None, sensor="s1"):
+    return {"id": sensor, "epoch": float(ts), "temp": ts if temp is None else temp, "rh": 50.0, "lux": 127.0}
+
+
+def test_wraparound_tail_is_contiguous_and_ordered():
+    buf = ReadingRingBuffer(capacity=5)
+    for ts in range(12):
+        buf.append(reading(ts))
+    assert len(buf) == 5
+    assert buf.total_appended == 12
+    cols = buf.tail()
+    assert cols["ts"].tolist() == [7, 8, 9, 10, 11]
+    assert cols["temp"].tolist() == [7, 8, 9, 10, 11]
+    # Zero-copy: the newest rows are one slice of the mirrored storage
+    assert cols["ts"].base is not None
+    assert buf.tail(2, copy=True)["ts"].tolist() == [10, 11]
+    assert buf.oldest_ts() == 7
+
+
+def test_tail_at_every_head_position():
+    buf = ReadingRingBuffer(capacity=4)
+    for ts in range(20):
+        buf.append(reading(ts))
+        expected = list(range(max(0, ts - 3), ts + 1))
+        assert buf.tail()["ts"].tolist() == expected
+        assert buf.tail(3)["ts"].tolist() == expected[-3:]
+
+
+def test_irradiance_derived_from_lux():
+    buf = ReadingRingBuffer(capacity=2)
+    buf.append(reading(1))
+    assert buf.tail()["irradiance"].tolist() == [1.0]
+    assert buf.latest()["epoch"] == 1.0
+
+
+def test_window_binary_search():
+    buf = ReadingRingBuffer(capacity=8)
+    for ts in range(20):
+        buf.append(reading(ts))
+    assert buf.window(14, 16)["ts"].tolist() == [14, 15, 16]
+    assert buf.window(18)["ts"].tolist() == [18, 19]
+    assert buf.window(0, 5)["ts"].tolist() == []
+
+
+def test_window_with_out_of_order_readings():
+    buf = ReadingRingBuffer(capacity=8)
+    for ts in (10, 11, 9, 12, 13, 8, 14):
+        buf.append(reading(ts))
+    # idx is the running max, so it stays sorted while ts steps back
+    assert np.all(np.diff(buf.tail()["idx"]) >= 0)
+    assert buf.window(10, 13)["ts"].tolist() == [10, 11, 12, 13]
+    # A late row is found while its idx (the max at arrival) is inside the bounds
+    assert buf.window(9, 12)["ts"].tolist() == [10, 11, 9, 12]
+    assert buf.window(8, 14)["ts"].tolist() == [10, 11, 9, 12, 13, 8, 14]
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        ReadingRingBuffer(capacity=0)
+
+
+def test_registry_keeps_one_ring_per_sensor():
+    registry = SensorBufferRegistry(4)
+    for ts in range(6):
+        registry.append(reading(ts, sensor="a"))
+    registry.append(reading(100, sensor="b"))
+    assert sorted(registry.sensors()) == ["a", "b"]
+    assert registry.tail(sensor="a")["ts"].tolist() == [2, 3, 4, 5]
+    assert registry.latest("b")["epoch"] == 100.0
+
+
+def test_registry_refuses_rings_beyond_memory_budget():
+    registry = SensorBufferRegistry(10, max_bytes=2 * 10 * ROW_BYTES)
+    for sensor in ("a", "b", "c"):
+        registry.append(reading(1, sensor=sensor))
+    stats = registry.stats()
+    assert sorted(registry.sensors()) == ["a", "b"]
+    assert stats["bytes"] == registry.nbytes == 2 * 10 * ROW_BYTES
+    assert stats["unbuffered_readings"] == 1